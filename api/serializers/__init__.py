@@ -20,6 +20,7 @@ from .misc import CommentDetailedSerializer
 from .misc import EventSerializer
 from .misc import FeatureAttachmentSerializer
 from .misc import FeatureEventSerializer
+from .misc import ExportTaskSerializer
 from .misc import ImportTaskSerializer
 from .misc import StackedEventSerializer
 from .misc import UserSerializer
@@ -55,6 +56,7 @@ __all__ = [
     'FeatureTypeListSerializer',
     'FeatureTypeColoredSerializer',
     'FlatPagesSerializer',
+    'ExportTaskSerializer',
     'ImportTaskSerializer',
     'PreRecordedValuesSerializer',
     'ProjectSerializer',
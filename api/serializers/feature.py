@@ -9,7 +9,6 @@ from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from api import logger
 from api.serializers.misc import UserSerializer
 from geocontrib.models import Attachment
-from geocontrib.models import Authorization
 from geocontrib.models import Comment
 from geocontrib.models import CustomField
 from geocontrib.models import Feature
@@ -17,10 +16,29 @@ from geocontrib.models import FeatureLink
 from geocontrib.models import FeatureType
 from geocontrib.models import PreRecordedValues
 from geocontrib.models import Project
+from geocontrib.permissions import PermissionContext
+from geocontrib.schemas import FeatureTypeSchema
 
 User = get_user_model()
 
 
+class EagerLoadingMixin:
+    """
+    Declares the relations read by a serializer, so that views can join (select_related)
+    or prefetch them on the queryset and keep a constant number of queries per page.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
 class CustomFieldSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -107,8 +125,8 @@ class FeatureTypeListSerializer(serializers.ModelSerializer):
         Ensures the user has permission to create or edit feature types within the project.
         Raises a validation error if not authorized.
         """
-        user = self.context['request'].user
-        if not Authorization.has_permission(user, 'can_create_feature_type', obj):
+        context = PermissionContext.for_request(self.context['request'], obj)
+        if not context.has_permission('can_create_feature_type'):
             raise serializers.ValidationError({
                 'error': "Vous ne pouvez pas éditer de type de signalement pour ce projet. "})
         return obj
@@ -157,7 +175,10 @@ class FeatureTypeListSerializer(serializers.ModelSerializer):
             return instance
 
 
-class FeatureListSerializer(serializers.ModelSerializer):
+class FeatureListSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+
+    select_related_fields = ('project', 'feature_type__project', 'creator', 'last_editor')
+    prefetch_related_fields = ('feature_type__customfield_set', )
 
     project = serializers.ReadOnlyField(source='project.slug')
     feature_type = FeatureTypeSerializer(read_only=True)
@@ -180,6 +201,9 @@ class FeatureListSerializer(serializers.ModelSerializer):
             'feature_type',
             'geom',
             'feature_data',
+            'color',
+            'icon',
+            'opacity',
         )
 
     def get_feature_data(self, obj):
@@ -208,7 +232,9 @@ class FeatureTypeColoredSerializer(serializers.ModelSerializer):
         )
 
 
-class FeatureJSONSerializer(serializers.ModelSerializer):
+class FeatureJSONSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+
+    select_related_fields = ('project', 'feature_type', 'creator', 'last_editor')
     
     feature_type = serializers.SlugRelatedField(
         slug_field='slug', queryset=FeatureType.objects.all())
@@ -265,14 +291,11 @@ class FeatureJSONSerializer(serializers.ModelSerializer):
 
         # Check if the instance has feature_data (which stores custom field values)
         if instance.feature_data:
-            # Retrieve the feature type associated with this instance
-            feature_type = FeatureType.objects.get(id=instance.feature_type_id)
-
-            # Iterate over each custom field defined for this feature type
-            for custom_field in CustomField.objects.filter(feature_type=feature_type):
+            # Iterate over each custom field defined for the feature type, from the cached schema
+            for name in FeatureTypeSchema.get(instance.feature_type_id).names:
                 # Fetch the value for each custom field from feature_data
                 # If the value is not present, default to None
-                properties[custom_field.name] = instance.feature_data.get(custom_field.name, None)
+                properties[name] = instance.feature_data.get(name, None)
 
         # Return the dictionary of custom properties
         return properties
@@ -281,8 +304,7 @@ class FeatureJSONSerializer(serializers.ModelSerializer):
         # Hack: les champs extra n'etant pas serializé ou défini dans le modele
         # FIXME: les champs ne sont donc pas validé mais récupérer direct
         # depuis les données initial
-        custom_fields = {}
-        [custom_fields.update({i.name: i.field_type}) for i in validated_data.get('feature_type').customfield_set.all()]
+        custom_fields = FeatureTypeSchema.get(validated_data.get('feature_type'), fresh=True).field_types
         properties = self.initial_data.get('properties', {})
         res = {}
         # Tous les champs que pouvant etre nuls
@@ -401,7 +423,9 @@ class FeatureGeoJSONSerializer(FeatureJSONSerializer, GeoFeatureModelSerializer)
 
 
 
-class FeatureCSVSerializer(serializers.ModelSerializer):
+class FeatureCSVSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+
+    select_related_fields = ('project', 'feature_type', 'creator', 'last_editor')
 
     id = serializers.CharField(source="feature_id")
     
@@ -480,7 +504,9 @@ class FeatureCSVSerializer(serializers.ModelSerializer):
         return instance
 
 
-class FeatureSearchSerializer(serializers.ModelSerializer):
+class FeatureSearchSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+
+    select_related_fields = ('project', 'feature_type', 'creator')
     project_slug = serializers.ReadOnlyField(source='project.slug')
     feature_type_slug = serializers.ReadOnlyField(source='feature_type.slug')
     creator = UserSerializer()
@@ -503,7 +529,9 @@ class FeatureSearchSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class FeatureDetailedSerializer(GeoFeatureModelSerializer):
+class FeatureDetailedSerializer(EagerLoadingMixin, GeoFeatureModelSerializer):
+
+    select_related_fields = ('project', 'feature_type', 'creator', 'last_editor')
 
     feature_url = serializers.SerializerMethodField()
 
@@ -539,6 +567,8 @@ class FeatureDetailedSerializer(GeoFeatureModelSerializer):
             'feature_url',
             'feature_type_url',
             'color',
+            'icon',
+            'opacity',
             'assigned_member',
         )
         read_only_fields = fields
@@ -597,7 +627,11 @@ class FeatureLinkListSerializer(serializers.ListSerializer):
     @transaction.atomic
     def bulk_create(self, feature_from):
         validated_data = self.validated_data
-        feat_links = [FeatureLink(**item) for item in validated_data]
+        # Une même liaison ne peut être enregistrée qu'une fois
+        unique_items = {
+            (item.get('relation_type'), item['feature_to'].pk): item for item in validated_data
+        }
+        feat_links = [FeatureLink(**item) for item in unique_items.values()]
         feature_from.feature_from.all().delete()
         feature_from.feature_from.set(feat_links, bulk=False)
 
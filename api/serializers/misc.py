@@ -1,5 +1,6 @@
 from collections import defaultdict 
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from rest_framework import serializers
 
 from api import logger
@@ -10,6 +11,7 @@ from geocontrib.models import FeatureType
 from geocontrib.models import Project
 from geocontrib.models import Event
 from geocontrib.models import StackedEvent
+from geocontrib.models import ExportTask
 from geocontrib.models import ImportTask
 
 
@@ -458,3 +460,38 @@ class ImportTaskSerializer(serializers.ModelSerializer):
             'infos',
             'csv_file_name'
         )
+
+
+class ExportTaskSerializer(serializers.ModelSerializer):
+
+    project_slug = serializers.SlugRelatedField(source='project', slug_field='slug', read_only=True)
+    feature_type_slug = serializers.SlugRelatedField(source='feature_type', slug_field='slug', read_only=True)
+    progress = serializers.ReadOnlyField()
+    download_url = serializers.SerializerMethodField()
+
+    def get_download_url(self, obj):
+        if obj.status != "finished" or not obj.file or obj.is_expired:
+            return None
+        url = reverse('api:exporttask-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    class Meta:
+        model = ExportTask
+        fields = (
+            'id',
+            'created_on',
+            'started_on',
+            'finished_on',
+            'expires_on',
+            'status',
+            'format',
+            'project_slug',
+            'feature_type_slug',
+            'user',
+            'total_count',
+            'exported_count',
+            'progress',
+            'download_url',
+            'infos',
+        )
@@ -57,7 +57,7 @@ class LevelSerializer(serializers.ModelSerializer):
         )
 
     def to_internal_value(self, data):
-        return UserLevelPermission.objects.get(user_type_id=data.get('codename'))
+        return UserLevelPermission.registry().get(user_type_id=data.get('codename'))
 
 
 class BaseProjectAuthorizationListSerializer(serializers.ListSerializer):
@@ -72,7 +72,10 @@ class BaseProjectAuthorizationListSerializer(serializers.ListSerializer):
             })
         project.authorization_set.all().delete()
         try:
-            instances = Authorization.objects.bulk_create(authorizations)
+            # Le rang par défaut ("utilisateur connecté") est implicite et n'est pas stocké
+            instances = Authorization.objects.bulk_create([
+                row for row in authorizations if not Authorization.is_default(row.user, row.level)
+            ])
         except Exception as err:
             raise serializers.ValidationError({
                 'error': f"Échec de l'édition des permissions: {err}"
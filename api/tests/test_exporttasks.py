@@ -0,0 +1,134 @@
+from datetime import timedelta
+from time import sleep
+import json
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+import pytest
+
+from geocontrib.models import ExportTask
+from geocontrib.models import FeatureType
+from geocontrib.models import User
+from geocontrib.tasks import task_purge_export_tasks
+from geocontrib.utils.export import export_processing
+
+TIMEOUT = 10
+
+
+@pytest.mark.freeze_time('2021-08-05')
+# Desactive les transaction pour que le worker Celery puisse travailler
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures('celery_session_app')
+@pytest.mark.usefixtures('celery_session_worker')
+def test_export_post(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+
+    url = reverse('api:exporttask-list')
+    # Ensure anonymous cannot create exports
+    result = api_client.post(url, {"feature_type_slug": "2-type-2"})
+    assert result.status_code == 403
+
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+    result = api_client.post(url, {"feature_type_slug": "2-type-2", "format_export": "xml"})
+    assert result.status_code == 400
+
+    result = api_client.post(url, {"feature_type_slug": "2-type-2", "format_export": "geojson"})
+    assert result.status_code in (200, 201)
+    task_url = reverse('api:exporttask-detail', args=[result.json()['id']])
+
+    status = "pending"
+    count = 0
+    # run task (wait for finish)
+    while status in ("pending", "processing") and count < TIMEOUT:
+        result = api_client.get(task_url)
+        assert result.status_code == 200
+        status = result.json()['status']
+        count += 1
+        sleep(1)
+
+    res_json = result.json()
+    assert res_json['status'] == "finished"
+    assert res_json['progress'] == 100
+    assert res_json['exported_count'] == res_json['total_count']
+    assert res_json['download_url']
+
+    # The file holds the same export as the synchronous view
+    result = api_client.get(reverse('api:exporttask-download', args=[res_json['id']]))
+    assert result.status_code == 200
+    exported = json.loads(b''.join(result.streaming_content))
+    result = api_client.get(
+        reverse('api:project-export', args=["1-aze", "2-type-2"]) + '?format_export=geojson')
+    assert exported == json.loads(b''.join(result.streaming_content))
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_export_task_dedupe_and_purge():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    feature_type = FeatureType.objects.get(slug="2-type-2")
+    project = feature_type.project
+
+    # Identical requests share the task in flight
+    export_task, created = ExportTask.get_or_create_in_flight(project, feature_type, user, 'csv')
+    assert created
+    same_task, created = ExportTask.get_or_create_in_flight(project, feature_type, user, 'csv')
+    assert not created
+    assert same_task.pk == export_task.pk
+    _, created = ExportTask.get_or_create_in_flight(project, feature_type, user, 'json')
+    assert created
+
+    export_processing(export_task)
+    export_task.refresh_from_db()
+    assert export_task.status == "finished"
+    assert export_task.file
+    assert export_task.expires_on == export_task.finished_on + ExportTask.get_retention()
+
+    # Once finished, a new identical request starts a new task
+    _, created = ExportTask.get_or_create_in_flight(project, feature_type, user, 'csv')
+    assert created
+
+    # Files are deleted after the retention period
+    assert ExportTask.purge_expired() == 0
+    ExportTask.objects.filter(pk=export_task.pk).update(expires_on=timezone.now() - timedelta(seconds=1))
+    storage, name = export_task.file.storage, export_task.file.name
+    assert ExportTask.purge_expired() == 1
+    assert not ExportTask.objects.filter(pk=export_task.pk).exists()
+    assert not storage.exists(name)
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_export_task_stale():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    feature_type = FeatureType.objects.get(slug="2-type-2")
+    project = feature_type.project
+
+    # A task whose worker died stays in flight
+    export_task, created = ExportTask.get_or_create_in_flight(project, feature_type, user, 'csv')
+    assert created
+    ExportTask.objects.filter(pk=export_task.pk).update(
+        status="processing", started_on=timezone.now() - ExportTask.get_timeout() / 2)
+    assert ExportTask.get_or_create_in_flight(project, feature_type, user, 'csv') == (export_task, False)
+
+    # Past the timeout, it fails and an identical request starts a new task
+    ExportTask.objects.filter(pk=export_task.pk).update(
+        started_on=timezone.now() - ExportTask.get_timeout() - timedelta(seconds=1))
+    new_task, created = ExportTask.get_or_create_in_flight(project, feature_type, user, 'csv')
+    assert created
+    assert new_task.pk != export_task.pk
+    export_task.refresh_from_db()
+    assert export_task.status == "failed"
+    assert export_task.is_expired
+
+    # The periodic purge fails the tasks never started, then deletes them
+    ExportTask.objects.filter(pk=new_task.pk).update(
+        created_on=timezone.now() - ExportTask.get_timeout() - timedelta(seconds=1))
+    assert task_purge_export_tasks() == 2
+    assert not ExportTask.objects.exists()
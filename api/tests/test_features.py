@@ -1,5 +1,11 @@
+from datetime import date
+import json
+
 from django.core.management import call_command
 from django.conf import settings
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import pytest
 
@@ -8,6 +14,8 @@ from conftest import verify_or_create_json
 from conftest import verify_or_create
 from conftest import sort_features_by_title
 
+from geocontrib.models import Feature
+from geocontrib.models import FeatureType
 from geocontrib.models import StackedEvent
 
 @pytest.mark.django_db
@@ -223,6 +231,113 @@ def test_projectfeature(api_client):
         sorter=sort_simple_features_geojson_by_title
     )
 
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_projectfeature_stream(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+
+    features_url = reverse('api:features-list')
+    for output in ['', '&output=list', '&output=geojson']:
+        url = f'{ features_url }?project__slug=1-aze&ordering=created_on{ output }'
+        expected = api_client.get(url).json()
+        result = api_client.get(url + '&stream=true')
+        assert result.status_code == 200
+        assert result.streaming
+        assert json.loads(b''.join(result.streaming_content)) == expected
+
+
+def assert_same_feature_collection(result, expected):
+    """
+    Compare two FeatureCollections, geometries being compared with a tolerance
+    since PostGIS and GDAL do not write the coordinates with the same precision.
+    The bytes can't be compared: PostgreSQL orders the keys of the merged jsonb
+    properties and spaces its separators differently from the DRF renderer.
+    """
+    assert result['type'] == expected['type']
+    assert len(result['features']) == len(expected['features'])
+    for feature, expected_feature in zip(result['features'], expected['features']):
+        geometry = GEOSGeometry(json.dumps(feature.pop('geometry')))
+        expected_geometry = GEOSGeometry(json.dumps(expected_feature.pop('geometry')))
+        assert geometry.equals_exact(expected_geometry, 1e-9)
+        assert feature == expected_feature
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_projectfeature_postgis_engine(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+
+    features_url = reverse('api:features-list')
+    url = f'{ features_url }?project__slug=1-aze&ordering=created_on'
+    export_url = reverse('api:project-export', args=["1-aze", "2-type-2"])
+    # Les signalements supprimés sont renvoyés avec from_date, avec leur date de suppression
+    deleted = Feature.objects.filter(project__slug='1-aze', status='published').first()
+    Feature.objects.filter(pk=deleted.pk).update(deletion_on=date(2021, 8, 5))
+    from_date_url = f'{ url }&from_date=2000-01-01'
+
+    def session_time_zone():
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW TIME ZONE')
+            return cursor.fetchone()[0]
+
+    time_zone = session_time_zone()
+    for authenticated in [False, True]:
+        if authenticated:
+            api_client.force_authenticate(user=User.objects.get(username="admin"))
+        for base_url in [url, from_date_url, f'{ export_url }?format_export=geojson']:
+            expected = api_client.get(base_url)
+            if expected.streaming:
+                expected = json.loads(b''.join(expected.streaming_content))
+            else:
+                expected = expected.json()
+            if base_url == from_date_url:
+                deletion_dates = {
+                    feature['id']: feature['properties']['deletion_on']
+                    for feature in expected['features']}
+                assert deletion_dates[str(deleted.pk)] == '2021-08-05'
+            result = api_client.get(f'{ base_url }&engine=postgis')
+            assert result.status_code == 200
+            assert result.streaming
+            assert_same_feature_collection(json.loads(b''.join(result.streaming_content)), expected)
+    # The dates are formatted in an explicit time zone, the session one is unchanged
+    assert session_time_zone() == time_zone
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_projectfeature_constant_queries(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    User.objects.create(username="editor")
+    Feature.objects.update(last_editor=User.objects.get(username="editor"))
+    api_client.force_authenticate(user=user)
+
+    features_url = reverse('api:features-list')
+    paginated_url = reverse('api:project-feature-paginated', args=["1-aze"])
+    for url in [
+        f'{ features_url }?project__slug=1-aze',
+        f'{ features_url }?project__slug=1-aze&output=list',
+        f'{ features_url }?project__slug=1-aze&output=geojson',
+        f'{ paginated_url }?ordering=created_on',
+        f'{ paginated_url }?ordering=created_on&output=geojson',
+    ]:
+        # Premier appel pour charger les caches (schémas, niveaux...)
+        api_client.get(f'{ url }&limit=1')
+        queries = []
+        for limit in [1, 100]:
+            with CaptureQueriesContext(connection) as context:
+                result = api_client.get(f'{ url }&limit={ limit }')
+            assert result.status_code == 200
+            queries.append(len(context.captured_queries))
+        assert queries[0] == queries[1], url
+
+
 def sort_paginated_features_by_title(data):
     """
     sort geojson by title
@@ -257,6 +372,46 @@ def test_projectfeaturepaginated(api_client):
                          )
 
 
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_projectfeaturepaginated_cursor(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+    features_url = reverse('api:project-feature-paginated', args=["1-aze"])
+
+    for ordering in ['-created_on', 'title', '-updated_on']:
+        result = api_client.get(features_url, {'ordering': ordering, 'limit': 100})
+        assert result.status_code == 200
+        expected = [feature['feature_id'] for feature in result.json()['results']]
+        count, geom_count = result.json()['count'], result.json()['geom_count']
+        assert count == len(expected)
+
+        # Parcours complet page par page avec le curseur
+        feature_ids = []
+        url = f'{features_url}?ordering={ordering}&limit=2&pagination=cursor'
+        while url:
+            result = api_client.get(url)
+            assert result.status_code == 200
+            data = result.json()
+            assert data['previous'] is None
+            assert (data['count'], data['geom_count']) == (count, geom_count)
+            feature_ids += [feature['feature_id'] for feature in data['results']]
+            url = data['next']
+        assert feature_ids == expected
+
+    # Comptages ignorés
+    result = api_client.get(features_url, {'limit': 2, 'counts': 'none'})
+    assert result.status_code == 200
+    assert result.json()['count'] is None
+    assert result.json()['geom_count'] is None
+    assert result.json()['next'] is not None
+
+    result = api_client.get(features_url, {'pagination': 'cursor', 'cursor': 'invalid'})
+    assert result.status_code == 404
+
+
 @pytest.mark.django_db
 @pytest.mark.freeze_time('2021-08-05')
 def test_project_feature_bbox(api_client):
@@ -281,12 +436,27 @@ def test_project_export(api_client):
     feature_type_export_url = reverse('api:project-export', args=["1-aze", "2-type-2"])
     result = api_client.get(f'{ feature_type_export_url }?format_export=geojson')
     assert result.status_code == 200
-    verify_or_create_json("api/tests/data/test_project_export.geojson", result.json())
+    assert result.streaming
+    verify_or_create_json(
+        "api/tests/data/test_project_export.geojson",
+        json.loads(b''.join(result.streaming_content))
+    )
+
+    # Test : export a feature type as a GeoJSON text sequence, one feature per line
+    result = api_client.get(f'{ feature_type_export_url }?format_export=geojsonseq')
+    assert result.status_code == 200
+    assert result['Content-Type'] == 'application/geo+json-seq'
+    lines = b''.join(result.streaming_content).decode('utf-8').splitlines()
+    assert all(line.startswith('\x1e') for line in lines)
+    expected = api_client.get(f'{ feature_type_export_url }?format_export=geojson')
+    expected = json.loads(b''.join(expected.streaming_content))
+    assert [json.loads(line[1:]) for line in lines] == expected['features']
 
     # Test : export a feature type in CSV
     result = api_client.get(f'{ feature_type_export_url }?format_export=csv')
     assert result.status_code == 200
-    verify_or_create("api/tests/data/test_project_export.csv", result.content)
+    assert result.streaming
+    verify_or_create("api/tests/data/test_project_export.csv", b''.join(result.streaming_content))
 
     features_list_url = reverse('api:features-list')
     url = features_list_url + '?project__slug=' + project_slug
@@ -473,3 +643,201 @@ def test_featurepositioninlist(api_client):
     result = api_client.get(feature_position_url, data)
     assert result.status_code == 200
     assert result.data == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_features_mvt(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    features_mvt_url = reverse('api:features-mvt')
+
+    # Missing or invalid parameters
+    result = api_client.get(f'{ features_mvt_url }?tile=0/0/0')
+    assert result.status_code == 400
+    result = api_client.get(f'{ features_mvt_url }?project_id=1&tile=1/2/0')
+    assert result.status_code == 400
+    result = api_client.get(f'{ features_mvt_url }?project_id=1')
+    assert result.status_code == 400
+
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+    feature_ids = [str(pk) for pk in Feature.objects.values_list('pk', flat=True)]
+    for params in ('project_id=1', 'project__slug=1-aze', 'featuretype_id=2', 'feature_type__slug=2-type-2'):
+        with CaptureQueriesContext(connection) as context:
+            result = api_client.get(f'{ features_mvt_url }?{ params }&tile=0/0/0')
+        assert result.status_code == 200, params
+        assert result['Content-Type'] == 'application/vnd.mapbox-vector-tile'
+        assert result.content, params
+        # The tile query filters the features in SQL, without a list of identifiers
+        tile_sql = context.captured_queries[-1]['sql']
+        assert 'ST_AsMVT' in tile_sql
+        assert not any(feature_id in tile_sql for feature_id in feature_ids)
+
+    result = api_client.get(f'{ features_mvt_url }?project_id=1&tile=0/0/0&limit=1&offset=0')
+    assert result.status_code == 200
+    assert result.content
+    result = api_client.get(f'{ features_mvt_url }?project_id=1&tile=0/0/0&limit=1&offset=1000')
+    assert result.status_code == 200
+    assert result.content == b''
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_features_mvt_cache(api_client, settings, tmp_path, django_capture_on_commit_callbacks):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    settings.MVT_CACHE_BACKEND = 'geocontrib.utils.tiles.FileSystemTileCache'
+    settings.MVT_CACHE_DIR = str(tmp_path)
+    url = reverse('api:features-mvt') + '?project_id=1&tile=0/0/0'
+
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+    result = api_client.get(url)
+    assert result['X-Cache'] == 'MISS'
+    content = result.content
+    result = api_client.get(url)
+    assert result['X-Cache'] == 'HIT'
+    assert result.content == content
+
+    # Each visibility class has its own tiles
+    api_client.force_authenticate(user=None)
+    result = api_client.get(url)
+    assert result['X-Cache'] == 'MISS'
+
+    # Saving a feature invalidates the tiles it touches
+    with django_capture_on_commit_callbacks(execute=True):
+        feature = Feature.objects.filter(project_id=1).exclude(geom=None).first()
+        feature.title = "Titre modifié"
+        feature.save()
+    api_client.force_authenticate(user=user)
+    result = api_client.get(url)
+    assert result['X-Cache'] == 'MISS'
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_features_mvt_zoom_attributes(api_client, settings):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    settings.MVT_ZOOM_ATTRIBUTES = {"0": ["status", "feature_type"], "2": None}
+    url = reverse('api:features-mvt') + '?project_id=1&tile={}'
+
+    def tile_sql(tile):
+        with CaptureQueriesContext(connection) as context:
+            result = api_client.get(url.format(tile))
+        assert result.status_code == 200
+        return context.captured_queries[-1]['sql']
+
+    # Low zoom levels: only the configured attributes, and the identifier
+    sql = tile_sql('0/0/0')
+    assert '"feature_id"' in sql
+    assert '"feature_type_id"' in sql
+    assert '"status"' in sql
+    assert '"description"' not in sql
+    assert 'ST_SimplifyPreserveTopology' in sql
+    # Higher zoom levels: all the attributes
+    assert '"description"' in tile_sql('2/2/1')
+
+    settings.MVT_SIMPLIFY_TOLERANCE = 0
+    assert 'ST_SimplifyPreserveTopology' not in tile_sql('0/0/0')
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_features_style(api_client, settings):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    FeatureType.objects.filter(slug='1-dfsdfs').update(
+        icon='fa-tree', colors_style={'custom_field_name': 'etat', 'colors': {'bon': '#00ff00', 'mauvais': ''}})
+    Feature.objects.filter(pk='75540f8e-0f4d-4317-9818-cc1219a5df8c').update(feature_data={'etat': 'bon'})
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+
+    # The style computed by PostgreSQL is the one of Feature.color and of the feature type
+    features_url = reverse('api:features-list')
+    expected = {
+        str(feature.pk): (feature.color, feature.feature_type.icon, feature.feature_type.opacity)
+        for feature in Feature.objects.filter(project__slug='1-aze', deletion_on__isnull=True)
+    }
+    assert expected['75540f8e-0f4d-4317-9818-cc1219a5df8c'] == ('#00ff00', 'fa-tree', '0.5')
+    result = api_client.get(f'{ features_url }?project__slug=1-aze&output=list')
+    assert result.status_code == 200
+    assert {
+        feature['feature_id']: (feature['color'], feature['icon'], feature['opacity'])
+        for feature in result.json()['features']
+    } == expected
+    result = api_client.get(f'{ features_url }?project__slug=1-aze&output=geojson')
+    assert result.status_code == 200
+    assert {
+        feature['id']: (
+            feature['properties']['color'], feature['properties']['icon'], feature['properties']['opacity'])
+        for feature in result.json()['features']
+    } == expected
+
+    # The style is an attribute of the tiles, which can be kept at low zoom levels
+    settings.MVT_ZOOM_ATTRIBUTES = {"0": ["color"], "2": None}
+    url = reverse('api:features-mvt') + '?project_id=1&tile={}'
+
+    def tile_sql(tile):
+        with CaptureQueriesContext(connection) as context:
+            result = api_client.get(url.format(tile))
+        assert result.status_code == 200
+        return context.captured_queries[-1]['sql']
+
+    sql = tile_sql('0/0/0')
+    assert 'CASE WHEN' in sql
+    assert '"color"' in sql
+    assert '"icon"' not in sql
+    sql = tile_sql('2/2/1')
+    assert all(attribute in sql for attribute in ['"color"', '"icon"', '"opacity"'])
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_project_feature_position_in_list(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    # Mêmes dates de création: les signalements sont départagés par identifiant (redmine 23018)
+    tied = Feature.objects.filter(status='draft').values_list('pk', flat=True)
+    Feature.objects.filter(pk__in=list(tied)).update(created_on='2021-09-30T11:25:10.297Z')
+
+    def position_url(feature_id, **params):
+        url = reverse('api:project-feature-position-in-list', args=["1-aze", feature_id])
+        query = '&'.join(f'{ key }={ value }' for key, value in params.items())
+        return f'{ url }?{ query }' if query else url
+
+    def expected_positions(ordering, **filters):
+        # Position dans la liste complète des signalements, comme list(queryset).index()
+        feature_ids = list(Feature.objects.filter(
+            project__slug="1-aze", deletion_on__isnull=True, **filters
+        ).order_by(ordering, 'feature_id').values_list('feature_id', flat=True))
+        return {feature_id: feature_ids.index(feature_id) for feature_id in feature_ids}
+
+    api_client.force_authenticate(user=User.objects.get(username="admin"))
+    all_features = Feature.objects.values_list('feature_id', flat=True)
+    cases = [
+        ({}, expected_positions('-created_on')),
+        ({'ordering': 'created_on'}, expected_positions('created_on')),
+        ({'ordering': '-title'}, expected_positions('-title')),
+        ({'feature_type_slug': '2-type'}, expected_positions('-created_on', feature_type__slug__icontains='2-type')),
+        ({'status': 'draft'}, expected_positions('-created_on', status__icontains='draft')),
+        ({'title': 'type', 'ordering': 'created_on'},
+         expected_positions('created_on', title__icontains='type')),
+    ]
+    for params, positions in cases:
+        for feature_id in all_features:
+            result = api_client.get(position_url(feature_id, **params))
+            if feature_id in positions:
+                assert result.status_code == 200, params
+                assert result.json() == positions[feature_id], params
+            else:
+                # Signalement exclu par les filtres
+                assert result.status_code == 204, params
+
+    # Un brouillon n'est pas visible par un utilisateur anonyme
+    api_client.force_authenticate(user=None)
+    draft = Feature.objects.filter(status='draft').first()
+    assert api_client.get(position_url(draft.feature_id)).status_code == 204
+    published = Feature.objects.filter(status='published').order_by('-created_on', 'feature_id')
+    assert api_client.get(position_url(published[1].feature_id)).json() == 1
@@ -1,4 +1,5 @@
 from time import sleep
+import json
 
 from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -7,7 +8,16 @@ import pytest
 from conftest import verify_or_create_json
 from conftest import sort_features_by_title
 
+from geocontrib.models import Event
+from geocontrib.models import Feature
+from geocontrib.models import FeatureLink
+from geocontrib.models import FeatureType
+from geocontrib.models import ImportTask
 from geocontrib.models import User
+from geocontrib.utils.csv import CSVProcessing
+from geocontrib.utils.geojson import GeoJSONProcessing
+from geocontrib.utils.geojson import GeoJSONSeqProcessing
+from geocontrib.utils.geojson import geojson_processing
 
 TIMEOUT = 10
 
@@ -230,3 +240,199 @@ def test_import_csv_post(api_client):
                           result.json(),
                           sorter=sort_features_by_title,
                           hook=ignore_imported_id)
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_import_geojsonseq(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    api_client.force_authenticate(user=user)
+    feature_type = FeatureType.objects.get(slug="2-type-2")
+
+    # Export the feature type as a GeoJSON text sequence
+    url = reverse('api:project-export', args=["1-aze", "2-type-2"])
+    result = api_client.get(f'{ url }?format_export=geojsonseq')
+    content = b''.join(result.streaming_content)
+
+    # Import it back without identifiers, line by line and by batches of 2 features
+    lines = []
+    for line in content.splitlines():
+        feature = json.loads(line.lstrip(b'\x1e'))
+        feature.pop('id')
+        lines.append(b'\x1e' + json.dumps(feature).encode('utf-8'))
+    import_task = ImportTask.objects.create(
+        project=feature_type.project,
+        feature_type=feature_type,
+        user=user,
+        file=SimpleUploadedFile('export_projet.geojsonseq', b'\n'.join(lines) + b'\n'),
+    )
+    import_task.refresh_from_db()
+    assert GeoJSONSeqProcessing.accepts(import_task.file)
+    GeoJSONSeqProcessing.batch_size = 2
+    try:
+        geojson_processing(import_task)
+    finally:
+        GeoJSONSeqProcessing.batch_size = 500
+    import_task.refresh_from_db()
+    assert import_task.status == "finished"
+    assert import_task.infos == "3 signalement(s) importé(s). "
+    assert Feature.objects.filter(feature_type=feature_type).count() == 6
+
+    # A malformed line makes the whole import fail
+    import_task = ImportTask.objects.create(
+        project=feature_type.project,
+        feature_type=feature_type,
+        user=user,
+        file=SimpleUploadedFile('export_projet.geojsonseq', lines[0] + b'\n\x1e{"type":'),
+    )
+    import_task.refresh_from_db()
+    geojson_processing(import_task)
+    import_task.refresh_from_db()
+    assert import_task.status == "failed"
+    assert import_task.infos.startswith("Erreur à la lecture de la ligne 2")
+    assert Feature.objects.filter(feature_type=feature_type).count() == 6
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_import_bulk_create_and_update():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    feature_type = FeatureType.objects.get(slug="2-type-2")
+    updated = Feature.objects.filter(feature_type=feature_type).first()
+    other = Feature.objects.exclude(feature_type=feature_type).first()
+    geometry = {"type": "LineString", "coordinates": [[1.17, 43.65], [1.10, 43.54]]}
+
+    features = [
+        # Existing feature of the feature type => updated
+        {"type": "Feature", "id": str(updated.pk), "geometry": geometry,
+         "properties": {"title": "mis à jour", "status": "published"}},
+        # Feature of another feature type => created with a new identifier
+        {"type": "Feature", "id": str(other.pk), "geometry": geometry,
+         "properties": {"title": "copie"}},
+    ] + [
+        {"type": "Feature", "geometry": geometry, "properties": {"title": f"nouveau { index }"}}
+        for index in range(10)
+    ]
+    import_task = ImportTask.objects.create(
+        project=feature_type.project,
+        feature_type=feature_type,
+        user=user,
+        file=SimpleUploadedFile('import.geojson', json.dumps(
+            {"type": "FeatureCollection", "features": features}).encode('utf-8')),
+    )
+    import_task.refresh_from_db()
+    nb_features = Feature.objects.filter(feature_type=feature_type).count()
+    nb_events = Event.objects.count()
+
+    process = GeoJSONProcessing(bulk_batch_size=5)
+    process(import_task)
+    import_task.refresh_from_db()
+    assert import_task.status == "finished", import_task.infos
+    assert import_task.infos == "12 signalement(s) importé(s). "
+
+    assert Feature.objects.filter(feature_type=feature_type).count() == nb_features + 11
+    updated.refresh_from_db()
+    assert updated.title == "mis à jour"
+    assert updated.status == "published"
+    assert Feature.objects.get(pk=other.pk).feature_type != feature_type
+    assert Feature.objects.filter(feature_type=feature_type, title="copie").exclude(pk=other.pk).exists()
+    # The events are still generated, one per imported feature
+    assert Event.objects.count() == nb_events + 12
+    assert Event.objects.filter(feature_id=updated.pk, event_type='update').exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_import_csv_chunks():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_import_tasks.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    feature_type = FeatureType.objects.get(slug="1-dfsdfs")
+
+    def import_csv(rows):
+        content = "title,description,status,lat,lon\n" + "\n".join(rows) + "\n"
+        import_task = ImportTask.objects.create(
+            project=feature_type.project,
+            feature_type=feature_type,
+            user=user,
+            file=SimpleUploadedFile('import.csv', content.encode('utf-8')),
+        )
+        # Rows are written by chunks of 2 rows, each in its own transaction
+        CSVProcessing(chunk_size=2)(import_task)
+        import_task.refresh_from_db()
+        return import_task
+
+    import_task = import_csv([f"signalement { index },,published,45.0,1.{ index }" for index in range(5)])
+    assert import_task.status == "finished"
+    assert import_task.infos == "5 signalement(s) importé(s). "
+    assert Feature.objects.filter(feature_type=feature_type).count() == 5
+
+    # An invalid row only rolls back its own chunk
+    import_task = import_csv([
+        "valide 1,,draft,45.0,1.0",
+        "valide 2,,draft,45.0,1.1",
+        "valide 3,,draft,45.0,1.2",
+        "invalide,,draft,45.0,abc",
+    ])
+    assert import_task.status == "failed"
+    assert "2 signalement(s) importé(s). " in import_task.infos
+    assert Feature.objects.filter(feature_type=feature_type).count() == 7
+    assert not Feature.objects.filter(title="valide 3").exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_import_duplicate_links():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    user = User.objects.get(username="admin")
+    feature_type = FeatureType.objects.get(slug="2-type-2")
+    geometry = {"type": "LineString", "coordinates": [[1.17, 43.65], [1.10, 43.54]]}
+    other_geometry = {"type": "LineString", "coordinates": [[1.17, 43.65], [1.20, 43.60]]}
+    features = [
+        {"type": "Feature", "geometry": geometry,
+         "properties": {"title": "doublon", "description": "même description"}},
+        {"type": "Feature", "geometry": geometry,
+         "properties": {"title": "doublon", "description": "même description"}},
+        # Same title and description, but another geometry => not a duplicate
+        {"type": "Feature", "geometry": other_geometry,
+         "properties": {"title": "doublon", "description": "même description"}},
+        {"type": "Feature", "geometry": geometry, "properties": {"title": "unique"}},
+    ]
+
+    def import_geojson():
+        import_task = ImportTask.objects.create(
+            project=feature_type.project,
+            feature_type=feature_type,
+            user=user,
+            file=SimpleUploadedFile('import.geojson', json.dumps(
+                {"type": "FeatureCollection", "features": features}).encode('utf-8')),
+        )
+        import_task.refresh_from_db()
+        GeoJSONProcessing()(import_task)
+        import_task.refresh_from_db()
+        assert import_task.status == "finished", import_task.infos
+
+    def duplicate_links():
+        return set(FeatureLink.objects.filter(
+            relation_type='doublon', feature_from__feature_type=feature_type,
+        ).values_list('feature_from__title', 'feature_from_id', 'feature_to_id'))
+
+    import_geojson()
+    links = duplicate_links()
+    # Both imported duplicates are linked, in both directions
+    assert len(links) == 2
+    assert {(feature_to, feature_from) for _, feature_from, feature_to in links} == {
+        (feature_from, feature_to) for _, feature_from, feature_to in links}
+
+    import_geojson()
+    links = duplicate_links()
+    # Each of the 4 duplicates is linked to the 3 others, and both "unique" to each other
+    assert len([link for link in links if link[0] == "doublon"]) == 12
+    assert len([link for link in links if link[0] == "unique"]) == 2
+    # The links created by the first import are not inserted twice
+    assert FeatureLink.objects.filter(feature_from__feature_type=feature_type).count() == 14
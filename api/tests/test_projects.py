@@ -8,6 +8,7 @@ from django.conf import settings
 import pytest
 
 from geocontrib.models.project import Project
+from geocontrib.models.user import Authorization
 from geocontrib.models.user import UserLevelPermission
 from geocontrib.models.user import User
 from conftest import verify_or_create_json
@@ -104,6 +105,34 @@ def test_projects_list(api_client):
 
 
 
+@pytest.mark.django_db
+def test_projects_user_access_filters(api_client):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    creator = User.objects.create(username="creator")
+    user = User.objects.create(username="usertest")
+    for title, access_level in [("Public", "anonymous"), ("Membres", "contributor")]:
+        Project.objects.create(
+            title=title,
+            access_level_pub_feature=UserLevelPermission.objects.get(pk=access_level),
+            access_level_arch_feature=UserLevelPermission.objects.get(pk=access_level),
+            creator=creator,
+        )
+
+    def titles(params):
+        result = api_client.get(reverse('api:projects-list') + params)
+        assert result.status_code == 200
+        return sorted(project['title'] for project in result.json()['results'])
+
+    assert titles("?accessible=true") == ["Public"]
+    api_client.force_authenticate(user=user)
+    assert titles("?accessible=true") == ["Public"]
+    assert titles("?user_access_level=1") == ["Membres", "Public"]
+    assert titles("?user_access_level=5") == []
+    api_client.force_authenticate(user=creator)
+    assert titles("?accessible=true") == ["Membres", "Public"]
+    assert titles("?user_access_level=5&accessible=true") == ["Membres", "Public"]
+
+
 @pytest.mark.freeze_time('2021-08-05')
 @pytest.mark.django_db(transaction=True, reset_sequences=True)
 def test_projects_post(api_client):
@@ -278,10 +307,28 @@ def test_project_authorization(api_client):
     ]
     url = reverse('api:project-authorization', args=['1-aze'])
 
+    # Les membres implicites (utilisateur connecté) sont listés sans être stockés
+    implicit_member = [
+        {
+            "user":
+            {
+                "id":1,
+                "first_name":"",
+                "last_name":"",
+                "username":"admin"
+            },
+            "level":
+            {
+                "display":"Utilisateur connecté",
+                "codename":"logged_user"
+            }
+        }
+    ]
+
     # anon get call success
     result = api_client.get(url)
     assert result.status_code == 200
-    assert result.content.decode() == '[]'
+    assert result.json() == implicit_member
 
     user = User.objects.get(username="admin")
     api_client.force_authenticate(user=user)
@@ -289,7 +336,14 @@ def test_project_authorization(api_client):
     # admin get call success
     result = api_client.get(url)
     assert result.status_code == 200
-    assert result.content.decode() == '[]'
+    assert result.json() == implicit_member
+    assert not Authorization.objects.filter(project__slug='1-aze').exists()
+
+    # The level filters apply to the implicit members too
+    result = api_client.get(url, {'level__codename__in': 'logged_user,admin'})
+    assert result.json() == implicit_member
+    result = api_client.get(url, {'level__codename__not': 'logged_user'})
+    assert result.json() == []
 
     # Ensure no parameters Fails
     result = api_client.put(url, [], format='json')
@@ -35,6 +35,7 @@ from api.views.misc import CommentView
 from api.views.misc import CommentAttachmentUploadView
 from api.views.misc import EventView
 from api.views.misc import ExifGeomReaderView
+from api.views.misc import ExportTaskView
 from api.views.misc import ImportTaskSearch
 from api.views.misc import ProjectComments
 from api.views.project import ProjectAuthorizationView
@@ -79,6 +80,7 @@ router.register(r'v2/features', FeatureView, basename='features')
 router.register(r'v2/feature-types', FeatureTypeView, basename='feature-types')
 router.register(r'v2/users', UserViewSet, basename='users')
 router.register(r'v2/import-tasks', ImportTaskSearch, basename='importtask')
+router.register(r'v2/export-tasks', ExportTaskView, basename='exporttask')
 router.register(r'v2/base-maps', BaseMapViewset, basename='base-maps')
 router.register(r'v2/layers', LayerViewset, basename='layers')
 router.register(r'v2/levels-permissions', UserLevelsPermission, basename='levels-permissions')
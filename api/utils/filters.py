@@ -1,3 +1,4 @@
+from django.db.models import F
 from django.db.models import Q
 import json
 from rest_framework import filters
@@ -8,17 +9,33 @@ from geocontrib.models import ProjectAttributeAssociation
 
 class AuthorizationLevelCodenameFilter(filters.BaseFilterBackend):
 
+    @staticmethod
+    def get_codenames(request, param):
+        value = request.query_params.get(param)
+        if value:
+            return [param.strip() for param in value.split(',')]
+        return None
+
     def filter_queryset(self, request, queryset, view):
-        level__codename__in = request.query_params.get('level__codename__in')
-        if level__codename__in:
-            values = [param.strip() for param in level__codename__in.split(',')]
+        values = self.get_codenames(request, 'level__codename__in')
+        if values:
             queryset = queryset.filter(level__user_type_id__in=values)
-        level__codename__not = request.query_params.get('level__codename__not')
-        if level__codename__not:
-            values = [param.strip() for param in level__codename__not.split(',')]
+        values = self.get_codenames(request, 'level__codename__not')
+        if values:
             queryset = queryset.exclude(level__user_type_id__in=values)
         return queryset
 
+    def accepts(self, request, codename):
+        """
+        Whether the authorizations of the given level pass the filter,
+        for the implicit authorizations which are not stored.
+        """
+        values = self.get_codenames(request, 'level__codename__in')
+        if values and codename not in values:
+            return False
+        values = self.get_codenames(request, 'level__codename__not')
+        return not (values and codename in values)
+
 class ProjectsModerationFilter(filters.BaseFilterBackend):
 
     def filter_queryset(self, request, queryset, view):
@@ -97,21 +114,18 @@ class ProjectsAttributeFilter(filters.BaseFilterBackend):
 class ProjectsUserAccessLevelFilter(filters.BaseFilterBackend):
 
     def filter_queryset(self, request, queryset, view):
-        user_level_projects = Authorization.get_user_level_projects_ids(request.user)
         user_access_level = request.query_params.get('user_access_level')
         if user_access_level:
-            requested_user_access_level_projects = dict((k, v) for k, v in user_level_projects.items() if v == int(user_access_level))
-            queryset = queryset.filter(slug__in =requested_user_access_level_projects.keys())
+            queryset = Authorization.annotate_user_rank(queryset, request.user).filter(
+                user_rank=int(user_access_level))
         return queryset
 
 class ProjectsUserAccessibleFilter(filters.BaseFilterBackend):
 
     def filter_queryset(self, request, queryset, view):
-        user_level_projects = Authorization.get_user_level_projects_ids(request.user)
         if request.query_params.get('accessible'):
-            for i, c in enumerate(queryset):
-                if (c.access_level_pub_feature.rank > user_level_projects[c.slug]):
-                    queryset = queryset.exclude(slug=c.slug)
+            queryset = Authorization.annotate_user_rank(queryset, request.user).filter(
+                access_level_pub_feature__rank__lte=F('user_rank'))
         return queryset
 
 class ProjectsUserAccountFilter(filters.BaseFilterBackend):
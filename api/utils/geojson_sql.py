@@ -0,0 +1,220 @@
+from django.apps import apps
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import AsGeoJSON
+from django.db.models import Case
+from django.db.models import CharField
+from django.db.models import F
+from django.db.models import Func
+from django.db.models import JSONField
+from django.db.models import Q
+from django.db.models import TextField
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Coalesce
+from django.db.models.functions import Concat
+from django.db.models.functions import NullIf
+from django.db.models.functions import Trim
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+from api.utils.streaming import STREAM_CHUNK_SIZE
+from geocontrib.schemas import FeatureTypeSchema
+
+# Maximum number of decimal digits of the coordinates written by ST_AsGeoJSON
+GEOJSON_PRECISION = 15
+
+# Name of the query parameter selecting the rendering engine ('drf' or 'postgis')
+ENGINE_QUERY_PARAM = 'engine'
+
+
+class JSONBuildObject(Func):
+    function = 'json_build_object'
+    output_field = JSONField()
+
+
+class ISODate(Func):
+    """
+    Formats a date like DRF's DateField (YYYY-MM-DD), NULL staying NULL.
+    """
+    function = 'to_char'
+    template = "%(function)s(%(expressions)s, 'YYYY-MM-DD')"
+    output_field = TextField()
+
+
+class ISODateTime(Func):
+    """
+    Formats a timestamp like DRF's DateTimeField (datetime.isoformat() in the current time zone,
+    'Z' suffix for a zero offset). The time zone is explicit (AT TIME ZONE), the session
+    time zone is left untouched. Only usable on column references, since the expression
+    is repeated in the SQL.
+    """
+    output_field = TextField()
+
+    def __init__(self, expression, tzname=None, **extra):
+        super().__init__(
+            expression, Value(tzname or timezone.get_current_timezone_name()), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        column, column_params = compiler.compile(self.source_expressions[0])
+        tzname, tzname_params = compiler.compile(self.source_expressions[1])
+        local = f'({ column } AT TIME ZONE { tzname })'
+        local_params = [*column_params, *tzname_params]
+        # Offset of the time zone at this date, in seconds
+        offset = f"EXTRACT(EPOCH FROM { local } - ({ column } AT TIME ZONE 'UTC'))::integer"
+        offset_params = [*local_params, *column_params]
+        sql = (
+            f"to_char({ local }, 'YYYY-MM-DD\"T\"HH24:MI:SS')"
+            f" || CASE WHEN to_char({ local }, 'US') = '000000'"
+            f" THEN '' ELSE to_char({ local }, '.US') END"
+            f" || CASE WHEN { offset } = 0 THEN 'Z'"
+            f" ELSE CASE WHEN { offset } < 0 THEN '-' ELSE '+' END"
+            f" || lpad((abs({ offset }) / 3600)::text, 2, '0')"
+            f" || ':' || lpad((abs({ offset }) %% 3600 / 60)::text, 2, '0') END"
+        )
+        return sql, [*local_params * 3, *offset_params * 4]
+
+
+def use_postgis_engine(request):
+    return request.query_params.get(ENGINE_QUERY_PARAM) == 'postgis'
+
+
+def display_user(relation, is_authenticated):
+    """
+    SQL equivalent of Feature.display_creator / display_last_editor as rendered by the serializers.
+    """
+    if not is_authenticated:
+        return Value('N/A')
+    full_name = Trim(Concat(
+        F(f'{relation}__first_name'), Value(' '), F(f'{relation}__last_name'),
+        output_field=TextField()
+    ))
+    return Case(
+        When(**{f'{relation}__isnull': True}, then=Value('Utilisateur supprimé')),
+        default=Coalesce(NullIf(full_name, Value('')), F(f'{relation}__username')),
+        output_field=TextField(),
+    )
+
+
+def custom_properties(feature_type_ids):
+    """
+    Custom field values of the feature, as FeatureJSONSerializer.get_custom_properties():
+    one key per custom field of its feature type, only when feature_data is not empty.
+    """
+    whens = []
+    for feature_type_id in feature_type_ids:
+        args = []
+        for name in FeatureTypeSchema.get(feature_type_id).names:
+            args += [Value(name), KeyTransform(name, 'feature_data')]
+        if args:
+            whens.append(When(feature_type_id=feature_type_id, then=Func(
+                JSONBuildObject(*args), template='(%(expressions)s)::jsonb', output_field=JSONField())))
+    empty = Value('{}', output_field=TextField())
+    if not whens:
+        return Func(empty, template='(%(expressions)s)::jsonb', output_field=JSONField())
+    return Case(
+        When(Q(feature_data__isnull=True) | Q(feature_data={}), then=Func(
+            empty, template='(%(expressions)s)::jsonb', output_field=JSONField())),
+        *whens,
+        default=Func(empty, template='(%(expressions)s)::jsonb', output_field=JSONField()),
+        output_field=JSONField(),
+    )
+
+
+def feature_color(queryset):
+    """
+    SQL equivalent of Feature.color: the color of the feature type, overridden by the color
+    its colors_style gives to the value of the custom field (feature_data ->> custom_field_name).
+    The colors_style of the feature types of the queryset are read in a single query.
+    """
+    FeatureType = apps.get_model(app_label='geocontrib', model_name='FeatureType')
+    colors_styles = FeatureType.objects.filter(
+        pk__in=queryset.values('feature_type_id'), colors_style__isnull=False,
+    ).values_list('pk', 'colors_style')
+    whens = []
+    for feature_type_id, colors_style in colors_styles:
+        if not isinstance(colors_style, dict):
+            continue
+        custom_field_name = colors_style.get('custom_field_name', '')
+        colors = colors_style.get('colors') or {}
+        for value, color in colors.items():
+            # Empty colors fall back to the color of the feature type, as in Feature.color
+            if custom_field_name and color:
+                whens.append(When(
+                    Exact(KeyTextTransform(custom_field_name, 'feature_data'), Value(value)),
+                    feature_type_id=feature_type_id,
+                    then=Value(color),
+                ))
+    if not whens:
+        return F('feature_type__color')
+    return Case(*whens, default=F('feature_type__color'), output_field=CharField())
+
+
+def annotate_style(queryset):
+    """
+    Annotates the features with the attributes used to style them on a map: their color
+    (cf. feature_color()), and the icon and opacity of their feature type.
+    The annotations replace the Feature.color, icon and opacity properties on the instances.
+    """
+    return queryset.annotate(
+        color=feature_color(queryset),
+        icon=F('feature_type__icon'),
+        opacity=F('feature_type__opacity'),
+    )
+
+
+def feature_geojson(queryset, is_authenticated, multi=False, precision=GEOJSON_PRECISION):
+    """
+    Annotates the queryset with the text of each GeoJSON Feature, built by PostgreSQL with
+    json_build_object() and ST_AsGeoJSON(), with the same content as FeatureGeoJSONSerializer.
+    """
+    feature_type_ids = queryset.order_by().values_list('feature_type_id', flat=True).distinct()
+    geom = F('geom')
+    if multi:
+        geom = Func(geom, function='ST_Multi', output_field=GeometryField())
+    properties = JSONBuildObject(
+        Value('title'), F('title'),
+        Value('description'), F('description'),
+        Value('status'), F('status'),
+        Value('created_on'), ISODateTime('created_on'),
+        Value('updated_on'), ISODateTime('updated_on'),
+        Value('deletion_on'), ISODate('deletion_on'),
+        Value('feature_type'), F('feature_type__slug'),
+        Value('project'), F('project__slug'),
+        Value('display_creator'), display_user('creator', is_authenticated),
+        Value('display_last_editor'), display_user('last_editor', is_authenticated),
+        Value('creator'), F('creator_id'),
+        Value('assigned_member'), F('assigned_member_id'),
+    )
+    # Custom fields are merged into the base properties (jsonb ||)
+    properties = Func(
+        properties, custom_properties(list(feature_type_ids)),
+        template='((%(expressions)s))', arg_joiner='::jsonb || ', output_field=JSONField()
+    )
+    feature = JSONBuildObject(
+        Value('id'), F('feature_id'),
+        Value('type'), Value('Feature'),
+        Value('geometry'), Func(
+            AsGeoJSON(geom, precision=precision),
+            template='(%(expressions)s)::json', output_field=JSONField()),
+        Value('properties'), properties,
+    )
+    return queryset.annotate(
+        geojson=Func(feature, template='(%(expressions)s)::text', output_field=TextField())
+    )
+
+
+def iter_rendered_feature_collection(queryset, is_authenticated, multi=False,
+                                     chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yields the bytes of a GeoJSON FeatureCollection whose features are encoded by PostgreSQL:
+    Python only concatenates the pre-encoded features, read with a server-side cursor
+    so that only one chunk of them is held in memory at a time.
+    """
+    features = feature_geojson(queryset, is_authenticated, multi=multi).values_list(
+        'geojson', flat=True).iterator(chunk_size=chunk_size)
+    yield b'{"type":"FeatureCollection","features":['
+    for index, feature in enumerate(features):
+        yield ((',' if index else '') + feature).encode('utf-8')
+    yield b']}'
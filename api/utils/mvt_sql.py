@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.contrib.gis.db.models import GeometryField
+from django.contrib.gis.db.models.functions import Transform
+from django.db import connection
+from django.db.models import Func
+from django.db.models import IntegerField
+from django.db.models import Value
+from rest_framework.exceptions import ValidationError
+
+MVT_CONTENT_TYPE = 'application/vnd.mapbox-vector-tile'
+
+# Name of the layer of the tiles, as rendered by rest_framework_mvt
+MVT_LAYER_NAME = 'default'
+
+# Tile extent, in tile coordinate space
+MVT_EXTENT = 4096
+
+MVT_MAX_ZOOM = 30
+
+# Width of the Web Mercator projection, in meters
+WEB_MERCATOR_WIDTH = 2 * 20037508.342789244
+
+
+class TileEnvelope(Func):
+    """
+    Web Mercator (EPSG:3857) envelope of the z/x/y tile.
+    """
+    function = 'ST_TileEnvelope'
+    output_field = GeometryField(srid=3857)
+
+    def __init__(self, z, x, y, **extra):
+        super().__init__(
+            Value(z, IntegerField()), Value(x, IntegerField()), Value(y, IntegerField()), **extra)
+
+
+class AsMVTGeom(Func):
+    function = 'ST_AsMVTGeom'
+    output_field = GeometryField(srid=3857)
+
+    def __init__(self, geom, bounds, **extra):
+        super().__init__(
+            geom, bounds, Value(MVT_EXTENT), Value(0), Value(False), **extra)
+
+
+class SimplifyPreserveTopology(Func):
+    function = 'ST_SimplifyPreserveTopology'
+    output_field = GeometryField(srid=3857)
+
+
+def tile_resolution(z):
+    """
+    Size, in Web Mercator meters, of a unit of the tile grid at zoom z.
+    """
+    return WEB_MERCATOR_WIDTH / 2 ** z / MVT_EXTENT
+
+
+def get_simplify_tolerance(z):
+    """
+    Tolerance of the simplification of the geometries of the tiles of zoom z:
+    MVT_SIMPLIFY_TOLERANCE units of the tile grid (0 disables the simplification).
+    """
+    return getattr(settings, 'MVT_SIMPLIFY_TOLERANCE', 1.0) * tile_resolution(z)
+
+
+def get_zoom_attributes(z):
+    """
+    Names of the attributes of the tiles of zoom z, or None for all the columns.
+
+    MVT_ZOOM_ATTRIBUTES maps minimum zoom levels to lists of field or annotation names,
+    the list of the highest level not above z applying, for instance:
+    {0: ['feature_id', 'feature_type', 'color'], 12: None}.
+    """
+    names = None
+    for min_zoom, zoom_names in sorted(
+            (int(min_zoom), zoom_names)
+            for min_zoom, zoom_names in (getattr(settings, 'MVT_ZOOM_ATTRIBUTES', None) or {}).items()):
+        if z >= min_zoom:
+            names = zoom_names
+    return names
+
+
+def parse_tile(value):
+    """
+    Returns the (z, x, y) coordinates of the 'z/x/y' tile parameter.
+    """
+    try:
+        z, x, y = (int(part) for part in value.split('/'))
+    except (AttributeError, ValueError):
+        raise ValidationError(detail="The tile parameter must be formatted as z/x/y")
+    if not 0 <= z <= MVT_MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+        raise ValidationError(detail=f"Tile {value} does not exist")
+    return z, x, y
+
+
+def parse_pagination(limit, offset):
+    """
+    Returns the (limit, offset) pair of the tile query parameters, limit being None if not given.
+    """
+    try:
+        limit = int(limit) if limit not in (None, '') else None
+        offset = int(offset) if offset not in (None, '') else 0
+    except ValueError:
+        raise ValidationError(detail="Query parameters limit and offset must be integers")
+    if (limit is not None and limit < 0) or offset < 0:
+        raise ValidationError(detail="Query parameters limit and offset must be positive")
+    return limit, offset
+
+
+def tile_columns(queryset, geom_col, names=None):
+    """
+    Attributes of the features in the tiles: the columns of the model but its geometry,
+    then the annotations of the queryset (such as the style of the features), restricted
+    to the given names if any. The primary key is always kept.
+    """
+    columns = [
+        field.attname for field in queryset.model._meta.concrete_fields
+        if field.column != geom_col and (
+            names is None or field.primary_key or field.name in names or field.attname in names)
+    ]
+    columns += [name for name in queryset.query.annotations if names is None or name in names]
+    return columns
+
+
+def tile_queryset(queryset, z, x, y, geom_col='geom', limit=None, offset=0):
+    """
+    Returns the rows of the z/x/y tile, with their geometry in tile coordinates as 'mvt_geom',
+    simplified according to the zoom level, and the attributes of the zoom level.
+
+    The queryset keeps its own WHERE clause (permissions, filters): only the features
+    intersecting the tile envelope are read, with the spatial index of the geometry column.
+    """
+    bounds = TileEnvelope(z, x, y)
+    srid = queryset.model._meta.get_field(geom_col).srid
+    geom = Transform(geom_col, 3857)
+    tolerance = get_simplify_tolerance(z)
+    if tolerance > 0:
+        # The details smaller than the tolerance are removed before ST_AsMVTGeom
+        # snaps the vertices to the tile grid, so that less vertices are encoded
+        geom = SimplifyPreserveTopology(geom, Value(tolerance))
+    queryset = queryset.filter(**{
+        f'{geom_col}__intersects': Transform(bounds, srid),
+    }).values(
+        *tile_columns(queryset, geom_col, get_zoom_attributes(z)),
+        mvt_geom=AsMVTGeom(geom, bounds),
+    )
+    if limit is not None:
+        return queryset[offset:offset + limit]
+    return queryset[offset:]
+
+
+def render_tile(queryset, z, x, y, geom_col='geom', limit=None, offset=0):
+    """
+    Renders the features of the queryset inside the z/x/y tile as a Mapbox Vector Tile,
+    in a single query.
+    """
+    sql, params = tile_queryset(
+        queryset, z, x, y, geom_col=geom_col, limit=limit, offset=offset
+    ).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT ST_AsMVT(tile, %s, %s, 'mvt_geom') FROM ({ sql }) AS tile",
+            [MVT_LAYER_NAME, MVT_EXTENT, *params],
+        )
+        row = cursor.fetchone()
+    return bytes(row[0]) if row and row[0] else b''
@@ -1,11 +1,28 @@
+import base64
+import json
+import uuid
+
+from django.db import connection
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
 
 class CustomPagination(LimitOffsetPagination):
     """
     Custom pagination class that modifies the default LimitOffsetPagination behavior in Django Rest Framework.
     This class sets a custom default limit for items per page and introduces an additional 'geom_count' in the response.
 
+    Two opt-in query parameters are supported on top of limit/offset:
+        pagination=cursor: keyset pagination on (ordering column, feature_id). Each page only reads
+                           'limit' rows whatever its depth, and 'next' carries an opaque 'cursor' parameter.
+        counts=exact|estimate|none: 'exact' (default) computes 'count' and 'geom_count' in one aggregate
+                           query, 'estimate' reads them from the planner statistics and 'none' skips them.
+
     Attributes:
         default_limit (int): Overrides the global 'PAGE_SIZE' setting from DRF if set. Defines the default number 
                              of items to display per page. Default is set to 25.
@@ -13,13 +30,17 @@ class CustomPagination(LimitOffsetPagination):
     """
     default_limit = 25
     geom_count = 0  # Initialize attribute to store geom count
+    pagination_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    counts_query_param = 'counts'
+    invalid_cursor_message = 'Invalid cursor'
 
     def paginate_queryset(self, queryset, request, view=None):
         """
         Overrides paginate_queryset to compute the count of Features with non-null 'geom'.
 
-        This method is called before the pagination of the queryset to capture the count of Features
-        with non-null 'geom' and store it in a class attribute for later use.
+        Both counts are computed before the pagination of the queryset, in a single aggregate query
+        (or estimated, or skipped, depending on the 'counts' parameter).
 
         Parameters:
             queryset: The queryset to be paginated.
@@ -29,11 +50,124 @@ class CustomPagination(LimitOffsetPagination):
         Returns:
             list: The list of objects after applying pagination.
         """
-        # Compute the count before pagination
-        self.geom_count = queryset.filter(geom__isnull=False).count()
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+        self.next_cursor = None
+        self.has_next = False
+        self.cursor_mode = request.query_params.get(self.pagination_query_param) == 'cursor'
+
+        # Compute the counts before pagination
+        self.count, self.geom_count = self.get_counts(queryset, request)
+
+        if self.cursor_mode:
+            return self.paginate_queryset_by_cursor(queryset, request)
+
+        if self.count is not None:
+            if self.count > self.limit and self.template is not None:
+                self.display_page_controls = True
+            if self.count == 0 or self.offset > self.count:
+                return []
+            return list(queryset[self.offset:self.offset + self.limit])
+
+        # Without count, one more row is fetched to know if there is a next page
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(page) > self.limit
+        return page[:self.limit]
+
+    def get_counts(self, queryset, request):
+        """
+        Returns the (count, geom_count) tuple for the queryset according to the 'counts' parameter.
+        """
+        counts = request.query_params.get(self.counts_query_param, 'exact')
+        if counts == 'none':
+            return None, None
+        if counts == 'estimate':
+            return (
+                estimate_count(queryset),
+                estimate_count(queryset.filter(geom__isnull=False)),
+            )
+        aggregates = queryset.order_by().aggregate(count=Count('pk'), geom_count=Count('geom'))
+        return aggregates['count'], aggregates['geom_count']
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        """
+        Keyset pagination: the rows following the cursor are selected with a WHERE clause
+        on (ordering column, feature_id) instead of an OFFSET.
+        The queryset must be ordered by one column, then by 'feature_id'.
+        """
+        ordering = queryset.query.order_by[0] if queryset.query.order_by else '-created_on'
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        queryset = queryset.order_by(ordering, 'feature_id').annotate(cursor_value=F(field))
 
-        # Call parent method to perform actual pagination
-        return super().paginate_queryset(queryset, request, view)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_cursor_filter(field, descending, *cursor))
+
+        page = list(queryset[:self.limit + 1])
+        self.has_next = len(page) > self.limit
+        page = page[:self.limit]
+        if self.has_next:
+            self.next_cursor = (page[-1].cursor_value, str(page[-1].feature_id))
+        return page
+
+    @staticmethod
+    def get_cursor_filter(field, descending, value, feature_id):
+        """
+        Selects the rows sorted after (value, feature_id), with PostgreSQL NULL ordering
+        (NULLS LAST in ascending order, NULLS FIRST in descending order).
+        """
+        if value is None:
+            after = Q(**{f'{field}__isnull': True, 'feature_id__gt': feature_id})
+            if descending:
+                after |= Q(**{f'{field}__isnull': False})
+            return after
+        after = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+        after |= Q(**{field: value, 'feature_id__gt': feature_id})
+        if not descending:
+            after |= Q(**{f'{field}__isnull': True})
+        return after
+
+    def encode_cursor(self, cursor):
+        value, feature_id = cursor
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        elif value is not None and not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        data = json.dumps([value, feature_id]).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, feature_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return value, str(uuid.UUID(feature_id))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.cursor_mode:
+            if self.next_cursor is None:
+                return None
+            url = self.request.build_absolute_uri()
+            url = remove_query_param(url, self.offset_query_param)
+            return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_cursor))
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        # Cursor pagination only walks the list forward
+        if self.cursor_mode:
+            return None
+        return super().get_previous_link()
 
     def get_paginated_response(self, data):
         """
@@ -42,6 +176,7 @@ class CustomPagination(LimitOffsetPagination):
         This method extends the standard paginated response by adding the 'geom_count' field, 
         which represents the count of Feature objects with non-null 'geom' fields in the queryset. 
         This additional information is useful for front-end applications, particularly for map-based interfaces.
+        'count' and 'geom_count' are null when the counts are skipped.
 
         Parameters:
             data (list): The list of serialized data objects for the current page.
@@ -59,6 +194,20 @@ class CustomPagination(LimitOffsetPagination):
         })
 
 
+def estimate_count(queryset):
+    """
+    Returns the number of rows estimated by the PostgreSQL planner for the queryset,
+    from the table statistics (pg_class.reltuples and pg_statistic) without scanning it.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
 class SimplePagination(PageNumberPagination):
     """
     Simplified custom pagination class inheriting from PageNumberPagination in Django Rest Framework.
@@ -1,6 +1,6 @@
 from rest_framework import permissions
 
-from geocontrib.models import Authorization
+from geocontrib.permissions import PermissionContext
 
 
 class ProjectPermission(permissions.BasePermission):
@@ -11,4 +11,4 @@ class ProjectPermission(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return Authorization.has_permission(request.user, 'can_update_project', obj)
+        return PermissionContext.for_request(request, obj).has_permission('can_update_project')
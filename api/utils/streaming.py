@@ -0,0 +1,87 @@
+import json
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+# Number of rows fetched at once from the server-side cursor
+STREAM_CHUNK_SIZE = 500
+
+
+def json_dumps(data):
+    """
+    Encode data the same way as DRF's JSONRenderer (compact, unicode, DRF encoder).
+    """
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_serialized(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+    """
+    Serialize the objects one by one while walking the queryset with a server-side cursor,
+    so that only one chunk of model instances is held in memory at a time.
+    """
+    if isinstance(queryset, QuerySet):
+        queryset = queryset.iterator(chunk_size=chunk_size)
+    for instance in queryset:
+        yield serializer_class(instance, **kwargs).data
+
+
+def iter_json_array(items):
+    """
+    Yield the JSON encoding of an iterable as a list, item by item.
+    """
+    yield '['
+    for index, item in enumerate(items):
+        yield (',' if index else '') + json_dumps(item)
+    yield ']'
+
+
+def iter_feature_collection(features):
+    """
+    Yield a GeoJSON FeatureCollection, feature by feature.
+    """
+    yield '{"type":"FeatureCollection","features":'
+    yield from iter_json_array(features)
+    yield '}'
+
+
+def iter_json_seq(items):
+    """
+    Yield a GeoJSON text sequence (RFC 8142): each item is preceded by a record separator
+    and followed by a line feed, so that readers can decode it line by line.
+    """
+    for item in items:
+        yield '\x1e' + json_dumps(item) + '\n'
+
+
+class Counter:
+    """
+    Wrap an iterable and count the items it yields.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.count = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.count += 1
+            yield item
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, so that a csv.writer
+    yields its lines instead of buffering them.
+    """
+
+    def write(self, value):
+        return value
+
+
+def streaming_json_response(chunks, **kwargs):
+    return StreamingHttpResponse(
+        (chunk.encode('utf-8') for chunk in chunks),
+        content_type='application/json',
+        **kwargs
+    )
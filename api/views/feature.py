@@ -1,18 +1,19 @@
 from datetime import datetime
-import json
 import requests
-import csv
-import collections
 from datetime import date
 
 from django.db.models import Q
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+from django.db import connection
 from django.db import transaction
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.gis.geos import Polygon, Polygon, MultiPoint, MultiLineString, MultiPolygon
+from django.contrib.gis.geos import Polygon
 from django.contrib.gis.geos.error import GEOSException
 from django.contrib.gis.db.models import Extent
 from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
@@ -25,15 +26,12 @@ from rest_framework import views
 from rest_framework import viewsets
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework_mvt.views import BaseMVTView
 from rest_framework.views import APIView
 
 from api import logger
 from api.serializers.feature import FeatureDetailedAuthenticatedSerializer
 from api.serializers import FeatureDetailedSerializer
-from api.serializers import FeatureJSONSerializer
 from api.serializers import FeatureGeoJSONSerializer
-from api.serializers import FeatureCSVSerializer
 from api.serializers import FeatureLinkSerializer
 from api.serializers import FeatureListSerializer
 from api.serializers import FeatureSearchSerializer
@@ -41,16 +39,32 @@ from api.serializers import FeatureTypeListSerializer
 from api.serializers import FeatureEventSerializer
 from api.serializers import BboxSerializer
 from api.utils.filters import FeatureTypeFilter
+from api.utils.geojson_sql import annotate_style
+from api.utils.geojson_sql import iter_rendered_feature_collection
+from api.utils.geojson_sql import use_postgis_engine
+from api.utils.mvt_sql import MVT_CONTENT_TYPE
+from api.utils.mvt_sql import parse_pagination
+from api.utils.mvt_sql import parse_tile
+from api.utils.mvt_sql import render_tile
 from api.utils.paginations import CustomPagination
+from api.utils.streaming import Counter
+from api.utils.streaming import iter_feature_collection
+from api.utils.streaming import iter_json_array
+from api.utils.streaming import iter_serialized
+from api.utils.streaming import streaming_json_response
 from api.db_layer_utils import get_pre_recorded_values
 from geocontrib.choices import TYPE_CHOICES
-from geocontrib.models import CustomField
 from geocontrib.models import Event
 from geocontrib.models import Feature
 from geocontrib.models import FeatureLink
 from geocontrib.models import FeatureType
 from geocontrib.models import PreRecordedValues
 from geocontrib.models import Project
+from geocontrib.permissions import PermissionContext
+from geocontrib.utils.export import FeatureExport
+from geocontrib.utils.tiles import TileKey
+from geocontrib.utils.tiles import get_max_zoom
+from geocontrib.utils.tiles import get_tile_cache
 
 
 User = get_user_model()
@@ -95,13 +109,15 @@ class FeatureView(
         project_slug = self.request.query_params.get('project__slug')
         if project_slug:
             project = get_object_or_404(Project, slug=project_slug)
-            queryset = Feature.handy.availables(self.request.user, project)
+            queryset = Feature.handy.availables(
+                self.request.user, project, PermissionContext.for_request(self.request, project))
 
         # Filter by feature type slug if provided
         feature_type_slug = self.request.query_params.get('feature_type__slug')
         if feature_type_slug:
             project = get_object_or_404(FeatureType, slug=feature_type_slug).project
-            queryset = Feature.handy.availables(self.request.user, project)
+            queryset = Feature.handy.availables(
+                self.request.user, project, PermissionContext.for_request(self.request, project))
             queryset = queryset.filter(feature_type__slug=feature_type_slug)
 
         # Raise an error if neither project_slug nor feature_type_slug is provided
@@ -161,13 +177,29 @@ class FeatureView(
         """
         Lists features based on the filters applied in the queryset.
         Supports output formats 'geojson' and 'list'.
+        The default output can be encoded by PostgreSQL with 'engine=postgis'.
         """
         response = {}
         queryset = self.get_queryset()
         format = self.request.query_params.get('output')
-        
+        if format in ('geojson', 'list'):
+            # The color, icon and opacity of the features are computed by PostgreSQL
+            queryset = annotate_style(queryset)
+
+        # Stream the response feature by feature if requested
+        if self.request.query_params.get('stream') == 'true':
+            return self.stream_list(queryset, format)
+
+        # Let PostgreSQL encode the features of the default output
+        if not format and use_postgis_engine(request):
+            return StreamingHttpResponse(
+                iter_rendered_feature_collection(queryset, request.user.is_authenticated),
+                content_type='application/json',
+            )
+
         # Output the response in the requested format
         if format and format == 'geojson':
+            queryset = FeatureDetailedSerializer.setup_eager_loading(queryset)
             response = FeatureDetailedSerializer(
                 queryset,
                 is_authenticated=self.request.user.is_authenticated,
@@ -175,6 +207,7 @@ class FeatureView(
                 context={"request": self.request},
             ).data
         elif format and format == 'list':
+            queryset = FeatureListSerializer.setup_eager_loading(queryset)
             serializers = FeatureListSerializer(
                 queryset,
                 many=True,
@@ -185,6 +218,7 @@ class FeatureView(
                 'count': queryset.count(),
             }
         else:
+            queryset = FeatureGeoJSONSerializer.setup_eager_loading(queryset)
             response = FeatureGeoJSONSerializer(
                 queryset,
                 many=True,
@@ -193,6 +227,41 @@ class FeatureView(
 
         return Response(response)
 
+    def stream_list(self, queryset, format):
+        """
+        Streams the same payloads as list() through a StreamingHttpResponse.
+        The queryset is walked with a server-side cursor and serialized feature by feature,
+        so memory usage does not grow with the number of features.
+        """
+        request = self.request
+        if format and format == 'geojson':
+            features = iter_serialized(
+                FeatureDetailedSerializer.setup_eager_loading(queryset),
+                FeatureDetailedSerializer,
+                is_authenticated=request.user.is_authenticated,
+                context={"request": request},
+            )
+            return streaming_json_response(iter_feature_collection(features))
+        elif format and format == 'list':
+            features = Counter(iter_serialized(
+                FeatureListSerializer.setup_eager_loading(queryset),
+                FeatureListSerializer,
+                context={"request": request},
+            ))
+
+            def chunks():
+                yield '{"features":'
+                yield from iter_json_array(features)
+                yield f',"count":{features.count}}}'
+            return streaming_json_response(chunks())
+
+        features = iter_serialized(
+            FeatureGeoJSONSerializer.setup_eager_loading(queryset),
+            FeatureGeoJSONSerializer,
+            context={'request': request},
+        )
+        return streaming_json_response(iter_feature_collection(features))
+
     @swagger_auto_schema(
         operation_summary="Retrieve a feature",
         tags=["features"]
@@ -350,11 +419,15 @@ class ProjectFeaturePaginated(generics.ListAPIView):
         # Ordering :
         ordering = self.request.query_params.get('ordering') or '-created_on'
         # Fallback ordering by feature_id in case dates are exactly the sames https://redmine.neogeo.fr/issues/23018
-        queryset = Feature.handy.availables(user=self.request.user, project=project).order_by(ordering, 'feature_id')
+        queryset = Feature.handy.availables(
+            user=self.request.user,
+            project=project,
+            context=PermissionContext.for_request(self.request, project)
+        ).order_by(ordering, 'feature_id')
 
-        # Optimize query performance with select_related
-        queryset = queryset.select_related('creator', 'feature_type', 'project')
-        return queryset
+        # Load the relations read by the serializer with the page,
+        # the style of the features being computed by PostgreSQL
+        return self.get_serializer_class().setup_eager_loading(annotate_style(queryset))
 
     @swagger_auto_schema(
         operation_summary="List features for a project",
@@ -403,7 +476,9 @@ class ProjectFeaturePositionInList(views.APIView):
         # Ordering :
         ordering = self.request.query_params.get('ordering') or '-created_on'
         # Fallback ordering by feature_id in case dates are exactly the sames https://redmine.neogeo.fr/issues/23018
-        queryset = Feature.handy.availables(request.user, project).order_by(ordering, 'feature_id')
+        queryset = Feature.handy.availables(
+            request.user, project, PermissionContext.for_request(request, project)
+        ).order_by(ordering, 'feature_id')
         # Filters :
         feature_type_slug = self.request.query_params.get('feature_type_slug')
         status__value = self.request.query_params.get('status')
@@ -419,9 +494,8 @@ class ProjectFeaturePositionInList(views.APIView):
             queryset = queryset.filter(title__icontains=title)
         # Position :
         try:
-            instance = queryset.filter(feature_id=feature_id).first()
-            if instance:
-                position = list(queryset).index(instance)
+            position = self.get_position(queryset, ordering, feature_id)
+            if position is not None:
                 return Response(data=position, status=status.HTTP_200_OK)
             else:
                 return Response(status=status.HTTP_204_NO_CONTENT)
@@ -429,6 +503,24 @@ class ProjectFeaturePositionInList(views.APIView):
             logger.exception("Error occurred while fetching the feature position: %s", e)
             return Response(data={"detail": no_data_msg}, status=status.HTTP_404_NOT_FOUND)
 
+    def get_position(self, queryset, ordering, feature_id):
+        """
+        Compute the 0-based position of a feature in the ordered queryset with ROW_NUMBER(),
+        without loading the features: the window is computed over the whole filtered
+        queryset, then only the row of the requested feature is returned.
+        """
+        positions = queryset.order_by().annotate(
+            position=Window(expression=RowNumber(), order_by=[ordering, 'feature_id'])
+        ).values('feature_id', 'position')
+        sql, params = positions.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT "position" FROM ({sql}) AS positions WHERE positions.feature_id = %s',
+                [*params, str(feature_id)]
+            )
+            row = cursor.fetchone()
+        return row[0] - 1 if row else None
+
 class ProjectFeatureBbox(generics.GenericAPIView):
     """
     Provides the bounding box (bbox) of features within a project, filtered by query parameters.
@@ -459,7 +551,11 @@ class ProjectFeatureBbox(generics.GenericAPIView):
     def get_queryset(self):
         slug = self.kwargs.get('slug')
         project = get_object_or_404(Project, slug=slug)
-        queryset = Feature.handy.availables(user=self.request.user, project=project)
+        queryset = Feature.handy.availables(
+            user=self.request.user,
+            project=project,
+            context=PermissionContext.for_request(self.request, project)
+        )
         return queryset.select_related('creator', 'feature_type', 'project')
 
     @swagger_auto_schema(
@@ -542,83 +638,13 @@ class ProjectFeatureBbox(generics.GenericAPIView):
 
 class ExportFeatureList(views.APIView):
     """
-    Export feature data for a project in JSON, GeoJSON, or CSV format.
+    Export feature data for a project in JSON, GeoJSON, GeoJSON text sequence (RFC 8142) or CSV format.
     """
 
     http_method_names = ['get', ]
 
-    def convert_to_multi_geometry(self, geom, geom_type):
-        """
-        Converts single geometries to their corresponding multi geometries if necessary.
-
-        Parameters:
-        - geom: The geometry to be converted.
-        - geom_type: The type of geometry defined by feature_type.
-
-        Returns:
-        - Geometry: The converted or original geometry.
-        """
-        if geom_type == 'multipoint' and geom.geom_type == 'Point':
-            return MultiPoint([geom])
-        elif geom_type == 'multilinestring' and geom.geom_type == 'LineString':
-            return MultiLineString([geom])
-        elif geom_type == 'multipolygon' and geom.geom_type == 'Polygon':
-            return MultiPolygon([geom])
-        return geom  # Return original geom if no conversion is needed
-
-    def get_csv_headers(self, serializer, feature_type):
-        """
-        Builds and returns headers for the CSV file.
-
-        Parameters:
-        - serializer: The serializer containing the feature data.
-        - feature_type: The feature type object used to determine if additional geographical fields are needed.
-
-        Returns:
-        - List[str]: Column headers for the CSV file.
-        """
-        # Retrieve feature field names from the serializer data
-        featureFieldNames = [*serializer.data[0].keys()]
-        # Get custom field names from the FeatureType model
-        customFieldNames = [custField.name for custField in CustomField.objects.filter(feature_type=feature_type)]
-        # Combine feature field names and custom field names
-        headers = [*featureFieldNames, *customFieldNames]
-        # Remove 'feature_data' and 'geom' fields, as they are not needed in the CSV
-        headers.remove('feature_data')
-        headers.remove('geom')
-        # Add latitude and longitude columns for geographical feature types
-        if feature_type.geom_type != 'none':
-            headers += ['lat', 'lon']
-        return headers
-
-    def prepare_csv_row(self, row, headers, feature_type):
-        """
-        Prepares and returns a single row for the CSV file.
-
-        Parameters:
-        - row: Dict representing a single feature's data.
-        - headers: List of valid headers for the CSV.
-        - feature_type: The feature type object used to determine if geographical data conversion is necessary.
-
-        Returns:
-        - OrderedDict: A single row in the CSV file with only the valid fields.
-        """
-        # Convert geom data to latitude and longitude if the feature type is geographical
-        if feature_type.geom_type != 'none' and 'geom' in row:
-            row['lon'] = row['geom']['coordinates'][0]
-            row['lat'] = row['geom']['coordinates'][1]
-        # Merge feature data with custom field data
-        data = row['feature_data'].items() if row['feature_data'] else []
-        full_row = collections.OrderedDict(list(row.items()) + list(data))
-        # Remove 'geom' and 'feature_data' fields from the row
-        full_row.pop('geom', None)
-        full_row.pop('feature_data', None)
-        # Filter out fields that are not in the CSV headers, in case of custom field deletion (https://redmine.neogeo.fr/issues/23023)
-        filtered_row = {key: full_row[key] for key in headers if key in full_row}
-        return filtered_row
-
     @swagger_auto_schema(
-        operation_summary="Export features in JSON, GeoJSON, or CSV",
+        operation_summary="Export features in JSON, GeoJSON, GeoJSONSeq or CSV",
         tags=["features"],
         responses={
             200: openapi.Response(
@@ -672,7 +698,7 @@ class ExportFeatureList(views.APIView):
                 schema=openapi.Schema(
                     type=openapi.TYPE_OBJECT,
                     properties={
-                        "error": openapi.Schema(type=openapi.TYPE_STRING, example="Le format d'export spécifié est invalide. Doit être parmi: 'json', 'geojson', 'csv'.")
+                        "error": openapi.Schema(type=openapi.TYPE_STRING, example="Le format d'export spécifié est invalide. Doit être parmi: 'json', 'geojson', 'geojsonseq', 'csv'.")
                     }
                 ),
             ),
@@ -709,48 +735,30 @@ class ExportFeatureList(views.APIView):
         except FeatureType.DoesNotExist:
             return Response({"detail": "Le type de signalement n'a pas été trouvé."}, status=status.HTTP_404_NOT_FOUND)
 
-        features = Feature.handy.availables(request.user, project).filter(
-            feature_type=feature_type,
-            # filter out features with a deletion date, since deleted features are not anymore deleted directly from database (https://redmine.neogeo.fr/issues/16246)
-            deletion_on__isnull=True
-        ).order_by("created_on")
-
-        for feature in features:
-            # Convert single geometries to multi-geometries if required by feature_type
-            feature.geom = self.convert_to_multi_geometry(feature.geom, feature_type.geom_type)
-
         format = self.request.query_params.get('format_export', 'geojson')
-
-        if format == 'json':
-            serializer = FeatureJSONSerializer(features, many=True, context={'request': request})
-            response = HttpResponse(json.dumps(serializer.data), content_type='application/json')
-            response['Content-Disposition'] = 'attachment; filename=export_projet.json'
-
-        elif format == 'geojson':
-            serializer = FeatureGeoJSONSerializer(features, many=True, context={'request': request})
-            response = HttpResponse(json.dumps(serializer.data), content_type='application/json')
-            response['Content-Disposition'] = 'attachment; filename=export_projet.geojson'
-
-        elif format == 'csv':
-            serializer = FeatureCSVSerializer(features, many=True, context={'request': request})
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename=export_projet.csv'
-
-            # Prepare CSV headers and initialize a CSV writer
-            headers = self.get_csv_headers(serializer, feature_type)
-            writer = csv.DictWriter(response, fieldnames=headers)
-            writer.writeheader()
-
-            # Write each feature to the CSV file
-            for row in serializer.data:
-                filtered_row = self.prepare_csv_row(row, headers, feature_type)
-                writer.writerow(filtered_row)
-        else:
+        if format not in FeatureExport.serializer_classes:
             return Response(
-                {"error": "Le format d'export spécifié est invalide. Doit être parmi: 'json', 'geojson', 'csv'."},
+                {"error": "Le format d'export spécifié est invalide. Doit être parmi: 'json', 'geojson', 'geojsonseq', 'csv'."},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
+        export = FeatureExport(
+            project, feature_type, format,
+            request=request, context=PermissionContext.for_request(request, project)
+        )
+
+        # Let PostgreSQL encode the features, converting them with ST_Multi if required
+        if format == 'geojson' and use_postgis_engine(request):
+            response = StreamingHttpResponse(
+                iter_rendered_feature_collection(
+                    export.get_queryset(),
+                    request.user.is_authenticated,
+                    multi=feature_type.geom_type.startswith('multi'),
+                ),
+                content_type=export.content_type,
+            )
+        else:
+            response = StreamingHttpResponse(export.iter_chunks(), content_type=export.content_type)
+        response['Content-Disposition'] = f'attachment; filename={ export.filename }'
         return response
 
 
@@ -797,11 +805,13 @@ class FeatureSearch(generics.ListAPIView):
         slug = self.kwargs.get('slug')
         project = get_object_or_404(Project, slug=slug)
 
-        queryset = Feature.handy.availables(user=self.request.user, project=project)
+        queryset = Feature.handy.availables(
+            user=self.request.user,
+            project=project,
+            context=PermissionContext.for_request(self.request, project)
+        )
 
-        queryset = queryset.select_related('creator')
-        queryset = queryset.select_related('feature_type')
-        queryset = queryset.select_related('project')
+        queryset = self.get_serializer_class().setup_eager_loading(queryset)
         # NB filter_queryset() bien appelé par ListModelMixin
         return queryset
 
@@ -848,16 +858,71 @@ class FeatureEventView(views.APIView):
         return Response(data, status=200)
 
 
-class FeatureMVTView(BaseMVTView):
+class FeatureMVTView(views.APIView):
     """
     API endpoint that provides Mapbox Vector Tiles (MVT) for features.
     
     This view handles requests to retrieve features in MVT format, filtered by various query parameters.
+    The tile is rendered in a single query, from the features visible by the user inside the tile.
     """
 
     model = Feature
     geom_col = "geom"
 
+    def get_queryset(self):
+        """
+        Returns the features visible by the user, filtered on the project or feature type
+        given in the query parameters.
+        """
+        # Retrieve project based on slug or ID
+        project_slug = self.request.query_params.get('project__slug')
+        project_id = self.request.query_params.get('project_id')
+        # Retrieve feature type based on slug or ID
+        feature_type_slug = self.request.query_params.get('feature_type__slug')
+        featuretype_id = self.request.query_params.get('featuretype_id')
+
+        # Validate that at least one filtering parameter is provided
+        if not any([feature_type_slug, project_slug, project_id, featuretype_id]):
+            raise ValidationError(detail="Must provide one of the parameters:"
+                                  "project_id, project__slug, featuretype_id or feature_type__slug")
+
+        feature_type = None
+        if feature_type_slug or featuretype_id:
+            qs_kwargs = dict()
+            if feature_type_slug:
+                qs_kwargs["slug"] = feature_type_slug
+            if featuretype_id:
+                qs_kwargs["pk"] = featuretype_id
+            feature_type = get_object_or_404(FeatureType.objects.select_related('project'), **qs_kwargs)
+            project = feature_type.project
+        else:
+            qs_kwargs = dict()
+            if project_slug:
+                qs_kwargs["slug"] = project_slug
+            if project_id:
+                qs_kwargs["id"] = project_id
+            project = get_object_or_404(Project, **qs_kwargs)
+
+        queryset = Feature.handy.availables(
+            self.request.user, project, PermissionContext.for_request(self.request, project))
+        if feature_type is not None:
+            queryset = queryset.filter(feature_type=feature_type)
+        self.project = project
+        self.feature_type = feature_type
+        # Filter out features with a deletion date
+        return queryset.filter(deletion_on__isnull=True)
+
+    def get_tile_key(self, z, x, y, limit, offset):
+        """
+        Key of the tile in the tile cache: the features of the project or of the feature type,
+        as seen by the visibility class of the user.
+        """
+        scope = 'project' if self.feature_type is None else 'feature_type-{}'.format(self.feature_type.pk)
+        visibility = Feature.handy.visibility_class(
+            self.request.user, self.project, PermissionContext.for_request(self.request, self.project))
+        variant = 'all' if limit is None and not offset else '{}-{}'.format(limit, offset)
+        return TileKey(self.project.pk, scope, visibility, z, x, y, variant)
+
     @swagger_auto_schema(
         operation_summary="Retrieve MVT data for features",
         tags=["features"],
@@ -866,6 +931,9 @@ class FeatureMVTView(BaseMVTView):
             openapi.Parameter('project_id', openapi.IN_QUERY, description="ID of the project", type=openapi.TYPE_INTEGER),
             openapi.Parameter('feature_type__slug', openapi.IN_QUERY, description="Slug of the feature type", type=openapi.TYPE_STRING),
             openapi.Parameter('featuretype_id', openapi.IN_QUERY, description="ID of the feature type", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('tile', openapi.IN_QUERY, description="Tile coordinates, as z/x/y", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Maximum number of features in the tile", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('offset', openapi.IN_QUERY, description="Number of features to skip", type=openapi.TYPE_INTEGER),
         ],
         responses={
             status.HTTP_200_OK: openapi.Response(
@@ -901,44 +969,24 @@ class FeatureMVTView(BaseMVTView):
         Retrieve MVT data for features.
         Filters the queryset based on provided query parameters such as project slug, project ID, feature type slug, or feature type ID.
         """
-        
-        # Retrieve project based on slug or ID
-        project_slug = self.request.query_params.get('project__slug')
-        project_id = self.request.query_params.get('project_id')
-        if project_slug or project_id:
-            qs_kwargs = dict()
-            if project_slug:
-                qs_kwargs["slug"] = project_slug
-            if project_id:
-                qs_kwargs["id"] = project_id
-
-            project = get_object_or_404(Project, **qs_kwargs)
-            queryset = Feature.handy.availables(self.request.user, project)
-
-        # Retrieve feature type based on slug or ID
-        feature_type_slug = self.request.query_params.get('feature_type__slug')
-        featuretype_id = self.request.query_params.get('featuretype_id')
-        if feature_type_slug or featuretype_id:
-            project = get_object_or_404(FeatureType,
-                                        slug=feature_type_slug,
-                                        pk=featuretype_id).project
-            queryset = Feature.handy.availables(self.request.user, project)
-            queryset = queryset.filter(feature_type__slug=feature_type_slug, pk=featuretype_id)
-
-        # Validate that at least one filtering parameter is provided
-        if not any([feature_type_slug, project_slug, project_id, featuretype_id]):
-            raise ValidationError(detail="Must provide one of the parameters:"
-                                  "project_id, project__slug, featuretype_id or feature_type__slug")
-        # Filter out features with a deletion date
-        queryset = queryset.filter(deletion_on__isnull=True)
-        
-        # Modify the request to include the primary keys of the filtered queryset
-        if not request.GET._mutable:
-            request.GET._mutable = True
-        request.GET["pk__in"] = queryset.order_by("created_on").values_list("pk", flat=True)
-        
-        # Call the parent class's get method to continue the response process
-        return super().get(request, *args, **kwargs)
+        queryset = self.get_queryset()
+        z, x, y = parse_tile(request.query_params.get('tile'))
+        limit, offset = parse_pagination(
+            request.query_params.get('limit'), request.query_params.get('offset'))
+
+        def render():
+            # The permission filters are part of the tile query, instead of a list of identifiers
+            return render_tile(
+                annotate_style(queryset).order_by('created_on'), z, x, y,
+                geom_col=self.geom_col, limit=limit, offset=offset)
+
+        tile_cache = get_tile_cache()
+        if tile_cache is None or z > get_max_zoom():
+            return HttpResponse(render(), content_type=MVT_CONTENT_TYPE)
+        mvt, hit = tile_cache.fetch(self.get_tile_key(z, x, y, limit, offset), render)
+        response = HttpResponse(mvt, content_type=MVT_CONTENT_TYPE)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
 
 
 class GetIdgoCatalogView(views.APIView):
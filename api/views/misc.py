@@ -1,4 +1,6 @@
 from django.contrib.gis.geos import GEOSGeometry
+from django.http import FileResponse
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
@@ -8,6 +10,7 @@ from rest_framework import mixins
 from rest_framework import permissions
 from rest_framework import views
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
@@ -15,16 +18,19 @@ from api.serializers import FeatureAttachmentSerializer
 from api.serializers import CommentSerializer
 from api.serializers import CommentDetailedSerializer
 from api.serializers import EventSerializer
+from api.serializers import ExportTaskSerializer
 from api.serializers import ImportTaskSerializer
 from geocontrib.exif import exif
 from geocontrib.models import Attachment
-from geocontrib.models import Authorization
 from geocontrib.models import Comment
 from geocontrib.models import Event
 from geocontrib.models import Feature
 from geocontrib.models import FeatureType
 from geocontrib.models import Project
+from geocontrib.models.task import ExportTask
 from geocontrib.models.task import ImportTask
+from geocontrib.permissions import PermissionContext
+from geocontrib.tasks import task_export_processing
 from geocontrib.tasks import task_geojson_processing, task_csv_processing
 
 
@@ -111,6 +117,105 @@ class ImportTaskSearch(
         return queryset
 
 
+class ExportTaskView(
+        mixins.CreateModelMixin,
+        mixins.ListModelMixin,
+        mixins.RetrieveModelMixin,
+        viewsets.GenericViewSet):
+    """
+    Allows the creation, follow-up and download of asynchronous feature exports.
+    """
+
+    queryset = ExportTask.objects.all()
+    serializer_class = ExportTaskSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post']
+
+    @swagger_auto_schema(
+        operation_summary="List tasks for features export",
+        tags=["misc"]
+    )
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieve a list of the export tasks of the user with optional filters.
+        """
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Retrieve a task for features export",
+        tags=["misc"]
+    )
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve the status and progress of an export task.
+        """
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Create a new task for features export",
+        tags=["misc"]
+    )
+    def create(self, request, *args, **kwargs):
+        """
+        Create an export task for a feature type, or return the identical task still in progress.
+        """
+        feature_type = get_object_or_404(FeatureType, slug=request.data.get('feature_type_slug'))
+        format = request.data.get('format_export', 'geojson')
+        if format not in dict(ExportTask.FORMAT_CHOICES):
+            return Response(
+                {"error": "Le format d'export spécifié est invalide. Doit être parmi: 'json', 'geojson', 'geojsonseq', 'csv'."},
+                status=400,
+            )
+        export_task, created = ExportTask.get_or_create_in_flight(
+            feature_type.project, feature_type, request.user, format)
+        if created:
+            # The worker must find the task: it is only sent once the task is committed
+            transaction.on_commit(
+                lambda: task_export_processing.apply_async(kwargs={'export_task_id': export_task.pk}))
+        serializer = self.get_serializer(export_task)
+        return Response(serializer.data, status=201 if created else 200)
+
+    @swagger_auto_schema(
+        operation_summary="Download the file of a finished export task",
+        tags=["misc"]
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        export_task = self.get_object()
+        if export_task.status != "finished" or not export_task.file or export_task.is_expired:
+            raise exceptions.NotFound("Le fichier d'export n'est pas disponible.")
+        return FileResponse(
+            export_task.file.open('rb'),
+            as_attachment=True,
+            filename=export_task.file.name.split('/')[-1],
+        )
+
+    def filter_queryset(self, queryset):
+        """
+        Apply filters to the queryset based on query parameters.
+        """
+        status = self.request.query_params.get('status')
+        feature_type_slug = self.request.query_params.get('feature_type_slug')
+        project_slug = self.request.query_params.get('project_slug')
+        if project_slug:
+            queryset = queryset.filter(project__slug=project_slug)
+        if status:
+            queryset = queryset.filter(status__icontains=status)
+        if feature_type_slug:
+            queryset = queryset.filter(feature_type__slug=feature_type_slug)
+        return queryset.order_by('-id')
+
+    def get_queryset(self):
+        """
+        Only the export tasks of the user are visible, since their files contain
+        the features the user was allowed to see.
+        """
+        queryset = super().get_queryset().filter(user=self.request.user)
+        queryset = queryset.select_related('feature_type')
+        queryset = queryset.select_related('project')
+        return queryset
+
+
 class ProjectComments(views.APIView):
     queryset = Project.objects.all()
     lookup_field = 'slug'
@@ -124,12 +229,11 @@ class ProjectComments(views.APIView):
     def get(self, request, slug):
         user = self.request.user
         project = self.get_object()
-        permissions = Authorization.all_permissions(user, project)
-
         # On filtre les signalements selon leur statut et l'utilisateur courant
         features = Feature.handy.availables(
             user=user,
-            project=project
+            project=project,
+            context=PermissionContext.for_request(request, project)
         ).order_by('-created_on')
 
         # filter out features with a deletion date, since deleted features are not anymore deleted directly from database (https://redmine.neogeo.fr/issues/16246)
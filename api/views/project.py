@@ -35,9 +35,11 @@ from api.utils.paginations import SimplePagination
 from geocontrib.models import Authorization
 from geocontrib.models import Project
 from geocontrib.models import Subscription
+from geocontrib.models import UserLevelPermission
 from geocontrib.models import FeatureType
 from geocontrib.models import BaseMap
 from geocontrib.models import ProjectAttribute
+from geocontrib.permissions import PermissionContext
 
 
 User = get_user_model()
@@ -90,7 +92,7 @@ class ProjectView(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         slug = self.kwargs.get('slug')
         project = get_object_or_404(Project, slug=slug)
-        perms = Authorization.all_permissions(self.request.user, project)
+        perms = PermissionContext.for_request(self.request, project).permissions
         if perms and (self.request.user.is_superuser or perms['is_project_administrator']):
             return super().destroy(request, *args, **kwargs)
         raise exceptions.PermissionDenied
@@ -102,7 +104,7 @@ class ProjectView(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         slug = self.kwargs.get('slug')
         project = get_object_or_404(Project, slug=slug)
-        perms = Authorization.all_permissions(self.request.user, project)
+        perms = PermissionContext.for_request(self.request, project).permissions
         if perms and (self.request.user.is_superuser or perms['is_project_administrator']):
             return super().update(request, *args, **kwargs)
         raise exceptions.PermissionDenied
@@ -228,10 +230,10 @@ class ProjectDuplicate(APIView):
         """
         copy_related = self.PROJECT_COPY_RELATED.get('AUTHORIZATION', False)
         if project_template and isinstance(project_template, Project) and copy_related:
-            for auth in instance.authorization_set.exclude(user=instance.creator):
-                auth.level = Authorization.objects.get(
-                    user=auth.user, project=project_template).level
-                auth.save()
+            # Seules les autorisations différentes du rang par défaut sont stockées
+            for auth in project_template.authorization_set.exclude(user=instance.creator):
+                Authorization.objects.update_or_create(
+                    project=instance, user=auth.user, defaults={'level': auth.level})
 
     def _set_creator(self, instance):
         """
@@ -295,6 +297,29 @@ class ProjectAuthorizationView(generics.ListAPIView, generics.UpdateAPIView):
         instance = self.get_object()
         return self.queryset.filter(project=instance)
 
+    def get_implicit_authorizations(self, project):
+        """
+        Unsaved authorizations of the users without a stored authorization on the project,
+        at their default level (cf. Authorization.get_default_rank): they are not stored,
+        but still listed as members of the project.
+        """
+        registry = UserLevelPermission.registry()
+        level_filter = AuthorizationLevelCodenameFilter()
+        authorizations = []
+        for user in User.objects.exclude(authorization__project=project).order_by('pk'):
+            level = registry.get(rank=Authorization.get_default_rank(user))
+            if level_filter.accepts(self.request, level.user_type_id):
+                authorizations.append(Authorization(project=project, user=user, level=level))
+        return authorizations
+
+    def list(self, request, *args, **kwargs):
+        authorizations = list(self.filter_queryset(self.get_queryset()))
+        authorizations += self.get_implicit_authorizations(self.get_object())
+        page = self.paginate_queryset(authorizations)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(authorizations, many=True).data)
+
     def put(self, request, *args, **kwargs):
         instance = self.get_object()
         self.check_object_permissions(self.request, instance)
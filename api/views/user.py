@@ -16,7 +16,6 @@ from api.serializers import UserLevelsPermissionSerializer
 from api.serializers import GeneratedTokenSerializer
 from api.serializers.user import UserSerializer as DetailedUserSerializer
 from geocontrib.models import Authorization
-from geocontrib.models import Project
 from geocontrib.models import UserLevelPermission
 from geocontrib.models import GeneratedToken
 
@@ -435,10 +434,7 @@ class UserPermissionsView(views.APIView):
 
         The key is the project slug, and the value is a list of permissions for that project.
         """
-        data = {}
-        user = request.user
-        for project in Project.objects.all():
-            data[project.slug] = Authorization.all_permissions(user, project)
+        data = Authorization.get_user_permissions_projects(request.user)
         return Response(data=data, status=200)
 
 class UserLevelsPermission(
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import json
 import os
 from decouple import config, Csv
 
@@ -292,6 +293,46 @@ CELERY_TASK_SERIALIZER = config('CELERY_TASK_SERIALIZER', default='json')
 
 CELERY_RESULT_SERIALIZER = config('CELERY_RESULT_SERIALIZER', default='json')
 
+# Durée (secondes) d'utilisation des champs personnalisés gardés en mémoire avant
+# de revérifier leur version en base (cf. geocontrib.schemas.FeatureTypeSchema)
+FEATURE_TYPE_SCHEMA_TTL = config('FEATURE_TYPE_SCHEMA_TTL', default=5, cast=int)
+
+# Durée de conservation des fichiers d'export asynchrone (cf. task_purge_export_tasks,
+# tâche périodique "Geocontrib Purge Export Tasks" exécutée chaque nuit par Celery beat)
+EXPORT_TASK_RETENTION_DAYS = config('EXPORT_TASK_RETENTION_DAYS', default=7, cast=int)
+# Durée (minutes) au-delà de laquelle une tâche d'export en cours est considérée comme interrompue
+EXPORT_TASK_TIMEOUT_MINUTES = config('EXPORT_TASK_TIMEOUT_MINUTES', default=60, cast=int)
+
+# Cache des tuiles vectorielles (cf. geocontrib.utils.tiles), désactivé si vide:
+# 'geocontrib.utils.tiles.FileSystemTileCache' (fichiers dans MVT_CACHE_DIR, un seul serveur)
+# ou 'geocontrib.utils.tiles.DjangoTileCache' (cache Django MVT_CACHE_ALIAS partagé entre serveurs)
+MVT_CACHE_BACKEND = config('MVT_CACHE_BACKEND', default='')
+MVT_CACHE_DIR = config('MVT_CACHE_DIR', default=os.path.join(BASE_DIR, 'mvt_cache'))
+# Le cache MVT_CACHE_ALIAS doit être partagé entre les processus (Redis, Memcached...):
+# DjangoTileCache refuse un cache local (LocMemCache, DummyCache)
+MVT_CACHE_ALIAS = config('MVT_CACHE_ALIAS', default='mvt')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'mvt': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('MVT_CACHE_LOCATION', default=f'redis://{ REDIS_HOST }:6379/1'),
+    },
+}
+MVT_CACHE_TIMEOUT = config('MVT_CACHE_TIMEOUT', default=86400, cast=int)
+# Les tuiles de niveau de zoom supérieur ne sont pas mises en cache
+MVT_CACHE_MAX_ZOOM = config('MVT_CACHE_MAX_ZOOM', default=18, cast=int)
+# Niveau de zoom maximal des tuiles pré-générées pour les projets publics (cf. task_prerender_tiles,
+# tâche périodique "Geocontrib Prerender Tiles" exécutée toutes les 10 minutes par Celery beat)
+MVT_PRERENDER_MAX_ZOOM = config('MVT_PRERENDER_MAX_ZOOM', default=8, cast=int)
+# Simplification des géométries des tuiles, en unités de la grille de la tuile (0 pour la désactiver)
+MVT_SIMPLIFY_TOLERANCE = config('MVT_SIMPLIFY_TOLERANCE', default=1.0, cast=float)
+# Attributs des tuiles par niveau de zoom minimal, en JSON (tous les attributs par défaut), par exemple:
+# {"0": ["feature_id", "feature_type", "color"], "12": null}
+# Les tuiles en cache doivent être purgées après un changement (tile_cache --purge-all)
+MVT_ZOOM_ATTRIBUTES = config('MVT_ZOOM_ATTRIBUTES', default='{}', cast=json.loads)
+
 MAGIC_IS_AVAILABLE = config('MAGIC_IS_AVAILABLE', default=True, cast=bool)  # File image validation (@seb / install IdeoBFC)
 
 # Import features from datasud
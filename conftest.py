@@ -20,6 +20,14 @@ def api_client():
     return APIClient()
 
 
+@pytest.fixture(autouse=True)
+def clear_feature_type_schemas():
+    # Les transactions des tests sont annulées sans on_commit: les schémas gardés
+    # en mémoire par le processus ne doivent pas passer d'un test à l'autre
+    from geocontrib.schemas import _schemas
+    _schemas.clear()
+
+
 @pytest.fixture(scope='session')
 def celery_worker_parameters():
     # type: () -> Mapping[str, Any]
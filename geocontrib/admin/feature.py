@@ -8,13 +8,16 @@ from django.contrib.auth import get_user_model
 from django.contrib.gis import admin
 from django.contrib.postgres.aggregates import StringAgg
 from django.db import connections
+from django.db import transaction
 from django.db.models import CharField, OuterRef, Subquery, F
+from django.db.models.signals import post_save
 from django.forms import formset_factory
 from django.forms import modelformset_factory
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
 from django.template.response import TemplateResponse
 from django.urls import path
+from django.utils import timezone
 from django_admin_listfilter_dropdown.filters import DropdownFilter
 from django_admin_listfilter_dropdown.filters import RelatedDropdownFilter
 
@@ -34,8 +37,10 @@ from geocontrib.models import CustomField
 from geocontrib.models import Feature
 from geocontrib.models import FeatureLink
 from geocontrib.models import FeatureType
+from geocontrib.models import ExportTask
 from geocontrib.models import ImportTask
 from geocontrib.models import PreRecordedValues
+from geocontrib.signals import bulk_operation
 from geocontrib.tasks import task_geojson_processing
 
 
@@ -319,24 +324,41 @@ class FeatureAdmin(admin.ModelAdmin):
     contributeurs.short_description = "Contributeurs"
     contributeurs.admin_order_field = 'creator__username'
 
+    def update_features(self, request, queryset, **values):
+        """
+        Met à jour les signalements sélectionnés en une requête, puis génère leurs évènements
+        en une opération groupée, comme si chacun avait été enregistré par l'utilisateur.
+        """
+        values.update(last_editor=request.user, updated_on=timezone.now())
+        with transaction.atomic(), bulk_operation():
+            features = list(queryset.select_related('project', 'feature_type'))
+            Feature.objects.filter(pk__in=[feature.pk for feature in features]).update(**values)
+            for feature in features:
+                for field, value in values.items():
+                    setattr(feature, field, value)
+                post_save.send(
+                    sender=Feature, instance=feature, created=False,
+                    update_fields=list(values), raw=False, using=Feature.objects.db,
+                )
+
     def to_draft(self, request, queryset):
-        queryset.update(status='draft')
+        self.update_features(request, queryset, status='draft')
     to_draft.short_description = "Changer status à Brouillon"
 
     def to_pending(self, request, queryset):
-        queryset.update(status='pending')
+        self.update_features(request, queryset, status='pending')
     to_pending.short_description = "Changer status à 'En attente de publication'"
 
     def to_published(self, request, queryset):
-        queryset.update(status='published')
+        self.update_features(request, queryset, status='published')
     to_published.short_description = "Changer status à Publié"
 
     def to_archived(self, request, queryset):
-        queryset.update(status='archived')
+        self.update_features(request, queryset, status='archived')
     to_archived.short_description = "Changer status à Archivé"
 
     def to_erased(self, request, queryset):
-        queryset.update(deletion_on=date.today())
+        self.update_features(request, queryset, deletion_on=date.today())
     to_erased.short_description = "Supprimer les signalements sélectionnés"
 
     def change_view(self, request, object_id, form_url='', extra_context=None):
@@ -513,6 +535,11 @@ class ImportTaskAdmin(admin.ModelAdmin):
     import_geojson.short_description = "Appliquer les opérations d'import"
 
 
+class ExportTaskAdmin(admin.ModelAdmin):
+    list_display = ('feature_type', 'format', 'user', 'status', 'created_on', 'expires_on')
+    list_filter = ('status', 'format')
+
+
 class AttachmentAdmin(admin.ModelAdmin):
     list_display=('title', 'project')
 
@@ -527,6 +554,7 @@ admin.site.register(Feature, FeatureAdmin)
 admin.site.register(FeatureType, FeatureTypeAdmin)
 admin.site.register(FeatureLink, FeatureLinkAdmin)
 admin.site.register(ImportTask, ImportTaskAdmin)
+admin.site.register(ExportTask, ExportTaskAdmin)
 admin.site.register(Attachment, AttachmentAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(PreRecordedValues)
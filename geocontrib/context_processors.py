@@ -1,6 +1,7 @@
 import logging
 
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 
 from geocontrib.models import Authorization
 
@@ -14,13 +15,15 @@ def login_url():
     return "cas_ng_login" if hasattr(settings, "CAS_SERVER_URL") else "geocontrib:login"
 
 
-def custom_contexts(request):
+def user_level_projects(user):
     try:
-        user_level_projects = Authorization.get_user_level_projects(request.user)
+        return Authorization.get_user_level_projects(user)
     except Exception:
-        user_level_projects = {}
         logger.exception('Cannot retrieve user level project')
+        return {}
+
 
+def custom_contexts(request):
     return {
         'APPLICATION_NAME': settings.APPLICATION_NAME,
         'LOGO_PATH': settings.LOGO_PATH,
@@ -28,7 +31,7 @@ def custom_contexts(request):
         'FAVICON_PATH': settings.FAVICON_PATH,
         'IMAGE_FORMAT': settings.IMAGE_FORMAT,
         'FILE_MAX_SIZE': settings.FILE_MAX_SIZE,
-        'USER_LEVEL_PROJECTS': user_level_projects,
+        'USER_LEVEL_PROJECTS': SimpleLazyObject(lambda: user_level_projects(request.user)),
         'SERVICE': settings.DEFAULT_BASE_MAP.get('SERVICE'),
         'OPTIONS': settings.DEFAULT_BASE_MAP.get('OPTIONS'),
         'DEFAULT_MAP_VIEW': settings.DEFAULT_MAP_VIEW,
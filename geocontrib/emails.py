@@ -86,6 +86,40 @@ def notif_moderators_pending_features(emails, context):
     email.send()
 
 
+def notif_moderators_pending_features_list(emails, context):
+    project = context['project']
+    features = context['features']
+
+    context['features_urls'] = [
+        (feature, urljoin(BASE_URL, feature.get_absolute_url())) for feature in features
+    ]
+
+    try:
+        # Fetch the customizable notification template from the database, which allow the administrator to edit the email body header.
+        notification_model = NotificationModel.objects.get(template_name="Signalement à modérer")
+        # the template is written for a single feature: it receives the first one, the email body lists them all
+        data = Context({
+            'application_name': settings.APPLICATION_NAME,
+            'event_initiator': context['event_initiator'],
+            'project_slug': project.slug,
+            'project_name': project.title,
+            'feature': features[0],
+            'features': features,
+        })
+        subject = Template(notification_model.subject).render(data)
+        context['message'] = Template(notification_model.message).render(data)
+    except ObjectDoesNotExist:
+        subject = "[GéoContrib:{project_slug}] {count} signalements sont en attente de publication.".format(
+            project_slug=project.slug, count=len(features)
+        )
+    # Send the email using the EmailBaseBuilder
+    email = EmailBaseBuilder(
+        context=context, bcc=emails, subject=subject,
+        template='geocontrib/email/notif_moderators_pending_features_list.html')
+
+    email.send()
+
+
 def notif_creator_published_feature(emails, context):
     feature = context['feature']
 
@@ -1,29 +1,21 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
+from django.db.models import Q
 
 from geocontrib.models import Authorization
-from geocontrib.models import Project
-from geocontrib.models import UserLevelPermission
 
 import logging
 
 logger = logging.getLogger(__name__)
-User = get_user_model()
 
 
 class Command(BaseCommand):
-    help = """Permet de donner un role à tous les utilisateurs pour tous les projets"""
+    help = """Supprime les autorisations redondantes avec le rang implicite des utilisateurs
+    (utilisateur connecté pour les utilisateurs actifs, anonyme pour les inactifs)"""
 
     def handle(self, *args, **options):
-        connected = UserLevelPermission.objects.get(rank=1)
-        for user in User.objects.filter(is_active=True):
-            for project in Project.objects.all():
-                auth, created = Authorization.objects.get_or_create(
-                    project=project,
-                    user=user,
-                    defaults={'level': connected}
-                )
-                if created:
-                    logger.info("user {} added to {}".format(user.username, project.title))
+        deleted, _ = Authorization.objects.filter(
+            Q(user__is_active=True, level__rank=1) | Q(user__is_active=False, level__rank=0)
+        ).delete()
+        logger.info("{} redundant authorizations deleted".format(deleted))
 
         logger.info('Tasks succeessed! ')
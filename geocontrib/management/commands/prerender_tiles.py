@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from geocontrib.models import Project
+from geocontrib.tasks import task_prerender_tiles
+from geocontrib.utils.tiles import get_prerender_max_zoom
+from geocontrib.utils.tiles import get_tile_cache
+from geocontrib.utils.tiles import prerender_project_tiles
+
+
+class Command(BaseCommand):
+    """
+    Pre-renders into the tile cache the vector tiles of public projects, as seen by anonymous
+    users, from z0 down to MVT_PRERENDER_MAX_ZOOM. Only the tiles which are not cached
+    are rendered: run periodically, the command only renders the tiles invalidated by the
+    edits since its previous run.
+    """
+
+    help = """Pré-génère dans le cache la pyramide des tuiles vectorielles des projets publics"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', metavar='PROJECT_SLUG', action='append', default=[],
+                            help='Slug of a project to pre-render (can be repeated, all projects by default)')
+        parser.add_argument('--max-zoom', type=int, required=False,
+                            help='Highest zoom level to pre-render (MVT_PRERENDER_MAX_ZOOM by default)')
+        parser.add_argument('--async', action='store_true', dest='run_async',
+                            help='Run the pre-rendering in a Celery task')
+
+    def handle(self, *args, **options):
+        if get_tile_cache() is None:
+            raise CommandError("The tile cache is disabled (MVT_CACHE_BACKEND is empty)")
+        projects = Project.objects.all()
+        if options['project']:
+            projects = projects.filter(slug__in=options['project'])
+            unknown = set(options['project']) - set(projects.values_list('slug', flat=True))
+            if unknown:
+                raise CommandError("Unknown project(s): {}".format(', '.join(sorted(unknown))))
+        max_zoom = options['max_zoom']
+
+        for project in projects:
+            if options['run_async']:
+                task_prerender_tiles.delay(project.pk, max_zoom)
+                self.stdout.write("Pre-rendering of project {} queued".format(project.slug))
+                continue
+            counts = prerender_project_tiles(project, max_zoom=max_zoom)
+            if counts is None:
+                self.stdout.write("Project {} skipped: its features are not public".format(project.slug))
+            else:
+                self.stdout.write("Project {}: {} tiles rendered, {} already cached (z0 to z{})".format(
+                    project.slug, *counts, get_prerender_max_zoom() if max_zoom is None else max_zoom))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from geocontrib.models import Project
+from geocontrib.utils.tiles import get_stats
+from geocontrib.utils.tiles import get_tile_cache
+from geocontrib.utils.tiles import reset_stats
+
+
+class Command(BaseCommand):
+    """
+    Administration of the vector tiles cache (cf. geocontrib.utils.tiles):
+    purges the cached tiles of projects, and shows or resets the hit/miss counters.
+    """
+
+    help = """Vide le cache des tuiles vectorielles d'un projet, et affiche ses compteurs de succès et d'échecs"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--purge', metavar='PROJECT_SLUG', action='append', default=[],
+                            help='Slug of a project whose tiles are purged (can be repeated)')
+        parser.add_argument('--purge-all', action='store_true',
+                            help='Purge the tiles of all the projects')
+        parser.add_argument('--reset-stats', action='store_true',
+                            help='Reset the hit/miss counters')
+
+    def handle(self, *args, **options):
+        tile_cache = get_tile_cache()
+        if tile_cache is None and (options['purge'] or options['purge_all']):
+            raise CommandError("The tile cache is disabled (MVT_CACHE_BACKEND is empty)")
+
+        if options['purge_all']:
+            projects = Project.objects.all()
+        else:
+            projects = Project.objects.filter(slug__in=options['purge'])
+            unknown = set(options['purge']) - set(projects.values_list('slug', flat=True))
+            if unknown:
+                raise CommandError("Unknown project(s): {}".format(', '.join(sorted(unknown))))
+        for project in projects:
+            tile_cache.purge(project.pk)
+            self.stdout.write("Tiles of project {} purged".format(project.slug))
+
+        stats = get_stats(tile_cache)
+        ratio = '-' if stats['hit_ratio'] is None else '{:.1%}'.format(stats['hit_ratio'])
+        self.stdout.write("Hits: {hits}, misses: {misses}, hit ratio: {ratio}".format(ratio=ratio, **stats))
+        if options['reset_stats']:
+            reset_stats(tile_cache)
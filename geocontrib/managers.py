@@ -2,6 +2,7 @@ from django.db import models
 from django.db.models import Q, When, Case, CharField, Value
 from django.apps import apps
 from geocontrib.choices import MODERATOR, SUPER_CONTRIBUTOR
+from geocontrib.permissions import PermissionContext
 
 
 class AvailableFeaturesManager(models.Manager):
@@ -13,21 +14,27 @@ class AvailableFeaturesManager(models.Manager):
         queryset = queryset.select_related('project')
         return queryset
 
-    def availables(self, user, project):
-        Authorization = apps.get_model(app_label='geocontrib', model_name='Authorization')
+    def availables(self, user, project, context=None):
+        """
+        Retourne les signalements du projet visibles par l'utilisateur.
+        Un PermissionContext peut être fourni pour réutiliser les permissions
+        déjà résolues pendant la requête.
+        """
         UserLevelPermission = apps.get_model(app_label='geocontrib', model_name='UserLevelPermission')
         queryset = self.get_queryset().filter(project=project)
 
-        user_rank = Authorization.get_rank(user, project)
-        project_arch_rank = project.access_level_arch_feature.rank
-        project_pub_rank = project.access_level_pub_feature.rank
-        moderateur_rank = UserLevelPermission.objects.get(user_type_id=MODERATOR).rank
-        supercontributeur_rank = UserLevelPermission.objects.get(user_type_id=SUPER_CONTRIBUTOR).rank
+        context = PermissionContext.resolve(user, project, context)
+        user_rank = context.rank
+        project_arch_rank = context.arch_rank
+        project_pub_rank = context.pub_rank
+        ranks = UserLevelPermission.registry().ranks
+        moderateur_rank = ranks[MODERATOR]
+        supercontributeur_rank = ranks[SUPER_CONTRIBUTOR]
 
         # 0 - si utlisateur anonyme
         if not user.is_authenticated:
-            can_view_published = Authorization.has_permission(user, 'can_view_feature', project)
-            can_view_archived = Authorization.has_permission(user, 'can_view_archived_feature', project)
+            can_view_published = context.has_permission('can_view_feature')
+            can_view_archived = context.has_permission('can_view_archived_feature')
             if can_view_published and can_view_archived:
                 queryset = queryset.filter(Q(status='published') | Q(status='archived'))
             elif can_view_published:
@@ -40,7 +47,7 @@ class AvailableFeaturesManager(models.Manager):
 
         # 1 - si is_project_administrator on liste toutes les features
         # sauf le modérateur, qui par exemple ne doit pas voir les brouillons des autres
-        if Authorization.has_permission(user, 'is_project_administrator', project) \
+        if context.has_permission('is_project_administrator') \
                 and not user_rank == moderateur_rank:
             return queryset
         
@@ -53,8 +60,7 @@ class AvailableFeaturesManager(models.Manager):
         # de tous les signalements qu'il peut voir
         # ("brouillons", "publication en cours", "publiés" ; pour les "archivés" c'est en fonction des paramètres du projet)
         # vers les statuts de "brouillons", "publication en cours".
-        if Authorization.has_permission(
-                user, 'is_project_super_contributor', project):
+        if context.has_permission('is_project_super_contributor'):
             if project.moderation and user_rank < supercontributeur_rank:
                 queryset = queryset.exclude(
                     ~Q(creator=user), status='pending',
@@ -93,6 +99,25 @@ class AvailableFeaturesManager(models.Manager):
 
         return queryset
 
+    def visibility_class(self, user, project, context=None):
+        """
+        Retourne la classe de visibilité de l'utilisateur sur le projet: deux utilisateurs
+        de même classe obtiennent les mêmes signalements avec availables().
+        Les anonymes et les administrateurs du projet partagent une classe; les autres
+        utilisateurs voient aussi leurs propres signalements non publiés, leur classe
+        leur est donc propre.
+        """
+        if not user.is_authenticated:
+            return 'anonymous'
+        context = PermissionContext.resolve(user, project, context)
+        moderateur_rank = apps.get_model(
+            app_label='geocontrib', model_name='UserLevelPermission').registry().ranks[MODERATOR]
+        # Mêmes conditions que availables()
+        if context.has_permission('is_project_administrator') \
+                and not context.rank == moderateur_rank:
+            return 'admin'
+        return 'rank{}-user{}'.format(context.rank, user.pk)
+
 
 class LayerManager(models.Manager):
 
@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import Q
+
+
+def prune_default_authorizations(apps, schema_editor):
+    # Le rang par défaut est désormais implicite (cf. Authorization.get_rank):
+    # "utilisateur connecté" pour les utilisateurs actifs, "anonyme" pour les inactifs.
+    Authorization = apps.get_model('geocontrib', 'Authorization')
+    Authorization.objects.filter(
+        Q(user__is_active=True, level__rank=1) | Q(user__is_active=False, level__rank=0)
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocontrib', '0057_generate_views_for_existing_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(prune_default_authorizations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import geocontrib.models.task
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('geocontrib', '0058_prune_default_authorizations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField(blank=True, null=True, verbose_name='Date de création')),
+                ('started_on', models.DateTimeField(blank=True, null=True, verbose_name='Date de démarrage')),
+                ('finished_on', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin de traîtement')),
+                ('expires_on', models.DateTimeField(blank=True, null=True, verbose_name="Date d'expiration du fichier")),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours'), ('finished', 'Terminé'), ('failed', 'Échoué')], default='pending', max_length=10, verbose_name="Status d'avancement")),
+                ('format', models.CharField(choices=[('json', 'JSON'), ('geojson', 'GeoJSON'), ('csv', 'CSV')], default='geojson', max_length=10, verbose_name="Format d'export")),
+                ('file', models.FileField(blank=True, max_length=255, null=True, upload_to=geocontrib.models.task.ExportTask.export_path, verbose_name='Fichier exporté')),
+                ('total_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Nombre de signalements à exporter')),
+                ('exported_count', models.PositiveIntegerField(default=0, verbose_name='Nombre de signalements exportés')),
+                ('infos', models.TextField(blank=True)),
+                ('feature_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='geocontrib.featuretype')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='geocontrib.project')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Tâche d'export",
+                'verbose_name_plural': "Tâches d'export",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='exporttask',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('pending', 'processing'))), fields=('feature_type', 'user', 'format'), name='unique_export_task_in_flight'),
+        ),
+    ]
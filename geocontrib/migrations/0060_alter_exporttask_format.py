@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocontrib', '0059_exporttask'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exporttask',
+            name='format',
+            field=models.CharField(choices=[('json', 'JSON'), ('geojson', 'GeoJSON'), ('geojsonseq', 'GeoJSONSeq'), ('csv', 'CSV')], default='geojson', max_length=10, verbose_name="Format d'export"),
+        ),
+    ]
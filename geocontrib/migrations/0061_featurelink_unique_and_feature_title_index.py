@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocontrib', '0060_alter_exporttask_format'),
+    ]
+
+    operations = [
+        # Suppression des liaisons en double avant l'ajout de la contrainte d'unicité
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM geocontrib_featurelink link
+                USING geocontrib_featurelink other
+                WHERE link.relation_type = other.relation_type
+                    AND link.feature_from = other.feature_from
+                    AND link.feature_to = other.feature_to
+                    AND link.id > other.id;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='featurelink',
+            constraint=models.UniqueConstraint(fields=('relation_type', 'feature_from', 'feature_to'), name='unique_feature_link'),
+        ),
+        migrations.AddIndex(
+            model_name='feature',
+            index=models.Index(fields=['feature_type', 'title'], name='feature_type_title_idx'),
+        ),
+    ]
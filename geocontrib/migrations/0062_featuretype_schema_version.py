@@ -0,0 +1,18 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocontrib', '0061_featurelink_unique_and_feature_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='featuretype',
+            name='schema_version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, verbose_name='Version des champs personnalisés'),
+        ),
+    ]
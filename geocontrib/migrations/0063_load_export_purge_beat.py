@@ -0,0 +1,21 @@
+from django.db import migrations
+from django.core.management import call_command
+
+
+def load_datas(apps, schema_editor):
+    """
+    Charge la tâche périodique de purge des exports asynchrones (task_purge_export_tasks)
+    sur les installations existantes, comme 0053_load_new_data_notif_beat.
+    """
+    call_command('loaddata', 'geocontrib/data/geocontrib_beat.json')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocontrib', '0062_featuretype_schema_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_datas, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+from django.core.management import call_command
+
+
+def load_datas(apps, schema_editor):
+    """
+    Charge la tâche périodique de pré-génération des tuiles (task_prerender_tiles)
+    sur les installations existantes, comme 0053_load_new_data_notif_beat.
+    """
+    call_command('loaddata', 'geocontrib/data/geocontrib_beat.json')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geocontrib', '0063_load_export_purge_beat'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_datas, migrations.RunPython.noop, elidable=True),
+    ]
@@ -15,6 +15,7 @@ from .feature import PreRecordedValues
 from .project import Project
 from .project import ProjectAttribute
 from .project import ProjectAttributeAssociation
+from .task import ExportTask
 from .task import ImportTask
 from .user import User
 from .user import UserLevelPermission
@@ -31,6 +32,7 @@ __all__ = [
     'Comment',
     'CustomField',
     'Event',
+    'ExportTask',
     'Feature',
     'FeatureLink',
     'FeatureType',
@@ -1,9 +1,12 @@
 import os
 import uuid
+from collections import defaultdict
+from functools import partial
 
 from django.apps import apps
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.db import transaction
 from django.utils import timezone
 
 from geocontrib import logger
@@ -14,6 +17,7 @@ from geocontrib.choices import STATE_CHOICES
 from geocontrib.choices import FREQUENCY_CHOICES
 from geocontrib.choices import MODERATOR
 from geocontrib.emails import notif_moderators_pending_features
+from geocontrib.emails import notif_moderators_pending_features_list
 from geocontrib.emails import notif_creator_published_feature
 
 
@@ -188,56 +192,134 @@ class Event(models.Model):
             - Un utilisateur abonné à un projet est notifié de tout évènement
             (dont il n'est pas à l'origine) sur ce projet.
         """
-        event_initiator = self.user
-
         if self.object_type == 'feature':
             Feature = apps.get_model(app_label='geocontrib', model_name='Feature')
             feature = Feature.objects.get(feature_id=self.feature_id)
-            project = feature.project
-            if project.moderation:
-
-                # On notifie les modérateurs du projet si l'evenement concerne
-                # Un demande de publication d'un signalement
-                feature_status = self.data.get('feature_status', {})
-                status_has_changed = feature_status.get('has_changed', False)
-                new_status = feature_status.get('new_status', 'draft')
-
-                if status_has_changed and new_status == 'pending':
-                    Authorization = apps.get_model(app_label='geocontrib', model_name='Authorization')
-                    UserLevelPermission = apps.get_model(app_label='geocontrib', model_name='UserLevelPermission')
-                    moderateur_rank = UserLevelPermission.objects.get(user_type_id=MODERATOR).rank
-                    moderators__emails = Authorization.objects.filter(
-                        project=project, level__rank__gte=moderateur_rank
-                    ).exclude(
-                        user=event_initiator  # On exclue l'initiateur de l'evenement.
-                    ).values_list('user__email', flat=True)
+            self.notify_feature_users(feature)
 
+    @classmethod
+    def ping_users_by_project(cls, events):
+        """
+        Notifie les utilisateurs comme ping_users() pour les évènements d'une opération groupée:
+        les signalements sont lus en une seule requête, et les demandes de publication
+        sont regroupées en une seule notification des modérateurs par projet et par initiateur.
+        Cette notification est envoyée par une tâche Celery, une fois la transaction validée.
+        """
+        feature_events = [event for event in events if event.object_type == 'feature']
+        if not feature_events:
+            return
+        Feature = apps.get_model(app_label='geocontrib', model_name='Feature')
+        features = Feature.objects.select_related('project', 'creator').in_bulk(
+            {event.feature_id for event in feature_events})
+        pending_features = defaultdict(list)
+        for event in feature_events:
+            feature = features.get(event.feature_id)
+            if feature is None:
+                continue
+            if event.is_pending_request(feature):
+                pending_features[(feature.project_id, event.user_id)].append(str(feature.pk))
+            event.notify_feature_users(feature, notify_moderators=False)
+
+        # Import local: geocontrib.tasks importe les modèles
+        from geocontrib.tasks import task_notify_moderators_pending_features
+        for (project_id, user_id), feature_ids in pending_features.items():
+            kwargs = {
+                'project_id': project_id,
+                'initiator_id': user_id,
+                'feature_ids': feature_ids,
+            }
+            transaction.on_commit(
+                partial(task_notify_moderators_pending_features.apply_async, kwargs=kwargs))
+
+    @classmethod
+    def notify_moderators_pending_features(cls, project, initiator, features):
+        """
+        Notifie en un seul message les modérateurs du projet (hors initiateur)
+        des signalements mis en attente de publication par l'initiateur.
+        """
+        if not features:
+            return
+        moderators__emails = cls.get_moderators_emails(project, initiator)
+        logger.debug(moderators__emails)
+        if not moderators__emails:
+            return
+        context = {
+            'event_initiator': initiator,
+            'application_name': settings.APPLICATION_NAME,
+            'application_abstract': settings.APPLICATION_ABSTRACT,
+        }
+        try:
+            if len(features) == 1:
+                context['feature'] = features[0]
+                notif_moderators_pending_features(
+                    emails=moderators__emails, context=context)
+            else:
+                context['project'] = project
+                context['features'] = features
+                notif_moderators_pending_features_list(
+                    emails=moderators__emails, context=context)
+        except Exception:
+            logger.exception('Event.notify_moderators_pending_features')
+
+    @staticmethod
+    def get_moderators_emails(project, initiator):
+        """
+        Retourne les adresses des modérateurs du projet, hors initiateur de l'évènement.
+        """
+        Authorization = apps.get_model(app_label='geocontrib', model_name='Authorization')
+        UserLevelPermission = apps.get_model(app_label='geocontrib', model_name='UserLevelPermission')
+        moderateur_rank = UserLevelPermission.registry().ranks[MODERATOR]
+        return list(Authorization.objects.filter(
+            project=project, level__rank__gte=moderateur_rank
+        ).exclude(
+            user=initiator  # On exclue l'initiateur de l'evenement.
+        ).values_list('user__email', flat=True))
+
+    def is_pending_request(self, feature):
+        """
+        Indique si l'évènement est une demande de publication d'un signalement
+        d'un projet modéré.
+        """
+        feature_status = self.data.get('feature_status', {})
+        return (
+            feature.project.moderation
+            and feature_status.get('has_changed', False)
+            and feature_status.get('new_status', 'draft') == 'pending'
+        )
+
+    def notify_feature_users(self, feature, notify_moderators=True):
+        """
+        Notifie les modérateurs et l'auteur du signalement de l'évènement (cf. ping_users).
+
+        notify_moderators: faux lorsque les demandes de publication sont notifiées
+        de façon groupée (cf. ping_users_by_project).
+        """
+        event_initiator = self.user
+        project = feature.project
+        if project.moderation:
+
+            feature_status = self.data.get('feature_status', {})
+            status_has_changed = feature_status.get('has_changed', False)
+            new_status = feature_status.get('new_status', 'draft')
+
+            # On notifie les modérateurs du projet si l'evenement concerne
+            # Un demande de publication d'un signalement
+            if notify_moderators and self.is_pending_request(feature):
+                self.notify_moderators_pending_features(project, event_initiator, [feature])
+
+            # On notifie l'auteur du signalement si l'evenement concerne
+            # la publication de son signalement
+            if status_has_changed and new_status == 'published':
+                if event_initiator != feature.creator:
                     context = {
                         'feature': feature,
-                        'event_initiator': event_initiator,
-                        'application_name': settings.APPLICATION_NAME,
-                        'application_abstract': settings.APPLICATION_ABSTRACT,
+                        'event': self
                     }
-                    logger.debug(moderators__emails)
                     try:
-                        notif_moderators_pending_features(
-                            emails=moderators__emails, context=context)
+                        notif_creator_published_feature(
+                            emails=[feature.creator.email, ], context=context)
                     except Exception:
-                        logger.exception('Event.ping_users')
-
-                # On notifie l'auteur du signalement si l'evenement concerne
-                # la publication de son signalement
-                if status_has_changed and new_status == 'published':
-                    if event_initiator != feature.creator:
-                        context = {
-                            'feature': feature,
-                            'event': self
-                        }
-                        try:
-                            notif_creator_published_feature(
-                                emails=[feature.creator.email, ], context=context)
-                        except Exception:
-                            logger.exception('Event.ping_users.notif_creator_published_feature')
+                        logger.exception('Event.ping_users.notif_creator_published_feature')
 
 
 class Subscription(models.Model):
@@ -17,6 +17,7 @@ from geocontrib.choices import TYPE_CHOICES
 from geocontrib.emails import notif_project_member_assigned_feature
 from geocontrib.managers import AvailableFeaturesManager
 from geocontrib.managers import FeatureLinkManager
+from geocontrib.schemas import FeatureTypeSchema
 
 
 class Feature(models.Model):
@@ -75,16 +76,24 @@ class Feature(models.Model):
 
     vector_tiles = MVTManager()
     # temporary property to compare new and old value at update
-    _original_assigned_member = None
+    _original_assigned_member_id = None
+    _original_geom = None
 
     class Meta:
         verbose_name = "Signalement"
         verbose_name_plural = "Signalements"
+        indexes = [
+            # Recherche des doublons après un import
+            models.Index(fields=['feature_type', 'title'], name='feature_type_title_idx'),
+        ]
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # store the previous value to compare with new value (if provided) at update in save method
-        self._original_assigned_member = self.assigned_member
+        # On lit l'identifiant brut (sans requête sur les utilisateurs), s'il n'est pas différé
+        self._original_assigned_member_id = self.__dict__.get('assigned_member_id', models.DEFERRED)
+        # Géométrie chargée, pour invalider les tuiles qu'elle touchait (cf. signals)
+        self._original_geom = self.__dict__.get('geom', models.DEFERRED)
 
     def clean(self):
         """
@@ -106,7 +115,8 @@ class Feature(models.Model):
                 self.geom = None  # Set geom to None if geom_type is 'none'.
 
             # If geom_type is not 'none', ensure that geom field is not empty.
-            elif self.feature_type.geom_type != "none" and self.geom is None:
+            # A deferred geom is not loaded: it is left unchanged in the database.
+            elif self.feature_type.geom_type != "none" and self.__dict__.get('geom', models.DEFERRED) is None:
                 # Raise a ValidationError if geom field is required but empty.
                 raise ValidationError({'geom': 'Ce champ est obligatoire.'})
 
@@ -123,7 +133,8 @@ class Feature(models.Model):
             if self.assigned_member:
                 new_assignement_to_notify = True
         # If the feature is updated and the assigned_member changed: send an email to inform of the modification of the field assigned_member
-        elif self._original_assigned_member != self.assigned_member:
+        elif self._original_assigned_member_id is not models.DEFERRED \
+                and self._original_assigned_member_id != self.assigned_member_id:
             new_assignement_to_notify = True
 
         if new_assignement_to_notify and self.assigned_member is not None:
@@ -139,6 +150,9 @@ class Feature(models.Model):
         # Set the time the feature was updated (or created)
         self.updated_on = timezone.now()
         super().save(*args, **kwargs)
+        # Lus sans charger les champs différés (cf. __init__)
+        self._original_assigned_member_id = self.__dict__.get('assigned_member_id', models.DEFERRED)
+        self._original_geom = self.__dict__.get('geom', models.DEFERRED)
 
     def __str__(self):
         return str(self.title)
@@ -161,19 +175,16 @@ class Feature(models.Model):
 
     @property
     def custom_fields_as_list(self):
-        CustomField = apps.get_model(app_label='geocontrib', model_name="CustomField")
-        custom_fields = CustomField.objects.filter(feature_type=self.feature_type)
         res = []
-        if custom_fields.exists():
-            for row in custom_fields.order_by('position').values('name', 'label', 'field_type'):
-                value = ''
-                if isinstance(self.feature_data, dict):
-                    value = self.feature_data.get(row['name'])
-                res.append({
-                    'label': row['label'],
-                    'field_type': row['field_type'],
-                    'value': value
-                })
+        for field in FeatureTypeSchema.get(self.feature_type_id):
+            value = ''
+            if isinstance(self.feature_data, dict):
+                value = self.feature_data.get(field.name)
+            res.append({
+                'label': field.label,
+                'field_type': field.field_type,
+                'value': value
+            })
         return res
 
     @property
@@ -201,6 +212,14 @@ class Feature(models.Model):
                 color = self.feature_type.color
         return color
 
+    @cached_property
+    def icon(self):
+        return self.feature_type.icon
+
+    @cached_property
+    def opacity(self):
+        return self.feature_type.opacity
+
 
 class FeatureLink(models.Model):
     REL_TYPES = (
@@ -228,6 +247,12 @@ class FeatureLink(models.Model):
     class Meta:
         verbose_name = "Liaison entre signalements"
         verbose_name_plural = "Liaisons entre signalements"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['relation_type', 'feature_from', 'feature_to'],
+                name='unique_feature_link',
+            ),
+        ]
 
     def update_relations(self, relation_type):
         new_relation = relation_type
@@ -298,6 +323,11 @@ class FeatureType(models.Model):
         "Désactiver les notifications", default=False
     )
 
+    # Renouvelé à chaque modification des champs personnalisés (cf. FeatureTypeSchema)
+    schema_version = models.UUIDField(
+        "Version des champs personnalisés", default=uuid.uuid4, editable=False
+    )
+
     class Meta:
         verbose_name = "Type de signalement"
         verbose_name_plural = "Types de signalements"
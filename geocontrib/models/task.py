@@ -1,5 +1,11 @@
+from datetime import timedelta
+from uuid import uuid4
+
 from django.conf import settings
 from django.contrib.gis.db import models
+from django.db import IntegrityError
+from django.db import transaction
+from django.utils import timezone
 
 
 class ImportTask(models.Model):
@@ -50,3 +56,173 @@ class ImportTask(models.Model):
     class Meta:
         verbose_name = "Tâche d'import"
         verbose_name_plural = "Tâches d'import"
+
+
+class ExportTask(models.Model):
+
+    def export_path(instance, filename):
+        user_id = 'anonymous'
+        if hasattr(instance, 'user') and instance.user and instance.user.pk:
+            user_id = instance.user.pk
+        # Le nom du dossier n'est pas devinable, les exports pouvant contenir des signalements privés
+        return "user_{0}/export/{1}/{2}".format(user_id, uuid4().hex, filename)
+
+    STATUS_CHOICES = ImportTask.STATUS_CHOICES
+
+    IN_FLIGHT_STATUS = ("pending", "processing")
+
+    FORMAT_CHOICES = (
+        ("json", "JSON"),
+        ("geojson", "GeoJSON"),
+        ("geojsonseq", "GeoJSONSeq"),
+        ("csv", "CSV"),
+    )
+
+    created_on = models.DateTimeField("Date de création", null=True, blank=True)
+
+    started_on = models.DateTimeField("Date de démarrage", null=True, blank=True)
+
+    finished_on = models.DateTimeField("Date de fin de traîtement", null=True, blank=True)
+
+    expires_on = models.DateTimeField("Date d'expiration du fichier", null=True, blank=True)
+
+    status = models.CharField(
+        "Status d'avancement",
+        choices=STATUS_CHOICES,
+        default="pending",
+        max_length=10,
+    )
+
+    format = models.CharField(
+        "Format d'export",
+        choices=FORMAT_CHOICES,
+        default="geojson",
+        max_length=10,
+    )
+
+    project = models.ForeignKey("geocontrib.Project", on_delete=models.CASCADE)
+
+    feature_type = models.ForeignKey("geocontrib.FeatureType", on_delete=models.CASCADE)
+
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        verbose_name="Utilisateur",
+        on_delete=models.SET_NULL, null=True, blank=True)
+
+    file = models.FileField(
+        "Fichier exporté",
+        upload_to=export_path,
+        max_length=255,
+        blank=True, null=True
+    )
+
+    total_count = models.PositiveIntegerField("Nombre de signalements à exporter", null=True, blank=True)
+
+    exported_count = models.PositiveIntegerField("Nombre de signalements exportés", default=0)
+
+    infos = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Tâche d'export"
+        verbose_name_plural = "Tâches d'export"
+        constraints = [
+            # Une seule tâche en cours par demande identique
+            models.UniqueConstraint(
+                fields=['feature_type', 'user', 'format'],
+                condition=models.Q(status__in=("pending", "processing")),
+                name='unique_export_task_in_flight',
+            ),
+        ]
+
+    @staticmethod
+    def get_retention():
+        """
+        Durée de conservation des fichiers exportés.
+        """
+        return timedelta(days=getattr(settings, 'EXPORT_TASK_RETENTION_DAYS', 7))
+
+    @staticmethod
+    def get_timeout():
+        """
+        Durée au-delà de laquelle une tâche en cours est considérée comme interrompue
+        (worker arrêté, limite de temps atteinte, message perdu par le broker).
+        """
+        return timedelta(minutes=getattr(settings, 'EXPORT_TASK_TIMEOUT_MINUTES', 60))
+
+    @classmethod
+    def fail_stale(cls, **lookup):
+        """
+        Passe en échec les tâches en cours (parmi celles du lookup) démarrées, ou créées
+        si elles n'ont jamais démarré, depuis plus longtemps que get_timeout().
+        Elles expirent aussitôt, pour être supprimées par purge_expired().
+        Retourne le nombre de tâches passées en échec.
+        """
+        now = timezone.now()
+        limit = now - cls.get_timeout()
+        return cls.objects.filter(status__in=cls.IN_FLIGHT_STATUS, **lookup).filter(
+            models.Q(started_on__lt=limit)
+            | models.Q(started_on__isnull=True, created_on__lt=limit)
+            | models.Q(started_on__isnull=True, created_on__isnull=True)
+        ).update(
+            status="failed",
+            infos="Tâche interrompue: aucune fin de traitement après {}".format(cls.get_timeout()),
+            finished_on=now,
+            expires_on=now,
+        )
+
+    @property
+    def is_expired(self):
+        return self.expires_on is not None and self.expires_on <= timezone.now()
+
+    @property
+    def progress(self):
+        if self.status == "finished":
+            return 100
+        if not self.total_count:
+            return 0
+        return min(100, int(100 * self.exported_count / self.total_count))
+
+    @classmethod
+    def get_or_create_in_flight(cls, project, feature_type, user, format):
+        """
+        Retourne la tâche en cours pour une demande identique ou en crée une nouvelle.
+        Le booléen retourné indique si la tâche a été créée et doit être lancée.
+        Une tâche interrompue n'est pas réutilisée (cf. fail_stale()).
+        """
+        cls.fail_stale(feature_type=feature_type, user=user, format=format)
+        lookup = {
+            'project': project,
+            'feature_type': feature_type,
+            'user': user,
+            'format': format,
+            'status__in': cls.IN_FLIGHT_STATUS,
+        }
+        export_task = cls.objects.filter(**lookup).first()
+        if export_task:
+            return export_task, False
+        try:
+            with transaction.atomic():
+                export_task = cls.objects.create(
+                    created_on=timezone.now(),
+                    project=project,
+                    feature_type=feature_type,
+                    user=user,
+                    format=format,
+                )
+        except IntegrityError:
+            # Une demande identique a été enregistrée entre-temps
+            return cls.objects.get(**lookup), False
+        return export_task, True
+
+    @classmethod
+    def purge_expired(cls):
+        """
+        Supprime les tâches expirées et leurs fichiers.
+        """
+        count = 0
+        for export_task in cls.objects.filter(expires_on__lte=timezone.now()).iterator():
+            if export_task.file:
+                export_task.file.delete(save=False)
+            export_task.delete()
+            count += 1
+        return count
@@ -1,11 +1,13 @@
 import uuid
 from enum import Enum, unique
 import hashlib
+from types import MappingProxyType
 
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.gis.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from geocontrib.choices import ALL_LEVELS
@@ -51,6 +53,52 @@ class UserLevelPermission(models.Model):
     def __str__(self):
         return self.get_user_type_id_display()
 
+    @classmethod
+    def registry(cls):
+        """
+        Retourne la table des niveaux, chargée une seule fois par processus
+        et invalidée à l'enregistrement ou à la suppression d'un niveau.
+        """
+        global _level_registry
+        if _level_registry is None:
+            levels = list(cls.objects.all())
+            if not levels:
+                # Table pas encore initialisée (perm.json): on ne garde rien en cache
+                return LevelRegistry(levels)
+            _level_registry = LevelRegistry(levels)
+        return _level_registry
+
+    @classmethod
+    def invalidate_registry(cls):
+        global _level_registry
+        _level_registry = None
+
+
+class LevelRegistry:
+    """
+    Correspondances immuables rang <-> identifiant <-> libellé des niveaux de permission.
+    """
+
+    def __init__(self, levels):
+        self.levels = MappingProxyType({level.rank: level for level in levels})
+        self.ranks = MappingProxyType({level.user_type_id: level.rank for level in levels})
+        self.codenames = MappingProxyType({level.rank: level.user_type_id for level in levels})
+        self.displays = MappingProxyType(
+            {level.rank: level.get_user_type_id_display() for level in levels})
+
+    def get(self, rank=None, user_type_id=None):
+        # Équivalent de UserLevelPermission.objects.get(rank=...|user_type_id=...)
+        if user_type_id is not None:
+            rank = self.ranks.get(user_type_id)
+        try:
+            return self.levels[rank]
+        except KeyError:
+            raise UserLevelPermission.DoesNotExist(
+                "UserLevelPermission matching query does not exist.")
+
+
+_level_registry = None
+
 
 class Authorization(models.Model):
 
@@ -93,29 +141,90 @@ class Authorization(models.Model):
             auth = cls.objects.get(user=user, project=project)
         except Exception:
             # Si pas d'autorisation defini ou utilisateur non connecté
-            user_rank = Rank.LOGGED_USER.value if user.is_authenticated else Rank.ANONYMOUS.value
+            user_rank = cls.get_default_rank(user)
         else:
             user_rank = auth.level.rank
         return user_rank
 
     @classmethod
-    def get_user_level_projects(cls, user):
+    def get_default_rank(cls, user):
+        # Rang implicite d'un utilisateur sans autorisation définie sur un projet:
+        # seules les autorisations différentes de ce rang sont stockées
+        if user.is_authenticated and user.is_active:
+            return Rank.LOGGED_USER.value
+        return Rank.ANONYMOUS.value
+
+    @classmethod
+    def is_default(cls, user, level):
+        return level.rank == cls.get_default_rank(user)
+
+    @classmethod
+    def annotate_user_rank(cls, queryset, user):
+        """
+        Annote un queryset de projets avec le rang de l'utilisateur ('user_rank'),
+        le rang par défaut s'appliquant en l'absence d'autorisation stockée.
+        """
+        if 'user_rank' in queryset.query.annotations:
+            return queryset
+        default_rank = models.Value(cls.get_default_rank(user), models.IntegerField())
+        if not user.is_authenticated:
+            return queryset.annotate(user_rank=default_rank)
+        return queryset.annotate(
+            user_rank=Coalesce(
+                models.Subquery(
+                    cls.objects.filter(
+                        project=models.OuterRef('pk'), user=user
+                    ).values('level__rank')[:1]
+                ),
+                default_rank,
+            )
+        )
+
+    @classmethod
+    def get_projects_ranks(cls, user):
+        """
+        Retourne en une seule requête, pour chaque projet, le rang de l'utilisateur
+        et les rangs minimum d'accès aux signalements publiés et archivés:
+        {slug: (user_rank, pub_rank, arch_rank)}
+        """
         Project = apps.get_model(app_label='geocontrib', model_name="Project")
-        UserLevelPermission = apps.get_model(
-            app_label='geocontrib', model_name="UserLevelPermission")
-        levels = {}
-        for project in Project.objects.all():
-            levels[project.slug] = UserLevelPermission.objects.get(
-                rank=cls.get_rank(user, project)).get_user_type_id_display()
-        return levels
+        rows = cls.annotate_user_rank(Project.objects.all(), user).values_list(
+            'slug', 'user_rank',
+            'access_level_pub_feature__rank', 'access_level_arch_feature__rank')
+        return {
+            slug: (user_rank, pub_rank, arch_rank)
+            for slug, user_rank, pub_rank, arch_rank in rows
+        }
+
+    @classmethod
+    def get_user_level_projects(cls, user):
+        displays = UserLevelPermission.registry().displays
+        return {
+            slug: displays[ranks[0]]
+            for slug, ranks in cls.get_projects_ranks(user).items()
+        }
 
     @classmethod
     def get_user_level_projects_ids(cls, user):
-        Project = apps.get_model(app_label='geocontrib', model_name="Project")
-        level_ids = {}
-        for project in Project.objects.all():
-            level_ids[project.slug] = cls.get_rank(user, project)
-        return level_ids
+        return {
+            slug: ranks[0]
+            for slug, ranks in cls.get_projects_ranks(user).items()
+        }
+
+    @classmethod
+    def get_user_permissions_projects(cls, user):
+        """
+        Construit la matrice {slug: permissions} de l'utilisateur pour tous les projets,
+        avec le même contenu que Authorization.all_permissions() appelé projet par projet.
+        """
+        table = {}
+        permissions = {}
+        for slug, ranks in cls.get_projects_ranks(user).items():
+            # Les permissions ne dépendent que du triplet de rangs: on ne les calcule qu'une fois
+            if ranks not in table:
+                table[ranks] = cls.rank_permissions(user, *ranks)
+            permissions[slug] = dict(table[ranks])
+        return permissions
 
     @classmethod
     def all_permissions(cls, user, project, feature=None):
@@ -127,6 +236,23 @@ class Authorization(models.Model):
         4    MODERATOR = 'moderator'
         5    ADMIN = 'admin'
         """
+        if user.is_authenticated and (user.is_superuser or user.is_administrator):
+            return cls.rank_permissions(user, None, None, None)
+
+        return cls.rank_permissions(
+            user,
+            cls.get_rank(user, project),
+            project.access_level_pub_feature.rank,
+            project.access_level_arch_feature.rank,
+            feature=feature,
+        )
+
+    @classmethod
+    def rank_permissions(cls, user, user_rank, project_rank_min, project_arch_rank_min, feature=None):
+        """
+        Calcule le dictionnaire des permissions à partir des rangs déjà résolus,
+        sans aucune requête en base (hormis feature.creator si non préchargé).
+        """
         user_perms = {
             'can_view_project': False,
             'can_create_project': False,  # Redondant avec user.is_administrator
@@ -149,50 +275,44 @@ class Authorization(models.Model):
                 user_perms[k] = True
             return user_perms
 
-        else:
-            project_rank_min = project.access_level_pub_feature.rank
-            project_arch_rank_min = project.access_level_arch_feature.rank
-
-            user_rank = cls.get_rank(user, project)
-
-            if user_rank >= project_rank_min or project_rank_min == Rank.ANONYMOUS.value:
-                user_perms['can_view_project'] = True
-                user_perms['can_view_feature'] = True
-                user_perms['can_view_feature_type'] = True
-
-            # Les contributeurs et utilisateurs de droits supérieurs peuvent créer des features
-            if user_rank >= Rank.CONTRIBUTOR.value:
-                user_perms['can_create_feature'] = True
-
-            if user_rank == Rank.SUPER_CONTRIBUTOR.value:
-                user_perms['can_update_feature'] = True
-                user_perms['can_publish_feature'] = True
-                user_perms['can_delete_feature'] = True
-                user_perms['is_project_super_contributor'] = True
-
-            if user_rank == Rank.MODERATOR.value:
-                user_perms['can_publish_feature'] = True
-                user_perms['can_create_model'] = True
-                user_perms['is_project_moderator'] = True
-
-            if user_rank == Rank.ADMIN.value:
-                user_perms['can_publish_feature'] = True
-                user_perms['can_update_feature'] = True
-                user_perms['can_delete_feature'] = True
-                user_perms['can_update_project'] = True
-                user_perms['can_create_model'] = True
-                user_perms['can_create_feature_type'] = True
-                user_perms['is_project_moderator'] = True
-                user_perms['is_project_administrator'] = True
-
-            # Visibilité des features archivés
-            if user_rank >= project_arch_rank_min:
-                user_perms['can_view_archived_feature'] = True
-
-            # On permet à son auteur de modifier un feature s'il est encore contributeur
-            # et aux utilisateurs de rangs supérieurs (pour pouvoir modifier le statut
-            if (user_rank >= Rank.CONTRIBUTOR.value and (feature and feature.creator == user)):
-                user_perms['can_update_feature'] = True
+        if user_rank >= project_rank_min or project_rank_min == Rank.ANONYMOUS.value:
+            user_perms['can_view_project'] = True
+            user_perms['can_view_feature'] = True
+            user_perms['can_view_feature_type'] = True
+
+        # Les contributeurs et utilisateurs de droits supérieurs peuvent créer des features
+        if user_rank >= Rank.CONTRIBUTOR.value:
+            user_perms['can_create_feature'] = True
+
+        if user_rank == Rank.SUPER_CONTRIBUTOR.value:
+            user_perms['can_update_feature'] = True
+            user_perms['can_publish_feature'] = True
+            user_perms['can_delete_feature'] = True
+            user_perms['is_project_super_contributor'] = True
+
+        if user_rank == Rank.MODERATOR.value:
+            user_perms['can_publish_feature'] = True
+            user_perms['can_create_model'] = True
+            user_perms['is_project_moderator'] = True
+
+        if user_rank == Rank.ADMIN.value:
+            user_perms['can_publish_feature'] = True
+            user_perms['can_update_feature'] = True
+            user_perms['can_delete_feature'] = True
+            user_perms['can_update_project'] = True
+            user_perms['can_create_model'] = True
+            user_perms['can_create_feature_type'] = True
+            user_perms['is_project_moderator'] = True
+            user_perms['is_project_administrator'] = True
+
+        # Visibilité des features archivés
+        if user_rank >= project_arch_rank_min:
+            user_perms['can_view_archived_feature'] = True
+
+        # On permet à son auteur de modifier un feature s'il est encore contributeur
+        # et aux utilisateurs de rangs supérieurs (pour pouvoir modifier le statut
+        if (user_rank >= Rank.CONTRIBUTOR.value and (feature and feature.creator == user)):
+            user_perms['can_update_feature'] = True
 
         return user_perms
 
@@ -0,0 +1,80 @@
+from django.apps import apps
+from django.utils.functional import cached_property
+
+
+class PermissionContext:
+    """
+    Contexte de permissions d'un utilisateur sur un projet, valable le temps d'une requête.
+
+    Le rang de l'utilisateur, les niveaux d'accès du projet et le dictionnaire complet
+    des permissions ne sont résolus qu'une seule fois, puis relus par
+    AvailableFeaturesManager.availables(), les permissions DRF, les serializers et les vues.
+    """
+
+    def __init__(self, user, project):
+        self.user = user
+        self.project = project
+
+    @classmethod
+    def resolve(cls, user, project, context=None):
+        """
+        Retourne le contexte fourni s'il correspond au projet, sinon un nouveau contexte.
+        """
+        if context is not None and context.project.pk == project.pk:
+            return context
+        return cls(user, project)
+
+    @classmethod
+    def for_request(cls, request, project):
+        """
+        Retourne le contexte associé à la requête pour ce projet, en le créant au besoin.
+        Le cache est porté par la HttpRequest sous-jacente pour être partagé
+        entre la Request DRF et les éventuelles vues Django.
+        """
+        user = request.user
+        http_request = getattr(request, '_request', request)
+        contexts = http_request.__dict__.setdefault('_permission_contexts', {})
+        key = (getattr(user, 'pk', None), project.pk)
+        if key not in contexts:
+            contexts[key] = cls(user, project)
+        return contexts[key]
+
+    @property
+    def is_privileged(self):
+        return self.user.is_authenticated and (self.user.is_superuser or self.user.is_administrator)
+
+    @cached_property
+    def rank(self):
+        Authorization = apps.get_model(app_label='geocontrib', model_name='Authorization')
+        return Authorization.get_rank(self.user, self.project)
+
+    @cached_property
+    def pub_rank(self):
+        return self.project.access_level_pub_feature.rank
+
+    @cached_property
+    def arch_rank(self):
+        return self.project.access_level_arch_feature.rank
+
+    @cached_property
+    def permissions(self):
+        Authorization = apps.get_model(app_label='geocontrib', model_name='Authorization')
+        if self.is_privileged:
+            return Authorization.rank_permissions(self.user, None, None, None)
+        return Authorization.rank_permissions(
+            self.user, self.rank, self.pub_rank, self.arch_rank)
+
+    def all_permissions(self, feature=None):
+        """
+        Équivalent de Authorization.all_permissions() sans nouvelle requête.
+        """
+        if feature is None or self.is_privileged:
+            return dict(self.permissions)
+        Authorization = apps.get_model(app_label='geocontrib', model_name='Authorization')
+        return Authorization.rank_permissions(
+            self.user, self.rank, self.pub_rank, self.arch_rank, feature=feature)
+
+    def has_permission(self, permission, feature=None):
+        if feature is None:
+            return self.permissions.get(permission, False)
+        return self.all_permissions(feature).get(permission, False)
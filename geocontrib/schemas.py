@@ -0,0 +1,103 @@
+from collections import namedtuple
+import time
+from types import MappingProxyType
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+
+CustomFieldSchema = namedtuple('CustomFieldSchema', [
+    'name', 'label', 'field_type', 'options', 'is_mandatory', 'position',
+])
+
+# Schémas compilés par type de signalement, propres au processus
+_schemas = {}
+
+
+def get_schema_ttl():
+    """
+    Durée (en secondes) pendant laquelle un schéma gardé en mémoire est utilisé
+    sans relire sa version en base.
+    """
+    return getattr(settings, 'FEATURE_TYPE_SCHEMA_TTL', 5)
+
+
+class FeatureTypeSchema:
+    """
+    Description compilée et immuable des champs personnalisés d'un type de signalement
+    (ordonnés par position), partagée par les serializers, les imports et les exports.
+
+    Les schémas sont gardés en mémoire par processus. Chacun porte la version lue dans
+    FeatureType.schema_version, renouvelée dans la transaction qui modifie les CustomField:
+    tous les processus (serveurs web, workers Celery) voient donc la même version, et la
+    version d'une transaction annulée n'est jamais réutilisée.
+    Un schéma est utilisé tel quel pendant FEATURE_TYPE_SCHEMA_TTL secondes, puis sa version
+    est relue en base et il est recompilé si elle a changé. Les écritures (enregistrement
+    d'un signalement, imports, exports) demandent un schéma vérifié (fresh=True).
+    """
+
+    def __init__(self, feature_type_id, version, fields):
+        self.feature_type_id = feature_type_id
+        self.version = version
+        self.fields = tuple(fields)
+        self.names = tuple(field.name for field in self.fields)
+        self.field_types = MappingProxyType(
+            {field.name: field.field_type for field in self.fields})
+        self.mandatory_names = tuple(field.name for field in self.fields if field.is_mandatory)
+        # Date (horloge monotone) de la dernière vérification de la version
+        self.checked_on = time.monotonic()
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    @classmethod
+    def get(cls, feature_type, fresh=False):
+        """
+        Retourne le schéma d'un type de signalement (instance ou identifiant).
+        Avec fresh=True, la version du schéma est vérifiée en base quel que soit son âge.
+        """
+        feature_type_id = getattr(feature_type, 'pk', feature_type)
+        schema = _schemas.get(feature_type_id)
+        now = time.monotonic()
+        if schema is not None and not fresh and now - schema.checked_on < get_schema_ttl():
+            return schema
+        version = cls.get_version(feature_type_id)
+        if schema is None or schema.version != version:
+            # La version est lue avant les champs: des champs plus récents que la version
+            # seront simplement relus à la prochaine vérification
+            schema = cls.load(feature_type_id, version)
+            _schemas[feature_type_id] = schema
+        schema.checked_on = now
+        return schema
+
+    @staticmethod
+    def get_version(feature_type_id):
+        FeatureType = apps.get_model(app_label='geocontrib', model_name='FeatureType')
+        return FeatureType.objects.filter(pk=feature_type_id).values_list(
+            'schema_version', flat=True).first()
+
+    @classmethod
+    def load(cls, feature_type_id, version=None):
+        CustomField = apps.get_model(app_label='geocontrib', model_name='CustomField')
+        rows = CustomField.objects.filter(feature_type_id=feature_type_id).order_by(
+            'position', 'pk'
+        ).values_list(*CustomFieldSchema._fields)
+        return cls(feature_type_id, version, [
+            CustomFieldSchema(name, label, field_type, tuple(options or ()), is_mandatory, position)
+            for name, label, field_type, options, is_mandatory, position in rows
+        ])
+
+    @classmethod
+    def invalidate(cls, feature_type_id):
+        """
+        Renouvelle la version du schéma dans la transaction en cours, et oublie le schéma
+        du processus une fois la transaction validée.
+        """
+        FeatureType = apps.get_model(app_label='geocontrib', model_name='FeatureType')
+        FeatureType.objects.filter(pk=feature_type_id).update(schema_version=uuid.uuid4())
+        transaction.on_commit(lambda: _schemas.pop(feature_type_id, None))
@@ -1,16 +1,21 @@
+from collections import defaultdict
+from contextlib import contextmanager
 from functools import wraps
 import os
+import threading
 
 from django.apps import apps
 from django.conf import settings
 from django.contrib.gis.db import models
 from django.core.management import call_command
-from django.dispatch import receiver
 from django.db import transaction
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.text import slugify
 
 from geocontrib import logger
+from geocontrib.schemas import FeatureTypeSchema
+from geocontrib.utils.tiles import invalidate_tiles
 
 
 def disable_for_loaddata(signal_handler):
@@ -92,6 +97,17 @@ def create_symetrical_relation(sender, instance, created, **kwargs):
 #     for instance in related:
 #         instance.delete()
 
+@receiver(models.signals.post_save, sender='geocontrib.CustomField')
+@receiver(models.signals.post_delete, sender='geocontrib.CustomField')
+def invalidate_custom_field_schema(sender, instance, **kwargs):
+    FeatureTypeSchema.invalidate(instance.feature_type_id)
+
+
+@receiver(models.signals.post_delete, sender='geocontrib.FeatureType')
+def invalidate_feature_type_schema(sender, instance, **kwargs):
+    FeatureTypeSchema.invalidate(instance.pk)
+
+
 @receiver(models.signals.post_delete, sender='geocontrib.CustomField')
 @disable_for_loaddata
 def delete_custom_field_in_sql_view(sender, instance, **kwargs):
@@ -164,85 +180,154 @@ def set_users_perms(sender, instance, created, **kwargs):
         Authorization = apps.get_model(app_label='geocontrib', model_name="Authorization")
         UserLevelPermission = apps.get_model(
             app_label='geocontrib', model_name="UserLevelPermission")
-        User = apps.get_model(app_label='geocontrib', model_name="User")
         try:
             Authorization.objects.create(
                 project=instance,
                 user=instance.creator,
-                level=UserLevelPermission.objects.get(rank=5)
+                level=UserLevelPermission.registry().get(rank=5)
             )
         except Exception:
             logger.exception('Trigger.set_users_perms')
-        """
-        On ajoute la permission d'utilisateur connecté pour le projet à tous les autres utilisateurs actifs.
-        Pour éviter que le traitement des autorisations avec beaucoup d'utiliseurs ne prennent trop de temps
-        et déclenche une erreur 502 à cause d'un timeout, on utilise un bulk create pour faire une transitions unique
-        Il n'y a pas d'équivalent de create_or_update et je n'ai pas trouvé le moyen d'exclure les autorisation déjà existante
-        sur un projet pour un utilisateur, mais comme l'opération n'est effectué qu'au create du projet, il ne devrait pas
-        y avoir ce type d'erreur. En cas d'erreurs, la bdd ne devrait pas être polluée en utilisant une transaction.atomic,
-        car aucune opération n'est effectué sur la bdd en présence d'une erreur.
-        """
-        try:
-            active_users = (
-                User.objects
-                .filter(is_active=True)
-                .exclude(pk=instance.creator.pk)
-            )
-            default_permission_level = UserLevelPermission.objects.get(rank=1)
-
-            new_authorizations = []
-            for user in active_users:
-                new_authorizations.append(Authorization(
-                    project_id=instance.pk,
-                    user_id=user.pk,
-                    level=default_permission_level,
-                    created_on = timezone.now(),
-                    updated_on = timezone.now()
-                ))
-
-            with transaction.atomic():
-                Authorization.objects.bulk_create(new_authorizations)
-
-        except Exception:
-            logger.exception('Trigger.set_users_perms')
+        # Les autres utilisateurs actifs sont implicitement "utilisateur connecté" sur le projet:
+        # ce rang par défaut n'est pas stocké (cf. Authorization.get_rank)
 
 
 @receiver(models.signals.post_save, sender=settings.AUTH_USER_MODEL)
 @disable_for_loaddata
 def set_auth_member(sender, instance, created, **kwargs):
+    # Un nouvel utilisateur est implicitement "utilisateur connecté" sur tous les projets:
+    # aucune autorisation n'est créée.
+    # Un utilisateur désactivé retombe au rang anonyme: ses autorisations sont supprimées.
     Authorization = apps.get_model(app_label='geocontrib', model_name="Authorization")
-    UserLevelPermission = apps.get_model(app_label='geocontrib', model_name="UserLevelPermission")
-    Project = apps.get_model(app_label='geocontrib', model_name="Project")
-    if created:
+    if not created and not instance.is_active:
         try:
-            for project in Project.objects.all():
-                Authorization.objects.create(
-                    project=project,
-                    user=instance,
-                    level=UserLevelPermission.objects.get(rank=1)
-                )
-        except Exception:
-            logger.exception('Trigger.set_auth_member')
-    elif not instance.is_active:
-        try:
-            for project in Project.objects.all():
-                Authorization.objects.update_or_create(
-                    project=project,
-                    user=instance,
-                    defaults={'level': UserLevelPermission.objects.get(rank=0)}
-                )
+            Authorization.objects.filter(user=instance).delete()
         except Exception:
             logger.exception('Trigger.set_auth_member')
 
 
+@receiver(models.signals.post_save, sender='geocontrib.UserLevelPermission')
+@receiver(models.signals.post_delete, sender='geocontrib.UserLevelPermission')
+def invalidate_level_registry(sender, instance, **kwargs):
+    sender.invalidate_registry()
+
+
 # EVENT'S TRIGGERS
 
+# Évènements en attente de l'opération groupée en cours, par thread
+_bulk_state = threading.local()
+
+
+def in_bulk_operation():
+    return getattr(_bulk_state, 'events', None) is not None
+
+
+@contextmanager
+def bulk_operation():
+    """
+    Suspend le traitement ligne à ligne des évènements pendant une opération groupée
+    (import, action d'administration). Les évènements générés par les signaux sont mis
+    en attente puis, à la sortie du bloc sans erreur, enregistrés avec bulk_create,
+    ajoutés une seule fois à leur pile de notifications, et les notifications immédiates
+    sont envoyées par projet (cf. emit_events).
+    Les tuiles vectorielles touchées par les signalements sont invalidées en une fois.
+    Les évènements d'un bloc interrompu par une erreur sont abandonnés, et les blocs
+    imbriqués sont émis avec le bloc le plus externe.
+    """
+    if in_bulk_operation():
+        yield
+        return
+    _bulk_state.events = []
+    _bulk_state.tile_extents = defaultdict(list)
+    try:
+        yield
+        events = _bulk_state.events
+    finally:
+        tile_extents = _bulk_state.tile_extents
+        _bulk_state.events = None
+        _bulk_state.tile_extents = None
+        # Les tuiles sont invalidées même si l'opération est interrompue
+        for project_id, extents in tile_extents.items():
+            schedule_tiles_invalidation(project_id, extents)
+    emit_events(events)
+
+
+def create_event(**kwargs):
+    """
+    Crée un évènement, ou le met en attente si une opération groupée est en cours.
+    """
+    Event = apps.get_model(app_label='geocontrib', model_name="Event")
+    if in_bulk_operation():
+        event = Event(**kwargs)
+        _bulk_state.events.append(event)
+        return event
+    return Event.objects.create(**kwargs)
+
+
+def get_pending_stack(project_slug, only_key_document):
+    """
+    Retourne la pile d'évènements en attente d'envoi du projet, en la créant si besoin.
+    """
+    StackedEvent = apps.get_model(app_label='geocontrib', model_name="StackedEvent")
+    try:
+        # Get or create a pending StackedEvent specific to the event type (key_document or general)
+        stack, _ = StackedEvent.objects.get_or_create(
+            sending_frequency=settings.DEFAULT_SENDING_FREQUENCY,
+            state='pending',
+            project_slug=project_slug,
+            only_key_document=only_key_document  # Use the model field to segregate events
+        )
+    except Exception as e:
+        logger.exception(e)
+        # Log a warning if multiple stacked events exist, suggesting to remove duplicates
+        logger.warning("Several StackedEvent exists with sending_frequency='%s', state='pending', project_slug='%s', only_key_document='%s', remove one",
+                       settings.DEFAULT_SENDING_FREQUENCY, project_slug, only_key_document)
+        # Retrieve the first pending stack if get_or_create fails due to duplicates
+        stack = StackedEvent.objects.filter(
+            sending_frequency=settings.DEFAULT_SENDING_FREQUENCY,
+            state='pending',
+            project_slug=project_slug,
+            only_key_document=only_key_document
+        ).first()
+    return stack
+
+
+def emit_events(events):
+    """
+    Enregistre les évènements d'une opération groupée, comme notify_or_stack_events
+    le fait pour chaque évènement: chaque pile concernée reçoit ses évènements en une fois,
+    et les utilisateurs sont notifiés avec Event.ping_users_by_project().
+    """
+    if not events:
+        return
+    Event = apps.get_model(app_label='geocontrib', model_name="Event")
+    now = timezone.now()
+    for event in events:
+        event.created_on = now
+    Event.objects.bulk_create(events)
+
+    events = [event for event in events if event.project_slug]
+    if not events or settings.DEFAULT_SENDING_FREQUENCY == 'never':
+        return
+    stacked = defaultdict(list)
+    for event in events:
+        stacked[(event.project_slug, event.object_type == 'key_document')].append(event)
+    for (project_slug, is_key_document), stack_events in stacked.items():
+        stack = get_pending_stack(project_slug, is_key_document)
+        stack.events.add(*stack_events)
+        stack.save()
+
+    try:
+        Event.ping_users_by_project(events)
+    except Exception:
+        logger.exception('ping_users_by_project@emit_events')
+
+
 @receiver(models.signals.post_save, sender='geocontrib.Project')
 @disable_for_loaddata
 def create_event_on_project_creation(sender, instance, created, **kwargs):
     if created:
-        Event = apps.get_model(app_label='geocontrib', model_name="Event")
-        Event.objects.create(
+        create_event(
             user=instance.creator,
             event_type='create',
             object_type='project',
@@ -263,9 +348,9 @@ def create_event_on_feature_create_or_update(sender, instance, created, **kwargs
     # à l'update() afin de récupérer l'utilisateur courant.
     # Le signalement peut etre en 'pending' dés la création
     # on force le has_changed pour event.ping_users()
-    Event = apps.get_model(app_label='geocontrib', model_name="Event")
+    # Pendant une opération groupée, l'évènement est émis à la fin de l'opération
     if created:
-        Event.objects.create(
+        create_event(
             feature_id=instance.feature_id,
             event_type='create',
             object_type='feature',
@@ -283,7 +368,7 @@ def create_event_on_feature_create_or_update(sender, instance, created, **kwargs
         )
     elif instance:
         last_editor = setUser(instance.last_editor)
-        Event.objects.create(
+        create_event(
             feature_id=instance.feature_id,
             # If deletion_on is set, the feature has been deleted
             event_type='update' if instance.deletion_on == None else 'delete',
@@ -306,8 +391,7 @@ def create_event_on_feature_create_or_update(sender, instance, created, **kwargs
 @disable_for_loaddata
 def create_event_on_comment_creation(sender, instance, created, **kwargs):
     if created:
-        Event = apps.get_model(app_label='geocontrib', model_name="Event")
-        Event.objects.create(
+        create_event(
             feature_id=instance.feature_id,
             comment_id=instance.id,
             event_type='create',
@@ -339,11 +423,10 @@ def create_event_on_attachment_creation(sender, instance, created, **kwargs):
         created (bool): True if a new record was created, indicating this is a new attachment.
         **kwargs: Additional keyword arguments supplied by the signal.
     """
-    Event = apps.get_model(app_label='geocontrib', model_name="Event")
     # Check if the attachment is newly created and either not related to a comment or is a key document
     if created and (not instance.comment or instance.is_key_document):
         # Create a new event in the database
-        Event.objects.create(
+        create_event(
             feature_id=instance.feature_id,  # Link the event to the same feature as the attachment
             attachment_id=instance.id,  # Record the ID of the new attachment
             event_type='create',  # Define the type of event
@@ -371,31 +454,9 @@ def notify_or_stack_events(sender, instance, created, **kwargs):
     # Process only newly created events that have a related project and when notifications are not set to 'never'
     if created and instance.project_slug and settings.DEFAULT_SENDING_FREQUENCY != 'never':
         # Events are stacked based on the sending frequency setting to notify subscribers later
-        StackedEvent = apps.get_model(app_label='geocontrib', model_name="StackedEvent")
-        
         # Determine the stack type based on the object_type of the event
         is_key_document = instance.object_type == 'key_document'
-        
-        try:
-            # Get or create a pending StackedEvent specific to the event type (key_document or general)
-            stack, _ = StackedEvent.objects.get_or_create(
-                sending_frequency=settings.DEFAULT_SENDING_FREQUENCY,
-                state='pending',
-                project_slug=instance.project_slug,
-                only_key_document=is_key_document  # Use the model field to segregate events
-            )
-        except Exception as e:
-            logger.exception(e)
-            # Log a warning if multiple stacked events exist, suggesting to remove duplicates
-            logger.warning("Several StackedEvent exists with sending_frequency='%s', state='pending', project_slug='%s', only_key_document='%s', remove one",
-                           settings.DEFAULT_SENDING_FREQUENCY, instance.project_slug, is_key_document)
-            # Retrieve the first pending stack if get_or_create fails due to duplicates
-            stack = StackedEvent.objects.filter(
-                sending_frequency=settings.DEFAULT_SENDING_FREQUENCY,
-                state='pending',
-                project_slug=instance.project_slug,
-                only_key_document=is_key_document
-            ).first()
+        stack = get_pending_stack(instance.project_slug, is_key_document)
 
         # Add the event instance to the stack and save the stack
         stack.events.add(instance)
@@ -409,6 +470,53 @@ def notify_or_stack_events(sender, instance, created, **kwargs):
             logger.exception('ping_users@notify_or_stack_events')
 
 
+# VECTOR TILES CACHE
+
+def schedule_tiles_invalidation(project_id, extents):
+    """
+    Invalide les tuiles en cache après la validation de la transaction, pour qu'une tuile
+    générée entre-temps ne garde pas l'ancien état des signalements.
+    """
+    transaction.on_commit(lambda: invalidate_tiles(project_id, extents))
+
+
+def geom_extents(*geoms):
+    """
+    Emprises des géométries connues; None pour une géométrie non chargée.
+    """
+    extents = []
+    for geom in geoms:
+        if geom is models.DEFERRED:
+            extents.append(None)
+        elif geom is not None and not geom.empty:
+            extents.append(geom.extent)
+    return extents
+
+
+@receiver(models.signals.post_save, sender='geocontrib.Feature')
+@receiver(models.signals.post_delete, sender='geocontrib.Feature')
+def invalidate_feature_tiles(sender, instance, **kwargs):
+    # Tuiles touchées par l'ancienne et la nouvelle géométrie du signalement
+    extents = geom_extents(instance._original_geom, instance.__dict__.get('geom', models.DEFERRED))
+    if not extents:
+        return
+    if in_bulk_operation():
+        _bulk_state.tile_extents[instance.project_id].extend(extents)
+    else:
+        schedule_tiles_invalidation(instance.project_id, extents)
+
+
+@receiver(models.signals.post_save, sender='geocontrib.Project')
+@receiver(models.signals.post_delete, sender='geocontrib.Project')
+@receiver(models.signals.post_save, sender='geocontrib.FeatureType')
+@receiver(models.signals.post_delete, sender='geocontrib.FeatureType')
+def purge_project_tiles(sender, instance, **kwargs):
+    # Droits d'accès, modération ou types de signalements modifiés: toutes les tuiles du projet
+    project_id = instance.pk if sender._meta.model_name == 'project' else instance.project_id
+    if project_id is not None:
+        schedule_tiles_invalidation(project_id, [None])
+
+
 # Si besoin d'obliger un seul queryable à True
 # @receiver(models.signals.post_save, sender='geocontrib.ContextLayer')
 # @disable_for_loaddata
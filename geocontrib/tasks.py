@@ -3,9 +3,16 @@ from celery.exceptions import SoftTimeLimitExceeded
 
 from geocontrib import __version__
 
+from geocontrib.models import Event
+from geocontrib.models import ExportTask
+from geocontrib.models import Feature
 from geocontrib.models import ImportTask
+from geocontrib.models import Project
+from geocontrib.models import User
+from geocontrib.utils.export import export_processing
 from geocontrib.utils.geojson import geojson_processing
 from geocontrib.utils.csv import csv_processing
+from geocontrib.utils.tiles import prerender_project_tiles
 from django.core.management import call_command
 
 
@@ -26,6 +33,49 @@ def task_csv_processing(import_task_id):
         raise Exception("ImportTask {} not found".format(import_task_id))
     csv_processing(import_task)
 
+@shared_task()
+def task_export_processing(export_task_id):
+    try:
+        export_task = ExportTask.objects.get(pk=export_task_id)
+    except ExportTask.DoesNotExist:
+        raise Exception("ExportTask {} not found".format(export_task_id))
+    export_processing(export_task)
+
+@shared_task()
+def task_purge_export_tasks():
+    # Les tâches interrompues expirent aussitôt et sont supprimées dans la foulée
+    ExportTask.fail_stale()
+    return ExportTask.purge_expired()
+
+@shared_task()
+def task_notify_moderators_pending_features(project_id, initiator_id, feature_ids):
+    # Une seule notification des modérateurs pour les signalements mis en attente
+    # de publication par une opération groupée.
+    project = Project.objects.filter(pk=project_id).first()
+    if project is None:
+        return
+    initiator = User.objects.filter(pk=initiator_id).first()
+    features = list(Feature.objects.filter(
+        project=project, feature_id__in=feature_ids, status='pending'
+    ).order_by('created_on'))
+    Event.notify_moderators_pending_features(project, initiator, features)
+
+@shared_task()
+def task_prerender_tiles(project_id=None, max_zoom=None):
+    # Sans projet, pré-génère les tuiles de tous les projets publics.
+    # Les tuiles encore en cache ne sont pas regénérées: la tâche périodique
+    # "Geocontrib Prerender Tiles" (toutes les 10 minutes, cf. geocontrib_beat.json)
+    # ne traite que les tuiles invalidées par les modifications depuis son dernier passage.
+    projects = Project.objects.all()
+    if project_id is not None:
+        projects = projects.filter(pk=project_id)
+    rendered = 0
+    for project in projects:
+        counts = prerender_project_tiles(project, max_zoom=max_zoom)
+        if counts is not None:
+            rendered += counts[0]
+    return rendered
+
 
 @shared_task()
 def task_notify_subscribers():
@@ -1,13 +1,19 @@
 from django.conf import settings
+from django.core import mail
 from django.core.management import call_command
 from django.contrib.admin.sites import AdminSite
 import pytest
 
 from geocontrib.admin.feature import FeatureAdmin
 from geocontrib.admin.project import ProjectAdmin
+from geocontrib.choices import MODERATOR
+from geocontrib.models import Authorization
+from geocontrib.models import Event
 from geocontrib.models import Feature
 from geocontrib.models import Project
 from geocontrib.models import User
+from geocontrib.models import UserLevelPermission
+from geocontrib.tasks import task_notify_moderators_pending_features
 
 URL_PREFIX = settings.URL_PREFIX
 
@@ -45,3 +51,67 @@ def test_admin_feature_viewsite(api_client):
     api_client.force_login(user=admin)
     res = api_client.get(url)
     assert res.url == f'http://example.com/{ URL_PREFIX }projet/1-aze/type-signalement/1-dfsdfs/signalement/71f9778a-fe84-4c2e-ab9b-4dba95d2aeee/editer/'
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_admin_feature_status_actions_events(rf):
+    """
+    Test les actions de changement de statut: un évènement par signalement modifié
+    """
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+
+    admin = User.objects.get(username="admin")
+    request = rf.get('/')
+    request.user = admin
+    my_feat_admin = FeatureAdmin(Feature, AdminSite())
+    queryset = my_feat_admin.get_queryset(request).filter(feature_type__slug="2-type-2")
+    nb_features = queryset.count()
+
+    my_feat_admin.to_published(request, queryset)
+
+    assert Feature.objects.filter(feature_type__slug="2-type-2", status='published').count() == nb_features
+    events = Event.objects.filter(feature_type_slug="2-type-2", event_type='update', user=admin)
+    assert events.count() == nb_features
+    assert all(event.data['feature_status']['new_status'] == 'published' for event in events)
+
+
+@pytest.mark.django_db
+def test_admin_feature_to_pending_notifies_once(rf, settings, monkeypatch, django_capture_on_commit_callbacks):
+    """
+    Test l'action "en attente de publication": une seule notification des modérateurs,
+    envoyée après la validation de la transaction et listant les signalements
+    """
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    settings.DEFAULT_SENDING_FREQUENCY = 'daily'
+    monkeypatch.setattr(
+        task_notify_moderators_pending_features, 'apply_async',
+        lambda kwargs: task_notify_moderators_pending_features.apply(kwargs=kwargs))
+
+    project = Project.objects.get(slug="1-aze")
+    project.moderation = True
+    project.save()
+    moderator = User.objects.create(username="moderator", email="moderator@test.com")
+    Authorization.objects.create(
+        project=project, user=moderator,
+        level=UserLevelPermission.objects.get(user_type_id=MODERATOR))
+
+    admin = User.objects.get(username="admin")
+    request = rf.get('/')
+    request.user = admin
+    my_feat_admin = FeatureAdmin(Feature, AdminSite())
+    queryset = my_feat_admin.get_queryset(request).filter(feature_type__slug="2-type-2")
+    features = list(queryset)
+    assert len(features) > 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        my_feat_admin.to_pending(request, queryset)
+        assert len(mail.outbox) == 0
+
+    assert len(mail.outbox) == 1
+    assert mail.outbox[0].bcc == ["moderator@test.com"]
+    body = mail.outbox[0].alternatives[0][0]
+    for feature in features:
+        assert str(feature.feature_id) in body
@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.management import call_command
+import pytest
+
+from geocontrib.models import Event
+from geocontrib.models import Feature
+from geocontrib.models import StackedEvent
+from geocontrib.models import User
+from geocontrib.signals import bulk_operation
+
+
+@pytest.mark.django_db
+def test_feature_assignment_tracking(django_assert_num_queries):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    member = User.objects.create(username="member", email="member@example.com")
+    Feature.objects.update(assigned_member=member)
+
+    # Charger les signalements ne lit pas la table des utilisateurs
+    with django_assert_num_queries(1):
+        features = list(Feature.objects.all())
+    assert all(feature.assigned_member_id == member.pk for feature in features)
+
+    with mock.patch('geocontrib.models.feature.notif_project_member_assigned_feature') as notif:
+        feature = Feature.objects.get(pk=features[0].pk)
+        feature.title = "Titre modifié"
+        feature.save()
+        notif.assert_not_called()
+
+        feature.assigned_member = User.objects.get(username="admin")
+        feature.save()
+        notif.assert_called_once()
+
+        # Un nouvel enregistrement sans changement n'envoie pas de nouvelle notification
+        feature.save()
+        notif.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_feature_save_deferred_fields():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    feature = Feature.objects.defer('geom', 'assigned_member').filter(
+        feature_type__geom_type='point').first()
+    feature.title = "Titre modifié"
+    feature.save()
+    feature.save()
+    # Les champs différés ne sont pas rechargés à l'enregistrement
+    assert 'geom' not in feature.__dict__
+    assert 'assigned_member_id' not in feature.__dict__
+    assert Feature.objects.get(pk=feature.pk).geom is not None
+
+
+@pytest.mark.django_db
+@pytest.mark.freeze_time('2021-08-05')
+def test_feature_bulk_operation_events(settings, django_assert_max_num_queries):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    settings.DEFAULT_SENDING_FREQUENCY = 'daily'
+    features = list(Feature.objects.select_related('project', 'feature_type', 'last_editor'))
+    nb_events = Event.objects.count()
+
+    with mock.patch('geocontrib.models.annotation.Event.ping_users') as ping_users:
+        with bulk_operation():
+            for feature in features:
+                feature.title = "Titre modifié"
+                feature.save()
+            # Les évènements sont émis à la fin de l'opération
+            assert Event.objects.count() == nb_events
+        ping_users.assert_not_called()
+
+    events = Event.objects.filter(event_type='update', data__feature_title="Titre modifié")
+    assert events.count() == len(features)
+    # Chaque pile reçoit ses évènements en une seule fois
+    stacks = StackedEvent.objects.filter(state='pending', only_key_document=False)
+    assert stacks.count() == len({feature.project.slug for feature in features})
+    assert sum(stack.events.count() for stack in stacks) == len(features)
+
+    # Les évènements d'une opération interrompue ne sont pas émis
+    nb_events = Event.objects.count()
+    with pytest.raises(ValueError):
+        with bulk_operation():
+            features[0].save()
+            raise ValueError
+    assert Event.objects.count() == nb_events
+
+    # Le nombre de requêtes des effets de bord ne dépend pas du nombre de signalements
+    with django_assert_max_num_queries(len(features) + 10):
+        with bulk_operation():
+            for feature in features:
+                feature.save()
@@ -0,0 +1,149 @@
+from django.core.management import call_command
+from django.test import RequestFactory
+import pytest
+
+from geocontrib.models import Authorization
+from geocontrib.models import Project
+from geocontrib.models import User
+from geocontrib.models import UserLevelPermission
+from geocontrib.permissions import PermissionContext
+
+
+@pytest.fixture
+def project_with_members():
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    anon_perm = UserLevelPermission.objects.get(pk="anonymous")
+    contrib_perm = UserLevelPermission.objects.get(pk="contributor")
+    creator = User.objects.create(username="creator")
+    project = Project.objects.create(
+        title="Projet permissions",
+        access_level_pub_feature=anon_perm,
+        access_level_arch_feature=contrib_perm,
+        creator=creator,
+    )
+    return project
+
+
+@pytest.mark.django_db
+def test_permission_context_matches_authorization(project_with_members):
+    project = project_with_members
+    for level in UserLevelPermission.objects.filter(rank__gte=1):
+        user = User.objects.create(username=f"user-{ level.pk }")
+        Authorization.objects.update_or_create(
+            user=user, project=project, defaults={'level': level})
+        context = PermissionContext(user, Project.objects.get(pk=project.pk))
+        assert context.rank == level.rank
+        assert context.all_permissions() == Authorization.all_permissions(user, project)
+
+
+@pytest.mark.django_db
+def test_permission_context_is_request_scoped(project_with_members, django_assert_num_queries):
+    project = Project.objects.get(pk=project_with_members.pk)
+    request = RequestFactory().get('/')
+    request.user = project.creator
+
+    context = PermissionContext.for_request(request, project)
+    assert PermissionContext.for_request(request, project) is context
+
+    # Le rang et les niveaux d'accès du projet ne sont résolus qu'une seule fois
+    context.permissions
+    with django_assert_num_queries(0):
+        context.has_permission('can_update_project')
+        context.has_permission('is_project_administrator')
+        context.has_permission('can_view_archived_feature')
+
+
+@pytest.mark.django_db
+def test_user_permissions_projects_matrix(project_with_members, django_assert_num_queries):
+    project = project_with_members
+    moderator = User.objects.create(username="moderator")
+    Authorization.objects.create(
+        user=moderator, project=project,
+        level=UserLevelPermission.objects.get(pk="moderator"))
+    outsider = User.objects.create(username="outsider")
+    other_project = Project.objects.create(
+        title="Autre projet",
+        access_level_pub_feature=UserLevelPermission.objects.get(pk="logged_user"),
+        access_level_arch_feature=UserLevelPermission.objects.get(pk="moderator"),
+        creator=project.creator,
+    )
+
+    for user in [moderator, outsider, project.creator]:
+        with django_assert_num_queries(1):
+            matrix = Authorization.get_user_permissions_projects(user)
+        assert matrix == {
+            p.slug: Authorization.all_permissions(user, p) for p in [project, other_project]
+        }
+        assert Authorization.get_user_level_projects_ids(user) == {
+            p.slug: Authorization.get_rank(user, p) for p in [project, other_project]
+        }
+
+
+@pytest.mark.django_db
+def test_user_level_projects_lazy(project_with_members, django_assert_num_queries):
+    from geocontrib.context_processors import custom_contexts
+
+    project = project_with_members
+    user = User.objects.create(username="lazy-user")
+    request = RequestFactory().get('/')
+    request.user = user
+
+    # La valeur n'est calculée que si le template lit USER_LEVEL_PROJECTS,
+    # une seule fois par requête
+    with django_assert_num_queries(0):
+        context = custom_contexts(request)
+    with django_assert_num_queries(1):
+        assert context['USER_LEVEL_PROJECTS'][project.slug] == "Utilisateur connecté"
+    with django_assert_num_queries(0):
+        assert context['USER_LEVEL_PROJECTS'][project.slug] == "Utilisateur connecté"
+
+    # Pas de cache entre les requêtes: un changement de rôle est vu à la requête suivante
+    Authorization.objects.update_or_create(
+        user=user, project=project,
+        defaults={'level': UserLevelPermission.objects.get(pk="moderator")})
+    assert custom_contexts(request)['USER_LEVEL_PROJECTS'][project.slug] == "Modérateur"
+
+
+@pytest.mark.django_db
+def test_sparse_authorizations(project_with_members):
+    project = project_with_members
+    # Seul le créateur du projet a une autorisation stockée
+    assert list(Authorization.objects.filter(project=project).values_list(
+        'user__username', 'level__rank')) == [("creator", 5)]
+
+    user = User.objects.create(username="newcomer")
+    assert not Authorization.objects.filter(user=user).exists()
+    assert Authorization.get_rank(user, project) == 1
+
+    Authorization.objects.create(
+        user=user, project=project, level=UserLevelPermission.objects.get(pk="contributor"))
+    assert Authorization.get_rank(user, project) == 2
+
+    user.is_active = False
+    user.save()
+    assert not Authorization.objects.filter(user=user).exists()
+    assert Authorization.get_rank(user, project) == 0
+
+
+@pytest.mark.django_db
+def test_level_registry(project_with_members, django_assert_num_queries):
+    from geocontrib.models import Feature
+
+    registry = UserLevelPermission.registry()
+    assert registry.ranks['moderator'] == 4
+    assert registry.codenames[2] == 'contributor'
+    assert registry.displays[1] == "Utilisateur connecté"
+    with pytest.raises(UserLevelPermission.DoesNotExist):
+        registry.get(user_type_id='unknown')
+
+    # La table n'est plus relue par availables()
+    project = Project.objects.get(pk=project_with_members.pk)
+    context = PermissionContext(project.creator, project)
+    context.permissions
+    with django_assert_num_queries(0):
+        Feature.handy.availables(project.creator, project, context=context)
+
+    # Invalidation à l'enregistrement d'un niveau
+    level = UserLevelPermission.objects.get(pk='moderator')
+    level.save()
+    assert UserLevelPermission.registry() is not registry
@@ -0,0 +1,69 @@
+import uuid
+
+from django.core.management import call_command
+import pytest
+
+from geocontrib.models import CustomField
+from geocontrib.models import Feature
+from geocontrib.models import FeatureType
+from geocontrib.schemas import FeatureTypeSchema
+
+
+@pytest.mark.django_db
+def test_feature_type_schema(django_assert_num_queries, django_capture_on_commit_callbacks):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    feature_type = FeatureType.objects.get(slug="1-dfsdfs")
+
+    schema = FeatureTypeSchema.get(feature_type)
+    assert schema.names == ("etat",)
+    assert schema.field_types["etat"] == "list"
+    assert schema.fields[0].options == ("jolie", "pas jolie")
+
+    # Le schéma est servi depuis le cache du processus
+    features = list(Feature.objects.filter(feature_type=feature_type).select_related('feature_type'))
+    with django_assert_num_queries(0):
+        assert FeatureTypeSchema.get(feature_type.pk) is schema
+        for feature in features:
+            feature.custom_fields_as_list
+
+    # Invalidation à l'ajout d'un champ personnalisé, une fois la transaction validée
+    with django_capture_on_commit_callbacks(execute=True):
+        CustomField.objects.create(
+            feature_type=feature_type, name="hauteur", label="Hauteur", field_type="integer",
+            position=1, is_mandatory=True)
+    schema = FeatureTypeSchema.get(feature_type)
+    assert schema.names == ("etat", "hauteur")
+    assert schema.mandatory_names == ("hauteur",)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CustomField.objects.filter(name="etat").get().delete()
+    assert FeatureTypeSchema.get(feature_type).names == ("hauteur",)
+
+
+@pytest.mark.django_db
+def test_feature_type_schema_other_process(settings, django_assert_num_queries):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    feature_type = FeatureType.objects.get(slug="1-dfsdfs")
+    schema = FeatureTypeSchema.get(feature_type)
+
+    # Un champ ajouté par un autre processus: seule la version en base change,
+    # le schéma gardé en mémoire n'est pas oublié
+    CustomField.objects.bulk_create([CustomField(
+        feature_type=feature_type, name="hauteur", label="Hauteur", field_type="integer",
+        position=1)])
+    FeatureType.objects.filter(pk=feature_type.pk).update(schema_version=uuid.uuid4())
+
+    # Le schéma reste utilisé jusqu'à l'expiration du délai, sauf pour les écritures
+    with django_assert_num_queries(0):
+        assert FeatureTypeSchema.get(feature_type) is schema
+    assert FeatureTypeSchema.get(feature_type, fresh=True).names == ("etat", "hauteur")
+
+    CustomField.objects.filter(name="hauteur").delete()
+    FeatureType.objects.filter(pk=feature_type.pk).update(schema_version=uuid.uuid4())
+    settings.FEATURE_TYPE_SCHEMA_TTL = 0
+    assert FeatureTypeSchema.get(feature_type).names == ("etat",)
+    # Version inchangée: une seule requête pour la vérifier
+    with django_assert_num_queries(1):
+        assert FeatureTypeSchema.get(feature_type).names == ("etat",)
@@ -0,0 +1,185 @@
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.contrib.gis.geos import Point
+from django.urls import reverse
+import pytest
+
+from geocontrib.models import Feature
+from geocontrib.models import Project
+from geocontrib.utils.tiles import DjangoTileCache
+from geocontrib.utils.tiles import HITS_KEY
+from geocontrib.utils.tiles import FileSystemTileCache
+from geocontrib.utils.tiles import TileKey
+from geocontrib.utils.tiles import get_stats
+from geocontrib.utils.tiles import prerender_project_tiles
+from geocontrib.utils.tiles import reset_stats
+from geocontrib.utils.tiles import tile_ranges
+from geocontrib.utils.tiles import touched_tiles
+
+
+def test_touched_tiles(settings):
+    settings.MVT_CACHE_MAX_INVALIDATED_TILES = 3
+    # Toulouse
+    extent = (1.44, 43.60, 1.45, 43.61)
+    assert tile_ranges(extent, 0) == (range(0, 1), range(0, 1))
+    assert tile_ranges(extent, 4) == (range(8, 9), range(5, 6))
+    # A point on the edge of two tiles touches both
+    assert tile_ranges((0.0, 10.0, 0.0, 10.0), 1) == (range(0, 2), range(0, 1))
+
+    zooms = dict(touched_tiles([extent], max_zoom=4))
+    assert zooms == {0: {(0, 0)}, 1: {(1, 0)}, 2: {(2, 1)}, 3: {(4, 2)}, 4: {(8, 5)}}
+    # Too many tiles: the whole zoom level is invalidated
+    zooms = dict(touched_tiles([(-10.0, -10.0, 10.0, 10.0)], max_zoom=3))
+    assert zooms[0] == {(0, 0)}
+    assert zooms[1] is None
+    assert zooms[3] is None
+
+
+def shared_cache(settings, tmp_path):
+    # A file based cache is shared by the processes of the server, unlike the default local memory one
+    settings.CACHES = {
+        **settings.CACHES,
+        'mvt': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'django_cache'),
+        },
+    }
+    settings.MVT_CACHE_ALIAS = 'mvt'
+
+
+@pytest.mark.parametrize('backend', ['filesystem', 'django'])
+def test_tile_cache_backends(backend, settings, tmp_path):
+    if backend == 'filesystem':
+        tile_cache = FileSystemTileCache(location=str(tmp_path))
+    else:
+        shared_cache(settings, tmp_path)
+        tile_cache = DjangoTileCache()
+    reset_stats(tile_cache)
+    key = TileKey(1, 'project', 'anonymous', 4, 8, 5, 'all')
+    other_visibility = key._replace(visibility='admin')
+    other_tile = key._replace(x=9)
+
+    content, hit = tile_cache.fetch(key, lambda: b'tile')
+    assert (content, hit) == (b'tile', False)
+    content, hit = tile_cache.fetch(key, lambda: b'other')
+    assert (content, hit) == (b'tile', True)
+    tile_cache.set(other_visibility, b'admin tile')
+    tile_cache.set(other_tile, b'other tile')
+    assert get_stats(tile_cache) == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+    # The counters are stored by the backend, not in the default cache
+    assert cache.get(HITS_KEY) is None
+
+    # All the visibility classes of the tile are invalidated, not the other tiles
+    tile_cache.invalidate(1, 4, {(8, 5)})
+    assert tile_cache.get(key) is None
+    assert tile_cache.get(other_visibility) is None
+    assert tile_cache.get(other_tile) == b'other tile'
+
+    tile_cache.set(key, b'tile')
+    tile_cache.invalidate(1, 4)
+    assert tile_cache.get(key) is None
+    assert tile_cache.get(other_tile) is None
+
+    tile_cache.set(key, b'tile')
+    tile_cache.set(key._replace(project_id=2), b'tile')
+    tile_cache.purge(1)
+    assert tile_cache.get(key) is None
+    assert tile_cache.get(key._replace(project_id=2)) == b'tile'
+
+
+def test_django_tile_cache_refuses_local_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'mvt': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+    with pytest.raises(ImproperlyConfigured):
+        DjangoTileCache(alias='mvt')
+    with pytest.raises(ImproperlyConfigured):
+        DjangoTileCache(alias='undefined')
+
+
+def test_filesystem_tile_cache_invalidated_while_rendering(tmp_path):
+    tile_cache = FileSystemTileCache(location=str(tmp_path))
+    key = TileKey(1, 'project', 'anonymous', 4, 8, 5, 'all')
+
+    def render():
+        # The feature is edited while its former tile is being rendered
+        tile_cache.invalidate(1, 4, {(8, 5)})
+        return b'stale tile'
+
+    assert tile_cache.fetch(key, render) == (b'stale tile', False)
+    assert tile_cache.get(key) is None
+
+    def render_purged():
+        tile_cache.purge(1)
+        return b'stale tile'
+
+    assert tile_cache.fetch(key, render_purged) == (b'stale tile', False)
+    assert tile_cache.get(key) is None
+    # Without invalidation, the rendered tile is stored
+    assert tile_cache.fetch(key, lambda: b'tile') == (b'tile', False)
+    assert tile_cache.get(key) == b'tile'
+
+
+@pytest.mark.django_db
+def test_feature_save_invalidates_tiles(settings, tmp_path, django_capture_on_commit_callbacks):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    settings.MVT_CACHE_BACKEND = 'geocontrib.utils.tiles.FileSystemTileCache'
+    settings.MVT_CACHE_DIR = str(tmp_path)
+    tile_cache = FileSystemTileCache()
+    feature = Feature.objects.filter(feature_type__geom_type='point').first()
+    project_id = feature.project_id
+    old_x, old_y = feature.geom.x, feature.geom.y
+
+    def cached_key(lon, lat):
+        [(x, y)] = dict(touched_tiles([(lon, lat, lon, lat)], max_zoom=10))[10]
+        key = TileKey(project_id, 'project', 'anonymous', 10, x, y, 'all')
+        tile_cache.set(key, b'tile')
+        return key
+
+    old_tile = cached_key(old_x, old_y)
+    new_tile = cached_key(old_x + 5, old_y)
+    untouched_tile = cached_key(old_x - 5, old_y)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        feature.geom = Point(old_x + 5, old_y, srid=4326)
+        feature.save()
+    # The tiles of the old and new geometries are invalidated
+    assert tile_cache.get(old_tile) is None
+    assert tile_cache.get(new_tile) is None
+    assert tile_cache.get(untouched_tile) == b'tile'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        feature.project.save()
+    assert tile_cache.get(untouched_tile) is None
+
+
+@pytest.mark.django_db
+def test_prerender_project_tiles(api_client, settings, tmp_path, django_capture_on_commit_callbacks):
+    call_command("loaddata", "geocontrib/data/perm.json", verbosity=0)
+    call_command("loaddata", "api/tests/data/test_features.json", verbosity=0)
+    project = Project.objects.get(slug="1-aze")
+    assert prerender_project_tiles(project) is None
+
+    settings.MVT_CACHE_BACKEND = 'geocontrib.utils.tiles.FileSystemTileCache'
+    settings.MVT_CACHE_DIR = str(tmp_path)
+    rendered, cached = prerender_project_tiles(project, max_zoom=4)
+    # At least one tile holding features per zoom level
+    assert rendered >= 5
+    assert cached == 0
+
+    # The visitors' tiles are served from the cache
+    result = api_client.get(reverse('api:features-mvt') + '?project_id={}&tile=0/0/0'.format(project.pk))
+    assert result.status_code == 200
+    assert result['X-Cache'] == 'HIT'
+    assert result.content
+
+    # A rebuild only renders the tiles invalidated since the previous one
+    assert prerender_project_tiles(project, max_zoom=4) == (0, rendered)
+    with django_capture_on_commit_callbacks(execute=True):
+        feature = Feature.objects.filter(project=project, status='published').exclude(geom=None).first()
+        feature.save()
+    rendered_again, _ = prerender_project_tiles(project, max_zoom=4)
+    assert 0 < rendered_again <= rendered
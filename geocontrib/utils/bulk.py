@@ -0,0 +1,153 @@
+from django.db import connection
+from django.db import models
+from django.utils import timezone
+
+from geocontrib.models import Feature
+from geocontrib.models import FeatureLink
+from geocontrib.signals import bulk_operation
+
+# Number of features written at once by bulk_create and bulk_update
+BULK_BATCH_SIZE = 1000
+
+# Number of duplicate pairs read and linked at once
+LINK_BATCH_SIZE = 5000
+
+# Fields written when an import updates an existing feature
+FEATURE_UPDATE_FIELDS = (
+    'title', 'description', 'status', 'creator', 'project', 'feature_type',
+    'feature_data', 'geom', 'updated_on',
+)
+
+
+def iter_chunks(items, size):
+    """
+    Groups the items of an iterable in lists of at most size items, without reading it whole.
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_save_features(rows, feature_type, batch_size=BULK_BATCH_SIZE):
+    """
+    Creates or updates the features of an import with bulk_create and bulk_update.
+
+    Each row holds the field values of a Feature and its incoming 'feature_id'. The incoming
+    identifiers are resolved with a single query: the features of the imported feature type
+    which are not deleted are updated, the other rows are created with a new identifier.
+    Feature.clean() validates each row, the dates and last editor are set as Feature.save()
+    does, and the post_save signal is sent for each row in a bulk_operation() block, so that
+    the events are still generated, then written and notified at once.
+
+    Returns the list of the (feature, created) pairs, in the order of the rows.
+    """
+    now = timezone.now()
+    feature_ids = [Feature._meta.pk.to_python(row['feature_id']) for row in rows]
+    existing = Feature.objects.filter(
+        feature_id__in=set(feature_ids),
+        feature_type=feature_type,
+        project=feature_type.project,
+        deletion_on=None,
+    ).select_related('last_editor').in_bulk()
+
+    saved = []
+    to_create = []
+    to_update = {}
+    for feature_id, row in zip(feature_ids, rows):
+        values = dict(row)
+        del values['feature_id']
+        instance = existing.get(feature_id)
+        created = instance is None
+        if created:
+            # L'import peut venir avec un ancien ID ou un ID d'un autre projet:
+            # le signalement est créé avec un nouvel ID
+            instance = Feature(**values)
+            instance.created_on = now
+            instance.last_editor = instance.creator
+            to_create.append(instance)
+        else:
+            for field, value in values.items():
+                setattr(instance, field, value)
+            to_update[instance.pk] = instance
+        instance.updated_on = now
+        instance.clean()
+        saved.append((instance, created))
+
+    Feature.objects.bulk_create(to_create, batch_size=batch_size)
+    Feature.objects.bulk_update(to_update.values(), FEATURE_UPDATE_FIELDS, batch_size=batch_size)
+
+    with bulk_operation():
+        for instance, created in saved:
+            models.signals.post_save.send(
+                sender=Feature, instance=instance, created=created,
+                update_fields=None, raw=False, using=Feature.objects.db,
+            )
+    return saved
+
+
+def iter_duplicate_pairs(feature_ids, feature_type):
+    """
+    Yields the (imported feature, similar feature) identifier pairs, in one self-join:
+    the similar features have the same feature type, title and description (and the same
+    geometry for geographical feature types) and are not deleted.
+
+    The join on (feature_type, title) lets PostgreSQL use a hash join, or the
+    feature_type_title_idx index against the existing features, the other criteria
+    being checked on the matching rows only.
+    """
+    table = connection.ops.quote_name(Feature._meta.db_table)
+    pk = connection.ops.quote_name(Feature._meta.pk.column)
+    feature_type_column = connection.ops.quote_name(Feature._meta.get_field('feature_type').column)
+    geom_condition = ''
+    if feature_type.geom_type != 'none':
+        # Même comparaison que le lookup exact de GeoDjango
+        geom_condition = 'AND similar.geom ~= imported.geom'
+    sql = f"""
+        SELECT imported.{ pk }, similar.{ pk }
+        FROM { table } imported
+        JOIN { table } similar
+            ON similar.{ feature_type_column } = imported.{ feature_type_column }
+            AND similar.title = imported.title
+        WHERE imported.{ pk } = ANY(%s)
+            AND imported.{ feature_type_column } = %s
+            AND similar.{ pk } <> imported.{ pk }
+            AND similar.description IS NOT DISTINCT FROM imported.description
+            AND similar.deletion_on IS NULL
+            { geom_condition }
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(feature_ids), feature_type.pk])
+        while True:
+            rows = cursor.fetchmany(LINK_BATCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+
+def link_duplicate_features(feature_ids, feature_type):
+    """
+    Links the imported features to their similar features as duplicates ('doublon'),
+    in both directions, after an import.
+
+    The links are inserted with bulk_create(ignore_conflicts=True): existing links are kept
+    thanks to the unique_feature_link constraint, and no post_save signal is sent since
+    the reciprocal links are inserted at the same time.
+
+    Returns the number of pairs of similar features found.
+    """
+    count = 0
+    for pairs in iter_chunks(iter_duplicate_pairs(feature_ids, feature_type), LINK_BATCH_SIZE):
+        links = []
+        for feature_from_id, feature_to_id in pairs:
+            links.append(FeatureLink(
+                relation_type='doublon', feature_from_id=feature_from_id, feature_to_id=feature_to_id))
+            links.append(FeatureLink(
+                relation_type='doublon', feature_from_id=feature_to_id, feature_to_id=feature_from_id))
+        FeatureLink.objects.bulk_create(links, ignore_conflicts=True)
+        count += len(pairs)
+    return count
@@ -7,11 +7,13 @@ import logging
 from django.contrib.gis.geos import GEOSGeometry, Point
 from django.contrib.gis.geos.error import GEOSException
 from django.db import transaction
-from django.db.models import Q
 from django.utils import timezone
 
 from geocontrib.models import Feature
-from geocontrib.models import FeatureLink
+from geocontrib.schemas import FeatureTypeSchema
+from geocontrib.utils.bulk import bulk_save_features
+from geocontrib.utils.bulk import iter_chunks
+from geocontrib.utils.bulk import link_duplicate_features
 
 logger = logging.getLogger(__name__)
 
@@ -32,8 +34,13 @@ class CSVProcessing:
     specific attribute processing like generating titles and extracting custom field data.
     """
 
-    def __init__(self, *args, **kwargs):
+    # Number of rows read, validated and written at once
+    chunk_size = 500
+
+    def __init__(self, *args, chunk_size=None, **kwargs):
         self.infos = []
+        if chunk_size:
+            self.chunk_size = chunk_size
 
     def get_geom(self, lon, lat):
         # Converts point geometry to GEOSGeometry object, or returns None if conversion fails
@@ -185,78 +192,71 @@ class CSVProcessing:
             return "draft"
         return status
 
-    @transaction.atomic
-    def create_features(self, import_task, data):
+    def create_features(self, import_task, rows):
         """
-        Processes CSV data and creates or updates features based on its content.
+        Processes CSV rows and creates or updates features based on their content.
 
-        Processes each row from the provided CSV data,
-        and creates or updates feature records in the database.
+        The rows are read and processed by chunks of chunk_size rows. Each chunk is written
+        with bulk_create and bulk_update in its own transaction, so that memory usage and
+        transaction size do not depend on the size of the file.
 
         Parameters:
         - import_task: An instance of the ImportTask model containing the CSV file and related data.
-        - data: The validated and loaded CSV data.
+        - rows: An iterator over the rows of the CSV file.
 
         Raises:
         - CSVProcessingFailed: If any errors occur during processing of the CSV data.
         """
-        if not data:
-            self.infos.append("Aucun signalement trouvé dans le fichier CSV.")
-            raise CSVProcessingFailed
-
         feature_type = import_task.feature_type
-        field_names = feature_type.customfield_set.values_list('name', flat=True)
+        field_names = FeatureTypeSchema.get(feature_type, fresh=True).names
 
-        for feature in data:
-            new_feature_data, feature_id = self.process_feature_row(
-                feature, feature_type, field_names, import_task.user
-            )
-            self.create_or_update_feature(feature_id, new_feature_data, feature_type)
-        
-        self.log_feature_import(len(data))
+        count = 0
+        try:
+            for chunk in iter_chunks(rows, self.chunk_size):
+                self.create_or_update_features(chunk, feature_type, field_names, import_task.user)
+                count += len(chunk)
+        except CSVProcessingFailed:
+            # Les lots précédents sont déjà enregistrés
+            self.log_feature_import(count)
+            raise
+
+        if not count:
+            self.infos.append("Aucun signalement trouvé dans le fichier CSV.")
+            raise CSVProcessingFailed
 
+        self.log_feature_import(count)
 
-    def create_or_update_feature(self, feature_id, new_feature_data, feature_type):
+    @transaction.atomic
+    def create_or_update_features(self, chunk, feature_type, field_names, creator):
         """
-        Creates or updates a feature in the database.
+        Creates or updates the features of a chunk of rows in the database.
 
-        This method checks if a feature with the given ID already exists. If it does, and if the existing feature
-        belongs to a different project or feature type than the one being imported, the method resets the feature_id
-        to None. This ensures that a new feature is created instead of updating an unrelated existing feature.
-        The method then creates or updates the feature in the database.
+        Features whose ID exists in the imported feature type are updated; rows without ID,
+        with an unknown ID or with the ID of a feature of another project or feature type
+        create a new feature. This ensures that an import never updates an unrelated feature.
 
         Parameters:
-        - feature_id: The ID of the feature to create or update.
-        - new_feature_data: Dictionary containing data for the feature.
+        - chunk: List of dictionaries, each representing a row from the CSV.
         - feature_type: The feature type object associated with the import task.
+        - field_names: List of custom field names for the feature type.
+        - creator: User instance representing the creator of the features.
 
         Raises:
-        - CSVProcessingFailed: If any errors occur during creation or update of the feature.
+        - CSVProcessingFailed: If any errors occur during creation or update of the features.
         """
         try:
-            # Check if the feature with the provided ID already exists
-            try:
-                feature_exist = Feature.objects.get(feature_id=feature_id, deletion_on=None)
-            except Feature.DoesNotExist:
-                feature_exist = None
-                # The CSV might come with an old ID. We reset the ID here as well.
-                feature_id = None
-
-            # Reset feature_id if the existing feature is in a different project or feature type
-            if feature_exist:
-                if feature_exist.project != feature_type.project or feature_exist.feature_type != feature_type:
-                    # If the ID from the import exists, but we wish to create the feature in another project,
-                    # we set the ID to None
-                    feature_id = None
-
-            # Create or update the feature in the database
-            current, _ = Feature.objects.update_or_create(
-                feature_id=feature_id,
-                defaults=new_feature_data
-            )
-
-            # Link similar features based on specific criteria
-            self.link_similar_features(current, feature_type)
+            rows = []
+            for feature in chunk:
+                new_feature_data, feature_id = self.process_feature_row(
+                    feature, feature_type, field_names, creator
+                )
+                new_feature_data['feature_id'] = feature_id
+                rows.append(new_feature_data)
+
+            saved = bulk_save_features(rows, feature_type, batch_size=self.chunk_size)
+
+            # Link the features of the chunk to their similar features, in one query
+            link_duplicate_features([instance.pk for instance, _ in saved], feature_type)
 
         except Exception as er:
             logger.exception(f"L'edition ou creation de feature a echoué: {er}.")
@@ -264,42 +264,6 @@ class CSVProcessing:
             raise CSVProcessingFailed
 
 
-    def link_similar_features(self, current_feature, feature_type):
-        """
-        Search for similar features based on title, description, and feature type.
-        Link them to the new feature as a duplicate.
-
-        Parameters:
-        - current_feature: The current feature being processed.
-        - feature_type: The feature type object associated with the import task.
-        """
-        # Filtrer les features par titre, description et type, ou par géométrie et type
-        simili_features = Feature.objects.filter(
-            Q(title=current_feature.title, description=current_feature.description, feature_type=feature_type)
-        )
-        # Filtrer les features par géométrie et type si le type de signalement est de type géographique
-        if feature_type.geom_type != 'none':
-            simili_features = simili_features.filter(
-                Q(geom=current_feature.geom, feature_type=feature_type)
-            )
-
-        simili_features = simili_features.exclude( 
-            # Exclure le feature courant par son ID
-            feature_id=current_feature.feature_id
-        ).exclude(
-            # Exclure les features ayant une date de suppression définie (deletion_on n'est pas None)
-            deletion_on__isnull=False
-        )
-
-        if simili_features.exists():
-            for row in simili_features:
-                FeatureLink.objects.get_or_create(
-                    relation_type='doublon',
-                    feature_from=current_feature,
-                    feature_to=row
-                )
-
-
     def log_feature_import(self, count):
         """
         Logs the number of features imported.
@@ -311,18 +275,19 @@ class CSVProcessing:
             msg = "{nb} signalement(s) importé(s). ".format(nb=count)
             self.infos.append(msg)
 
-    def validate_data(self, file):
+    def read_rows(self, file):
         """
-        Validates and loads data from a CSV file.
+        Reads the rows of a CSV file, one at a time.
 
         Opens the provided CSV file, uses csv.Sniffer to detect the file's dialect,
-        and then reads the data using csv.DictReader.
+        and then yields the rows read by csv.DictReader, so that the whole file is never
+        held in memory.
 
         Parameters:
         - file: A file object representing the CSV file to be processed.
 
-        Returns:
-        - A list of dictionaries, each representing a row in the CSV file.
+        Yields:
+        - Dictionaries, each representing a row in the CSV file.
 
         Raises:
         - CSVProcessingFailed: If any errors occur during reading or parsing of the CSV file.
@@ -355,15 +320,12 @@ class CSVProcessing:
                 # Log the detected delimiter for debugging
                 logger.info(f"Detected CSV delimiter: {dialect.delimiter}")
 
-                # Convert the read data into a list of dictionaries
-                data = list(reader)
+                yield from reader
         except Exception as err:
             # Log and raise an error if any issues occur while reading the CSV
             logger.warning(type(err), err)
             self.infos.append("Erreur à la lecture du fichier CSV: {} ".format(str(err)))
             raise CSVProcessingFailed
-        else:
-            return data
 
 
     def __call__(self, import_task):
@@ -372,11 +334,8 @@ class CSVProcessing:
             import_task.status = "processing"
             import_task.started_on = timezone.now()
 
-            # Validation and loading of CSV data
-            data = self.validate_data(import_task.file)
-
-            # Proceed with creating features if data is valid
-            self.create_features(import_task, data)
+            # Read the CSV rows and create the features chunk by chunk
+            self.create_features(import_task, self.read_rows(import_task.file))
 
         except CSVProcessingFailed as err:
             logger.warn('%s' % type(err))
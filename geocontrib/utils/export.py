@@ -0,0 +1,224 @@
+import collections
+import csv
+import logging
+import tempfile
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.gis.db.models import GeometryField
+from django.core.files import File
+from django.db.models import Func
+from django.utils import timezone
+
+from api.serializers import FeatureCSVSerializer
+from api.serializers import FeatureGeoJSONSerializer
+from api.serializers import FeatureJSONSerializer
+from api.utils.streaming import STREAM_CHUNK_SIZE
+from api.utils.streaming import Echo
+from api.utils.streaming import iter_feature_collection
+from api.utils.streaming import iter_json_array
+from api.utils.streaming import iter_json_seq
+from api.utils.streaming import iter_serialized
+from geocontrib.models import Feature
+from geocontrib.schemas import FeatureTypeSchema
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureExport:
+    """
+    Export of the features of a feature type in JSON, GeoJSON, GeoJSON text sequence (RFC 8142)
+    or CSV format, as a sequence of text chunks. It is shared by the synchronous export view,
+    which streams the chunks in the HTTP response, and by the export tasks, which write them
+    to a file.
+
+    The features are walked with a server-side cursor and serialized one by one,
+    so that memory usage does not grow with the number of features.
+    """
+
+    serializer_classes = {
+        'json': FeatureJSONSerializer,
+        'geojson': FeatureGeoJSONSerializer,
+        'geojsonseq': FeatureGeoJSONSerializer,
+        'csv': FeatureCSVSerializer,
+    }
+
+    content_types = {
+        'json': 'application/json',
+        'geojson': 'application/json',
+        'geojsonseq': 'application/geo+json-seq',
+        'csv': 'text/csv',
+    }
+
+    def __init__(self, project, feature_type, format, user=None, request=None, context=None):
+        self.project = project
+        self.feature_type = feature_type
+        self.format = format
+        if request is None:
+            # Serializers only read the user from the request of their context
+            request = SimpleNamespace(user=user or AnonymousUser())
+        self.request = request
+        self.user = request.user
+        self.context = context
+        self.count = 0
+
+    @property
+    def serializer_class(self):
+        return self.serializer_classes[self.format]
+
+    @property
+    def content_type(self):
+        return self.content_types[self.format]
+
+    @property
+    def filename(self):
+        return 'export_projet.{}'.format(self.format)
+
+    def get_queryset(self):
+        """
+        Returns the exported features, as visible by the user.
+        """
+        return Feature.handy.availables(self.user, self.project, self.context).filter(
+            feature_type=self.feature_type,
+            # filter out features with a deletion date, since deleted features are not anymore deleted directly from database (https://redmine.neogeo.fr/issues/16246)
+            deletion_on__isnull=True
+        ).order_by("created_on")
+
+    def iter_features(self, features):
+        """
+        Walks the features with a server-side cursor, replacing their geometry by the one
+        promoted to a multi geometry in SQL if required by the feature type.
+
+        Parameters:
+        - features: The queryset of the exported features.
+
+        Yields:
+        - Feature: The features, one chunk being held in memory at a time.
+        """
+        for feature in features.iterator(chunk_size=STREAM_CHUNK_SIZE):
+            if hasattr(feature, 'multi_geom'):
+                feature.geom = feature.multi_geom
+            self.count += 1
+            yield feature
+
+    def get_csv_headers(self, serializer, feature_type):
+        """
+        Builds and returns headers for the CSV file.
+
+        Parameters:
+        - serializer: The serializer of the exported features.
+        - feature_type: The feature type object used to determine if additional geographical fields are needed.
+
+        Returns:
+        - List[str]: Column headers for the CSV file.
+        """
+        # Retrieve feature field names from the serializer fields, without evaluating its data
+        featureFieldNames = [*serializer.fields.keys()]
+        # Get custom field names from the FeatureType model
+        customFieldNames = list(FeatureTypeSchema.get(feature_type, fresh=True).names)
+        # Combine feature field names and custom field names
+        headers = [*featureFieldNames, *customFieldNames]
+        # Remove 'feature_data' and 'geom' fields, as they are not needed in the CSV
+        headers.remove('feature_data')
+        headers.remove('geom')
+        # Add latitude and longitude columns for geographical feature types
+        if feature_type.geom_type != 'none':
+            headers += ['lat', 'lon']
+        return headers
+
+    def prepare_csv_row(self, row, headers, feature_type):
+        """
+        Prepares and returns a single row for the CSV file.
+
+        Parameters:
+        - row: Dict representing a single feature's data.
+        - headers: List of valid headers for the CSV.
+        - feature_type: The feature type object used to determine if geographical data conversion is necessary.
+
+        Returns:
+        - OrderedDict: A single row in the CSV file with only the valid fields.
+        """
+        # Convert geom data to latitude and longitude if the feature type is geographical
+        if feature_type.geom_type != 'none' and 'geom' in row:
+            row['lon'] = row['geom']['coordinates'][0]
+            row['lat'] = row['geom']['coordinates'][1]
+        # Merge feature data with custom field data
+        data = row['feature_data'].items() if row['feature_data'] else []
+        full_row = collections.OrderedDict(list(row.items()) + list(data))
+        # Remove 'geom' and 'feature_data' fields from the row
+        full_row.pop('geom', None)
+        full_row.pop('feature_data', None)
+        # Filter out fields that are not in the CSV headers, in case of custom field deletion (https://redmine.neogeo.fr/issues/23023)
+        filtered_row = {key: full_row[key] for key in headers if key in full_row}
+        return filtered_row
+
+    def iter_csv(self, rows):
+        # Prepare CSV headers and a CSV writer returning the lines instead of writing them
+        headers = self.get_csv_headers(
+            self.serializer_class(context={'request': self.request}), self.feature_type)
+        writer = csv.DictWriter(Echo(), fieldnames=headers)
+        yield writer.writeheader()
+        # Write each feature to the CSV file
+        for row in rows:
+            yield writer.writerow(self.prepare_csv_row(row, headers, self.feature_type))
+
+    def iter_chunks(self, features=None):
+        """
+        Yields the exported file, chunk by chunk.
+        """
+        if features is None:
+            features = self.get_queryset()
+        features = self.serializer_class.setup_eager_loading(features)
+        if self.feature_type.geom_type.startswith('multi'):
+            # Convert single geometries to multi-geometries in SQL, as required by feature_type
+            features = features.annotate(
+                multi_geom=Func('geom', function='ST_Multi', output_field=GeometryField(srid=4326))
+            )
+        rows = iter_serialized(
+            self.iter_features(features), self.serializer_class, context={'request': self.request}
+        )
+        if self.format == 'json':
+            return iter_json_array(rows)
+        elif self.format == 'geojson':
+            return iter_feature_collection(rows)
+        elif self.format == 'geojsonseq':
+            return iter_json_seq(rows)
+        return self.iter_csv(rows)
+
+
+def export_processing(export_task):
+    """
+    Writes the export of the task to a temporary file, then saves it in the MEDIA storage.
+    The number of exported features is saved as the export goes along.
+    """
+    export_task.status = "processing"
+    export_task.started_on = timezone.now()
+    export_task.save(update_fields=['status', 'started_on'])
+
+    export = FeatureExport(
+        export_task.project, export_task.feature_type, export_task.format, user=export_task.user)
+    try:
+        features = export.get_queryset()
+        export_task.total_count = features.count()
+        export_task.save(update_fields=['total_count'])
+        reported = 0
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in export.iter_chunks(features):
+                tmp.write(chunk.encode('utf-8'))
+                if export.count - reported >= STREAM_CHUNK_SIZE:
+                    reported = export.count
+                    type(export_task).objects.filter(pk=export_task.pk).update(exported_count=reported)
+            tmp.seek(0)
+            export_task.file.save(export.filename, File(tmp), save=False)
+    except Exception as err:
+        logger.exception("Export task %s failed", export_task.pk)
+        export_task.status = "failed"
+        export_task.infos = str(err)
+    else:
+        export_task.status = "finished"
+    export_task.exported_count = export.count
+    export_task.finished_on = timezone.now()
+    export_task.expires_on = export_task.finished_on + export_task.get_retention()
+    export_task.save(update_fields=[
+        'status', 'infos', 'file', 'exported_count', 'finished_on', 'expires_on'
+    ])
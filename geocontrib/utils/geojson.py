@@ -5,14 +5,20 @@ import logging
 from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.gis.geos.error import GEOSException
 from django.db import transaction
-from django.db.models import Q
 from django.utils import timezone
 
 from geocontrib.models import Feature
-from geocontrib.models import FeatureLink
+from geocontrib.schemas import FeatureTypeSchema
+from geocontrib.utils.bulk import BULK_BATCH_SIZE
+from geocontrib.utils.bulk import bulk_save_features
+from geocontrib.utils.bulk import iter_chunks
+from geocontrib.utils.bulk import link_duplicate_features
 
 logger = logging.getLogger(__name__)
 
+# Record separator preceding each feature of a GeoJSON text sequence (RFC 8142)
+RECORD_SEPARATOR = b'\x1e'
+
 # Custom exception class for handling failures in GeoJSON processing
 class GeoJSONProcessingFailed(Exception):
     pass
@@ -35,8 +41,13 @@ class GeoJSONProcessing:
     specific attribute processing like generating titles and extracting custom field data.
     """
 
-    def __init__(self, *args, **kwargs):
+    # Number of features written at once by bulk_create and bulk_update
+    bulk_batch_size = BULK_BATCH_SIZE
+
+    def __init__(self, *args, bulk_batch_size=None, **kwargs):
         self.infos = []  # Information messages to be logged or displayed
+        if bulk_batch_size:
+            self.bulk_batch_size = bulk_batch_size
 
     def get_geom(self, geom):
         # If geoJSON, converts GeoJSON geometry to GEOSGeometry object, or returns None if conversion fails
@@ -80,74 +91,62 @@ class GeoJSONProcessing:
 
         return title, feature_id
 
+    def get_feature_values(self, feature, feature_type, field_names, user):
+        # Builds the field values of the Feature to create or update from an incoming feature
+        properties = feature.get('properties', feature) # TODO : add fallback with feature for json
+
+        feature_data = self.get_feature_data(
+            feature_type, properties, field_names)
+
+        title, feature_id = self.handle_title(properties.get("title"), feature)
+
+        status = properties.get('status', 'draft')
+        if status not in [choice[0] for choice in Feature.STATUS_CHOICES]:
+            logger.warn("Feature '%s' import: status '%s' unknown, defaulting to 'draft'",
+                        title, status)
+            status = "draft"
+
+        values = {
+            'feature_id': feature_id,
+            'title': title,
+            'description': properties.get('description'),
+            # TODO fix status
+            'status': status,
+            'creator': user,
+            'project': feature_type.project,
+            'feature_type': feature_type,
+            'feature_data': feature_data,
+        }
+        # Ajout conditionnel de 'geom'
+        if feature_type.geom_type != 'none':
+            values['geom'] = self.get_geom(feature.get('geometry'))
+        return values
+
     @transaction.atomic
     def create_features(self, features, import_task):
-        # Creates Feature instances from provided features list
+        # Creates or updates Feature instances from provided features list, by batches
         feature_type = import_task.feature_type
         nb_features = len(features)
-        field_names = feature_type.customfield_set.values_list('name', flat=True)
-
-        for feature in features:
-            properties = feature.get('properties', feature) # TODO : add fallback with feature for json
-
-            feature_data = self.get_feature_data(
-                feature_type, properties, field_names)
-
-            title, feature_id = self.handle_title(properties.get("title"), feature)
-
-            description = properties.get('description')
-
-            status = properties.get('status', 'draft')
-            if status not in [choice[0] for choice in Feature.STATUS_CHOICES]:
-                logger.warn("Feature '%s' import: status '%s' unknown, defaulting to 'draft'",
-                            title, status)
-                status = "draft"
+        field_names = FeatureTypeSchema.get(feature_type, fresh=True).names
+        try:
+            rows = [
+                self.get_feature_values(feature, feature_type, field_names, import_task.user)
+                for feature in features
+            ]
+            saved = bulk_save_features(rows, feature_type, batch_size=self.bulk_batch_size)
+        except Exception as er:
+            logger.exception(
+                f"L'edition de feature a echoué {er}'. ")
+            self.infos.append(
+                f"L'edition de feature a echoué {er}'. ")
+            raise GeoJSONProcessingFailed
 
-            try:
-                try:
-                    feature_exist = Feature.objects.get(feature_id=feature_id, deletion_on=None)
-                except Feature.DoesNotExist:
-                    feature_exist = None
-                    # Le geojson peut venir avec un ancien ID. On reset l'ID ici aussi
-                    feature_id = None
-               
-                if feature_exist:
-                    if feature_exist.project != feature_type.project or feature_exist.feature_type != feature_type:
-                        # Si l'ID qui vient du geojson de l'import existe, 
-                        # mais on souhaite créer le signalement dans un autre projet
-                        # On set l'ID à None
-                        feature_id = None
-
-                new_feature_data = {
-                        'title': title,
-                        'description' : description,
-                        # TODO fix status
-                        'status': status,
-                        'creator': import_task.user,
-                        'project' : feature_type.project,
-                        'feature_type' : feature_type,
-                        'feature_data' : feature_data,
-                    }
-                # Ajout conditionnel de 'geom' 
-                if feature_type.geom_type != 'none':
-                    new_feature_data['geom'] = self.get_geom(feature.get('geometry'))
-
-                current, _ = Feature.objects.update_or_create(
-                    feature_id=feature_id,
-                    # project=feature_type.project,
-                    defaults=new_feature_data
-                )
-                
-            except Exception as er:
-                logger.exception(
-                    f"L'edition de feature a echoué {er}'. ")
-                self.infos.append(
-                    f"L'edition de feature a echoué {er}'. ")
-                raise GeoJSONProcessingFailed
+        # Link the imported features to their similar features, in one query
+        link_duplicate_features([instance.pk for instance, _ in saved], feature_type)
 
-        # Link similar features based on specific criteria
-        self.link_similar_features(current, feature_type)
+        return nb_features
 
+    def report_imported(self, nb_features):
         if nb_features > 0:
             msg = "{nb} signalement(s) importé(s). ".format(nb=nb_features)
             self.infos.append(msg)
@@ -182,41 +181,6 @@ class GeoJSONProcessing:
         else:
             return data
 
-    def link_similar_features(self, current_feature, feature_type):
-        """
-        Search for similar features based on title, description, and feature type.
-        Link them to the new feature as a duplicate.
-
-        Parameters:
-        - current_feature: The current feature being processed.
-        - feature_type: The feature type object associated with the import task.
-        """
-        # Filtrer les features par titre, description et type, ou par géométrie et type
-        simili_features = Feature.objects.filter(
-            Q(title=current_feature.title, description=current_feature.description, feature_type=feature_type)
-        )
-        # Filtrer les features par géométrie et type si le type de signalement est de type géographique
-        if feature_type.geom_type != 'none':
-            simili_features = simili_features.filter(
-                Q(geom=current_feature.geom, feature_type=feature_type)
-            )
-
-        simili_features = simili_features.exclude( 
-            # Exclure le feature courant par son ID
-            feature_id=current_feature.feature_id
-        ).exclude(
-            # Exclure les features ayant une date de suppression définie (deletion_on n'est pas None)
-            deletion_on__isnull=False
-        )
-
-        if simili_features.exists():
-            for row in simili_features:
-                FeatureLink.objects.get_or_create(
-                    relation_type='doublon',
-                    feature_from=current_feature,
-                    feature_to=row
-                )
-
     def __call__(self, import_task):
     # Main processing method, handles the flow of feature import and updates task status
         try:
@@ -236,7 +200,74 @@ class GeoJSONProcessing:
                 raise GeoJSONProcessingFailed
 
             self.check_has_features(features)
-            self.create_features(features, import_task)
+            self.report_imported(self.create_features(features, import_task))
+        except GeoJSONProcessingFailed:
+            import_task.status = "failed"
+        else:
+            import_task.status = "finished"
+            import_task.finished_on = timezone.now()
+        import_task.infos = "/n".join(self.infos)
+        import_task.save(update_fields=['status', 'started_on', 'finished_on', 'infos'])
+
+
+class GeoJSONSeqProcessing(GeoJSONProcessing):
+    """
+    Imports a GeoJSON text sequence (RFC 8142, also accepted as newline-delimited JSON):
+    one feature per line, optionally preceded by a record separator.
+
+    The file is read line by line and the features are created by batches,
+    so that memory usage does not depend on the size of the file.
+    The whole import still runs in one transaction, as for GeoJSONProcessing.
+    """
+
+    # File extensions of the GeoJSON text sequences
+    extensions = ('.geojsonseq', '.geojsons', '.geojsonl', '.ndjson', '.jsonl')
+
+    # Number of features created at once
+    batch_size = 500
+
+    @classmethod
+    def accepts(cls, file):
+        # Recognizes a sequence by its extension or by the record separator starting the file
+        if file.name.lower().endswith(cls.extensions):
+            return True
+        file.open('rb')
+        is_sequence = file.read(1) == RECORD_SEPARATOR
+        file.seek(0)
+        return is_sequence
+
+    def iter_features(self, file):
+        # Decodes the features of the file, one line at a time
+        with file.open('rb'):
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip().lstrip(RECORD_SEPARATOR).strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line.decode('utf-8'))
+                except Exception as err:
+                    self.infos.append(
+                        "Erreur à la lecture de la ligne {} du fichier GeoJSON: {} ".format(
+                            line_number, str(err)))
+                    raise GeoJSONProcessingFailed
+
+    @transaction.atomic
+    def create_sequence(self, import_task):
+        nb_features = 0
+        for features in iter_chunks(self.iter_features(import_task.file), self.batch_size):
+            if import_task.feature_type.geom_type != 'none':
+                self.check_feature_type(features, import_task)
+            nb_features += self.create_features(features, import_task)
+        if nb_features == 0:
+            self.infos.append("Aucun signalement n'est indiqué dans le fichier. ")
+            raise GeoJSONProcessingFailed
+        return nb_features
+
+    def __call__(self, import_task):
+        try:
+            import_task.status = "processing"
+            import_task.started_on = timezone.now()
+            self.report_imported(self.create_sequence(import_task))
         except GeoJSONProcessingFailed:
             import_task.status = "failed"
         else:
@@ -245,7 +276,11 @@ class GeoJSONProcessing:
         import_task.infos = "/n".join(self.infos)
         import_task.save(update_fields=['status', 'started_on', 'finished_on', 'infos'])
 
+
 # Function to initiate GeoJSON processing with an import task
 def geojson_processing(import_task):
-    process = GeoJSONProcessing()
+    if GeoJSONSeqProcessing.accepts(import_task.file):
+        process = GeoJSONSeqProcessing()
+    else:
+        process = GeoJSONProcessing()
     process(import_task)
@@ -0,0 +1,479 @@
+from collections import namedtuple
+import fcntl
+import math
+import os
+import shutil
+import tempfile
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.cache import InvalidCacheBackendError
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from api.utils.geojson_sql import annotate_style
+from api.utils.mvt_sql import render_tile
+from geocontrib.permissions import PermissionContext
+
+# Identifies a cached tile: the features of a project, or of one of its feature types (scope),
+# as seen by a visibility class (cf. AvailableFeaturesManager.visibility_class)
+TileKey = namedtuple('TileKey', ['project_id', 'scope', 'visibility', 'z', 'x', 'y', 'variant'])
+
+HITS_KEY = 'geocontrib:mvt_cache:hits'
+MISSES_KEY = 'geocontrib:mvt_cache:misses'
+
+# Latitude limit of the Web Mercator projection
+MAX_LATITUDE = 85.0511287798066
+
+# Margin added around the geometries, so that the tiles they only touch are invalidated too
+EXTENT_MARGIN = 1e-9
+
+
+def _incr(key, backend):
+    try:
+        return backend.incr(key)
+    except ValueError:
+        backend.add(key, 0, None)
+        return backend.incr(key)
+
+
+def _incr_file(path):
+    """
+    Increments the counter stored in the file, locked so that the processes sharing
+    the file don't lose increments.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT), 'r+') as counter:
+        fcntl.flock(counter, fcntl.LOCK_EX)
+        value = int(counter.read() or 0) + 1
+        counter.seek(0)
+        counter.truncate()
+        counter.write(str(value))
+        return value
+
+
+def _read_file(path):
+    try:
+        with open(path) as counter:
+            fcntl.flock(counter, fcntl.LOCK_SH)
+            return int(counter.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def get_max_zoom():
+    """
+    Tiles of a higher zoom level are not cached.
+    """
+    return getattr(settings, 'MVT_CACHE_MAX_ZOOM', 18)
+
+
+def get_prerender_max_zoom():
+    """
+    Highest zoom level of the tiles pre-rendered by prerender_project_tiles().
+    """
+    return getattr(settings, 'MVT_PRERENDER_MAX_ZOOM', 8)
+
+
+def get_max_invalidated_tiles():
+    """
+    Above this number of tiles touched at a zoom level, the whole zoom level is invalidated.
+    """
+    return getattr(settings, 'MVT_CACHE_MAX_INVALIDATED_TILES', 256)
+
+
+def tile_x(lon, z):
+    n = 2 ** z
+    return min(n - 1, max(0, math.floor((lon + 180.0) / 360.0 * n)))
+
+
+def tile_y(lat, z):
+    n = 2 ** z
+    lat = math.radians(max(-MAX_LATITUDE, min(MAX_LATITUDE, lat)))
+    return min(n - 1, max(0, math.floor((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)))
+
+
+def tile_ranges(extent, z):
+    """
+    Returns the ranges of the x and y coordinates of the tiles of zoom z
+    intersecting the (xmin, ymin, xmax, ymax) longitude/latitude extent.
+    """
+    xmin, ymin, xmax, ymax = extent
+    return (
+        range(tile_x(xmin - EXTENT_MARGIN, z), tile_x(xmax + EXTENT_MARGIN, z) + 1),
+        range(tile_y(ymax + EXTENT_MARGIN, z), tile_y(ymin - EXTENT_MARGIN, z) + 1),
+    )
+
+
+def touched_tiles(extents, max_zoom=None):
+    """
+    Yields the (z, tiles) pairs of the cached zoom levels, tiles being the set of the
+    (x, y) coordinates of the tiles intersecting one of the extents, or None when they are
+    too many to be listed: the whole zoom level is then invalidated.
+    """
+    if max_zoom is None:
+        max_zoom = get_max_zoom()
+    max_tiles = get_max_invalidated_tiles()
+    for z in range(max_zoom + 1):
+        tiles = set()
+        for extent in extents:
+            xs, ys = tile_ranges(extent, z)
+            if len(tiles) + len(xs) * len(ys) > max_tiles:
+                tiles = None
+                break
+            tiles.update((x, y) for x in xs for y in ys)
+        if tiles is None or tiles:
+            yield z, tiles
+
+
+class BaseTileCache:
+    """
+    Cache of the rendered vector tiles. The backends store the tiles and invalidate them
+    by project, zoom level and tile, whatever their scope, visibility class and variant.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, content):
+        raise NotImplementedError
+
+    def invalidate(self, project_id, z, tiles=None):
+        """
+        Invalidates the (x, y) tiles of zoom z of the project, or the whole zoom level.
+        """
+        raise NotImplementedError
+
+    def purge(self, project_id):
+        """
+        Invalidates all the tiles of the project.
+        """
+        raise NotImplementedError
+
+    def record(self, hit):
+        """
+        Increments the hit or miss counter, stored by the backend.
+        """
+        raise NotImplementedError
+
+    def get_counts(self):
+        """
+        Returns the (hits, misses) counters.
+        """
+        raise NotImplementedError
+
+    def reset_counts(self):
+        raise NotImplementedError
+
+    def fetch(self, key, render, record_stats=True):
+        """
+        Returns the (content, hit) pair of the tile, rendering and storing it on a miss.
+        """
+        content = self.get(key)
+        if content is not None:
+            if record_stats:
+                self.record(True)
+            return content, True
+        if record_stats:
+            self.record(False)
+        content = render()
+        self.set(key, content)
+        return content, False
+
+
+class FileSystemTileCache(BaseTileCache):
+    """
+    Tiles stored as files, in <location>/<project>/<z>/<x>/<y>/<scope>/<visibility>.<variant>.mvt,
+    so that invalidating a tile removes a single directory. The location is local to the
+    server: with several application servers, use a shared backend such as DjangoTileCache.
+
+    A generation counter per project and zoom level, bumped before the tiles are removed,
+    guards the tiles rendered during an invalidation: such a tile is not stored, or removed
+    if the invalidation happened while it was being moved in place.
+    """
+
+    def __init__(self, location=None):
+        self.location = location or getattr(
+            settings, 'MVT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'geocontrib_mvt'))
+
+    def project_dir(self, project_id):
+        return os.path.join(self.location, str(project_id))
+
+    def path(self, key):
+        return os.path.join(
+            self.project_dir(key.project_id), str(key.z), str(key.x), str(key.y),
+            key.scope, '{}.{}.mvt'.format(key.visibility, key.variant))
+
+    def generation_paths(self, project_id, z):
+        directory = os.path.join(self.location, 'generations', str(project_id))
+        return os.path.join(directory, 'project'), os.path.join(directory, str(z))
+
+    def generation(self, project_id, z):
+        return tuple(_read_file(path) for path in self.generation_paths(project_id, z))
+
+    def stats_path(self, hit):
+        return os.path.join(self.location, 'stats', 'hits' if hit else 'misses')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as tile:
+                return tile.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, content, generation=None):
+        """
+        Stores the tile. With the generation read before rendering it, the tile
+        is dropped if its zoom level was invalidated meanwhile.
+        """
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Written aside then renamed, so that a tile is never read partially written
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+            tmp.write(content)
+        if generation is not None and self.generation(key.project_id, key.z) != generation:
+            os.remove(tmp.name)
+            return
+        os.replace(tmp.name, path)
+        # An invalidation between the check and the rename may not have removed the tile
+        if generation is not None and self.generation(key.project_id, key.z) != generation:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def fetch(self, key, render, record_stats=True):
+        content = self.get(key)
+        if content is not None:
+            if record_stats:
+                self.record(True)
+            return content, True
+        if record_stats:
+            self.record(False)
+        generation = self.generation(key.project_id, key.z)
+        content = render()
+        self.set(key, content, generation)
+        return content, False
+
+    def invalidate(self, project_id, z, tiles=None):
+        _incr_file(self.generation_paths(project_id, z)[1])
+        zoom_dir = os.path.join(self.project_dir(project_id), str(z))
+        if tiles is None:
+            shutil.rmtree(zoom_dir, ignore_errors=True)
+            return
+        for x, y in tiles:
+            shutil.rmtree(os.path.join(zoom_dir, str(x), str(y)), ignore_errors=True)
+
+    def purge(self, project_id):
+        _incr_file(self.generation_paths(project_id, 0)[0])
+        shutil.rmtree(self.project_dir(project_id), ignore_errors=True)
+
+    def record(self, hit):
+        _incr_file(self.stats_path(hit))
+
+    def get_counts(self):
+        return _read_file(self.stats_path(True)), _read_file(self.stats_path(False))
+
+    def reset_counts(self):
+        for hit in (True, False):
+            try:
+                os.remove(self.stats_path(hit))
+            except FileNotFoundError:
+                pass
+
+
+class DjangoTileCache(BaseTileCache):
+    """
+    Tiles stored in a Django cache shared by the application servers (Redis, Memcached...).
+
+    Entries can't be listed in a cache, so they are invalidated with version numbers:
+    one per project, zoom level and tile, which are part of the key of the tiles.
+    A version number missing from the cache (never set or evicted) starts at the current
+    time, so that the tiles stored under a former version are never read again.
+
+    The cache alias (MVT_CACHE_ALIAS, 'mvt' by default) must designate a cache shared by
+    the processes: a local memory or dummy cache would serve tiles invalidated by the
+    other processes, so it is refused.
+    """
+
+    def __init__(self, alias=None, timeout=None):
+        alias = alias or getattr(settings, 'MVT_CACHE_ALIAS', 'mvt')
+        try:
+            self.cache = caches[alias]
+        except InvalidCacheBackendError:
+            raise ImproperlyConfigured(
+                "DjangoTileCache: the cache '{}' is not defined in CACHES".format(alias))
+        if isinstance(self.cache, (LocMemCache, DummyCache)):
+            raise ImproperlyConfigured(
+                "DjangoTileCache: the cache '{}' is not shared between processes, "
+                "use a Redis or Memcached backend".format(alias))
+        self.timeout = timeout or getattr(settings, 'MVT_CACHE_TIMEOUT', 86400)
+
+    @staticmethod
+    def version_keys(project_id, z, x, y):
+        return (
+            'geocontrib:mvt:{}'.format(project_id),
+            'geocontrib:mvt:{}:{}'.format(project_id, z),
+            'geocontrib:mvt:{}:{}:{}:{}'.format(project_id, z, x, y),
+        )
+
+    def versioned_key(self, key):
+        keys = self.version_keys(key.project_id, key.z, key.x, key.y)
+        versions = self.cache.get_many(keys)
+        for version_key in keys:
+            if version_key not in versions:
+                self.cache.add(version_key, int(time.time() * 1000), None)
+                versions[version_key] = self.cache.get(version_key)
+        return 'geocontrib:mvt:{}:{}:{}:{}:{}:{}:{}'.format(
+            ':'.join(str(versions[version_key]) for version_key in keys),
+            key.project_id, key.z, key.x, key.y, key.scope,
+            '{}.{}'.format(key.visibility, key.variant))
+
+    def get(self, key):
+        return self.cache.get(self.versioned_key(key))
+
+    def set(self, key, content):
+        self.cache.set(self.versioned_key(key), content, self.timeout)
+
+    def fetch(self, key, render, record_stats=True):
+        # The versions are read before rendering: a tile invalidated meanwhile
+        # is stored under its former version, and never read
+        versioned_key = self.versioned_key(key)
+        content = self.cache.get(versioned_key)
+        if content is not None:
+            if record_stats:
+                self.record(True)
+            return content, True
+        if record_stats:
+            self.record(False)
+        content = render()
+        self.cache.set(versioned_key, content, self.timeout)
+        return content, False
+
+    def invalidate(self, project_id, z, tiles=None):
+        if tiles is None:
+            _incr(self.version_keys(project_id, z, 0, 0)[1], self.cache)
+            return
+        for x, y in tiles:
+            _incr(self.version_keys(project_id, z, x, y)[2], self.cache)
+
+    def purge(self, project_id):
+        _incr(self.version_keys(project_id, 0, 0, 0)[0], self.cache)
+
+    def record(self, hit):
+        _incr(HITS_KEY if hit else MISSES_KEY, self.cache)
+
+    def get_counts(self):
+        counts = self.cache.get_many([HITS_KEY, MISSES_KEY])
+        return counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+
+    def reset_counts(self):
+        self.cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def get_tile_cache():
+    """
+    Returns the tile cache configured by MVT_CACHE_BACKEND, or None if tiles are not cached.
+    """
+    backend = getattr(settings, 'MVT_CACHE_BACKEND', '')
+    if not backend:
+        return None
+    return import_string(backend)()
+
+
+def invalidate_tiles(project_id, extents):
+    """
+    Invalidates the cached tiles of the project intersecting the longitude/latitude extents.
+    A None extent (unknown geometry) purges the tiles of the project.
+    """
+    tile_cache = get_tile_cache()
+    if tile_cache is None:
+        return
+    if None in extents:
+        tile_cache.purge(project_id)
+        return
+    for z, tiles in touched_tiles(extents):
+        tile_cache.invalidate(project_id, z, tiles)
+
+
+def purge_tiles(project_id):
+    tile_cache = get_tile_cache()
+    if tile_cache is not None:
+        tile_cache.purge(project_id)
+
+
+def prerender_tiles(tile_cache, key, queryset, max_zoom):
+    """
+    Renders the tiles of the queryset into the cache, from z0 down to max_zoom, descending
+    only into the tiles which hold features. The tiles still cached are not rendered again:
+    a rebuild only renders the tiles invalidated by the edits since the previous one.
+
+    Returns the numbers of rendered and of already cached tiles.
+    """
+    rendered = cached = 0
+    tiles = [(0, 0, 0)]
+    while tiles:
+        z, x, y = tiles.pop()
+        content, hit = tile_cache.fetch(
+            key._replace(z=z, x=x, y=y),
+            lambda: render_tile(queryset, z, x, y),
+            record_stats=False,
+        )
+        if hit:
+            cached += 1
+        else:
+            rendered += 1
+        if content and z < max_zoom:
+            tiles.extend((z + 1, 2 * x + dx, 2 * y + dy) for dx in (0, 1) for dy in (0, 1))
+    return rendered, cached
+
+
+def prerender_project_tiles(project, max_zoom=None):
+    """
+    Pre-renders the pyramid of the tiles of the project seen by anonymous users
+    (published features, and archived ones if the project allows it), as requested by
+    features.mvt/ with the project_id parameter and no pagination.
+
+    Returns the numbers of rendered and of already cached tiles, or None if the tiles
+    are not cached or the features of the project are not public.
+    """
+    tile_cache = get_tile_cache()
+    anonymous = AnonymousUser()
+    context = PermissionContext(anonymous, project)
+    if tile_cache is None or not context.has_permission('can_view_feature'):
+        return None
+    Feature = apps.get_model(app_label='geocontrib', model_name='Feature')
+    max_zoom = min(get_prerender_max_zoom() if max_zoom is None else max_zoom, get_max_zoom())
+    # Mêmes signalements et ordre que FeatureMVTView
+    queryset = annotate_style(Feature.handy.availables(anonymous, project, context).filter(
+        deletion_on__isnull=True
+    )).order_by('created_on')
+    key = TileKey(
+        project.pk, 'project', Feature.handy.visibility_class(anonymous, project, context),
+        0, 0, 0, 'all')
+    return prerender_tiles(tile_cache, key, queryset, max_zoom)
+
+
+def get_stats(tile_cache=None):
+    """
+    Returns the hit/miss counters of the tile cache (the configured one by default).
+    """
+    tile_cache = tile_cache or get_tile_cache()
+    hits, misses = tile_cache.get_counts() if tile_cache is not None else (0, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+    }
+
+
+def reset_stats(tile_cache=None):
+    tile_cache = tile_cache or get_tile_cache()
+    if tile_cache is not None:
+        tile_cache.reset_counts()
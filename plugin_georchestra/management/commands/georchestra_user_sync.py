@@ -125,12 +125,8 @@ synchroniser."""
         logger.debug("Deleted users: {0}: ".format(deleted))
 
     def sync_ldap_groups(self, user, row):
-        # Tous les utilisateurs LDAP doivent au moins avoir le role "utilisateur connecté"
-        for project in Project.objects.all():
-            Authorization.objects.get_or_create(
-                project=project, user=user,
-                defaults={'level': UserLevelPermission.objects.get(user_type_id=choices.LOGGED_USER)}
-            )
+        # Tous les utilisateurs LDAP ont au moins le role "utilisateur connecté":
+        # ce rang est implicite et n'est pas stocké (cf. Authorization.get_rank)
 
         # On liste les noms de groupe auxquels est affilié l'utilisateur
         member_of = get_mapped_value(row, 'member_of', [])
@@ -145,24 +141,24 @@ synchroniser."""
             contrib_qs = Project.objects.filter(ldap_project_contrib_groups__overlap=flattened_groups)
             if contrib_qs.exists():
                 for project in contrib_qs or []:
-                    try:
-                        auth = Authorization.objects.get(project=project, user=user)
-                    except Authorization.DoesNotExist:
-                        pass
-                    else:
-                        # Si un utilisateur d’un des groupes de 'ldap_project_contrib_groups'
-                        # est déjà présent dans le projet comme modérateur
-                        # il ne sera pas déclassé en contributeur,
-
-                        # Si un utilisateur d’un des groupes de 'ldap_project_contrib_groups'
-                        # est déjà présent dans le projet comme simple utilisateur
-                        # il sera automatiquement reclassé en contributeur
-                        if auth.level.user_type_id != choices.MODERATOR and auth.level.user_type_id != choices.ADMIN:
-                            auth.level = UserLevelPermission.objects.get(user_type_id=choices.CONTRIBUTOR)
-                            auth.save(update_fields=['level', ])
-                            logger.debug("User '{0}' set as {1}'s Project '{2}' ".format(
-                                user.username, auth.level.user_type_id, project.slug)
-                            )
+                    auth = Authorization.objects.filter(project=project, user=user).first()
+                    # Si un utilisateur d’un des groupes de 'ldap_project_contrib_groups'
+                    # est déjà présent dans le projet comme modérateur
+                    # il ne sera pas déclassé en contributeur,
+
+                    # Si un utilisateur d’un des groupes de 'ldap_project_contrib_groups'
+                    # est simple utilisateur (sans autorisation stockée)
+                    # il sera automatiquement reclassé en contributeur
+                    if auth is None or auth.level.user_type_id not in (choices.MODERATOR, choices.ADMIN):
+                        auth, created = Authorization.objects.update_or_create(
+                            project=project, user=user,
+                            defaults={
+                                'level': UserLevelPermission.registry().get(user_type_id=choices.CONTRIBUTOR)
+                            }
+                        )
+                        logger.debug("User '{0}' set as {1}'s Project '{2}' ".format(
+                            user.username, auth.level.user_type_id, project.slug)
+                        )
 
             # On liste les projets pour lesquels l'utilisateur est membre des groupes 'ldap_project_admin_groups'
             # Les utilisateurs de ces groupes se retrouvent "administrateur de projet"
@@ -176,7 +172,7 @@ synchroniser."""
                     auth, created = Authorization.objects.update_or_create(
                         project=project, user=user,
                         defaults={
-                            'level': UserLevelPermission.objects.get(user_type_id=choices.ADMIN)
+                            'level': UserLevelPermission.registry().get(user_type_id=choices.ADMIN)
                         }
                     )
 
@@ -184,28 +180,8 @@ synchroniser."""
                         user.username, auth.level.user_type_id, project.slug)
                     )
 
-            # On liste les projets pour lesquels l'utilisateur n'est ni membre des groupes 'ldap_project_admin_groups'
-            # ni membre des goupes 'ldap_project_contrib_groups'
-            # Les utilisateurs absent de ces groupes se retrouvent simples "utilisateur connecté"
-            # sauf si ils ont déja un role defini à posteriori dans geocontrib
-            not_admin_and_not_contrib_qs = Project.objects.exclude(ldap_project_admin_groups__overlap=flattened_groups)\
-                .exclude(ldap_project_contrib_groups__overlap=flattened_groups)
-            if not_admin_and_not_contrib_qs.exists():
-                for project in not_admin_and_not_contrib_qs or []:
-                    auth, created = Authorization.objects.get_or_create(
-                        project=project, user=user,
-                        defaults={
-                            'level': UserLevelPermission.objects.get(user_type_id=choices.LOGGED_USER)
-                        }
-                    )
-                    if not created:
-                        logger.debug("User '{0}' is already {1}'s Project '{2}' ".format(
-                            user.username, auth.level.user_type_id, project.slug)
-                        )
-                    else:
-                        logger.debug("User '{0}' set as {1}'s Project '{2}' ".format(
-                            user.username, auth.level.user_type_id, project.slug)
-                        )
+            # Les utilisateurs absents de ces groupes restent simples "utilisateur connecté"
+            # (rang implicite), sauf s'ils ont déjà un role défini à posteriori dans geocontrib
 
     def user_update_or_create(self, row):
         try: